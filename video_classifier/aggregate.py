@@ -0,0 +1,182 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from inference import RATINGS, rating_rank
+
+
+ELEMENTS = ["theme_message", "violence", "sex", "nudity", "language", "drugs", "horror"]
+SEVERITIES = ["none", "mild", "moderate", "strong", "very_strong"]
+FREQUENCIES = ["none", "infrequent", "occasional", "frequent"]
+
+
+def _rank(value: Any, scale: List[str]) -> int:
+    try:
+        return scale.index(str(value))
+    except ValueError:
+        return -1
+
+
+def chunk_rating(parsed: Dict[str, Any]) -> str:
+    refusal = parsed.get("refusal") or {}
+    if refusal.get("is_refused"):
+        return "Refused"
+    return parsed.get("rating", "")
+
+
+def decision_type(rating: Optional[str]) -> Optional[str]:
+    rank = rating_rank(rating) if rating else -1
+    if rank < 0:
+        return None
+    if rating == "Refused":
+        return "refused"
+    return "age-restricted" if rank >= rating_rank("NC16") else "advisory"
+
+
+class FilmAggregator:
+    """Fold per-chunk results (prompts.py schema) into one film-level verdict as they arrive.
+
+    Each `update` is O(elements) and chunks may arrive in any order; nothing already
+    folded in is re-read. The film rating is the highest of every chunk's rating and
+    every element's `rating_floor` (the prompt's "do not rate below the highest floor").
+    `run_at_max` tracks the longest run of consecutive chunk indices at the current
+    maximum, for early-stop policies; a run cut short by one records why and which chunks
+    it skipped with `mark_stopped` (`stop_reason`, `skipped_chunks`).
+    """
+
+    def __init__(self):
+        self.chunks_seen = 0
+        self.rating_by_chunk: Dict[int, str] = {}
+        self.max_rank = -1
+        self.max_rank_chunks: List[int] = []
+        self.is_refused = False
+        self.refusal_grounds: Counter = Counter()
+        self.consumer_advice: Counter = Counter()
+        self.elements: Dict[str, Dict[str, Any]] = {
+            e: {"max_severity": -1, "max_rating_floor": -1, "max_frequency": -1, "chunks_present": 0, "notes": []}
+            for e in ELEMENTS
+        }
+        self.min_confidence: Optional[float] = None
+        self._confidence_sum = 0.0
+        self._confidence_n = 0
+        # runs of consecutive chunk indices at max_rank: start -> end and end -> start (inclusive)
+        self._run_by_start: Dict[int, int] = {}
+        self._run_by_end: Dict[int, int] = {}
+        self.run_at_max = 0
+        self.stop_reason: Optional[str] = None
+        self.skipped_chunks: List[int] = []
+
+    # ---------------- updates ----------------
+
+    def update(self, chunk_idx: int, parsed: Dict[str, Any]) -> None:
+        if chunk_idx in self.rating_by_chunk:
+            raise ValueError(f"chunk {chunk_idx} already aggregated")
+        self.chunks_seen += 1
+        parsed = parsed or {}  # a chunk whose output could not be parsed counts, but rates nothing
+
+        rating = chunk_rating(parsed)
+        self.rating_by_chunk[chunk_idx] = rating
+        rank = rating_rank(rating)
+
+        refusal = parsed.get("refusal") or {}
+        if refusal.get("is_refused"):
+            self.is_refused = True
+            self.refusal_grounds.update(refusal.get("grounds") or [])
+
+        for advice in parsed.get("consumer_advice") or []:
+            self.consumer_advice[advice] += 1
+
+        for element, assessment in (parsed.get("element_assessments") or {}).items():
+            if not isinstance(assessment, dict):
+                continue
+            agg = self.elements.setdefault(
+                element,
+                {"max_severity": -1, "max_rating_floor": -1, "max_frequency": -1, "chunks_present": 0, "notes": []},
+            )
+            severity = _rank(assessment.get("severity"), SEVERITIES)
+            agg["max_severity"] = max(agg["max_severity"], severity)
+            agg["max_frequency"] = max(agg["max_frequency"], _rank(assessment.get("frequency"), FREQUENCIES))
+            floor = rating_rank(assessment.get("rating_floor", ""))
+            agg["max_rating_floor"] = max(agg["max_rating_floor"], floor)
+            rank = max(rank, floor)
+            if severity > 0:
+                agg["chunks_present"] += 1
+                if assessment.get("notes"):
+                    agg["notes"].append((chunk_idx, assessment["notes"]))
+
+        confidence = parsed.get("confidence")
+        if isinstance(confidence, (int, float)):
+            self._confidence_sum += confidence
+            self._confidence_n += 1
+            self.min_confidence = confidence if self.min_confidence is None else min(self.min_confidence, confidence)
+
+        self._update_rank(chunk_idx, rank)
+
+    def mark_stopped(self, reason: str, skipped_chunks: List[int]) -> None:
+        self.stop_reason = reason
+        self.skipped_chunks = sorted(skipped_chunks)
+
+    def _update_rank(self, chunk_idx: int, rank: int) -> None:
+        if rank > self.max_rank:
+            self.max_rank = rank
+            self.max_rank_chunks = [chunk_idx]
+            self._run_by_start = {chunk_idx: chunk_idx}
+            self._run_by_end = {chunk_idx: chunk_idx}
+            self.run_at_max = 1
+            return
+        if rank < self.max_rank:
+            return
+        self.max_rank_chunks.append(chunk_idx)
+        start = self._run_by_end.pop(chunk_idx - 1, chunk_idx)
+        end = self._run_by_start.pop(chunk_idx + 1, chunk_idx)
+        self._run_by_start.pop(start, None)
+        self._run_by_end.pop(end, None)
+        self._run_by_start[start] = end
+        self._run_by_end[end] = start
+        self.run_at_max = max(self.run_at_max, end - start + 1)
+
+    # ---------------- views ----------------
+
+    @property
+    def rating(self) -> Optional[str]:
+        if self.is_refused:
+            return "Refused"
+        return RATINGS[self.max_rank] if self.max_rank >= 0 else None
+
+    def progress_line(self) -> str:
+        advice = ", ".join(a for a, _ in self.consumer_advice.most_common(3))
+        return (
+            f"chunks={self.chunks_seen} rating={self.rating} "
+            f"(from chunks {sorted(self.max_rank_chunks)}) advice=[{advice}]"
+        )
+
+    def verdict(self) -> Dict[str, Any]:
+        """Film-level result in the shape of the per-chunk schema, plus aggregation details."""
+        label = lambda scale, i: scale[i] if i >= 0 else None
+        rating = self.rating
+        return {
+            "rating": rating,
+            "decision_type": decision_type(rating),
+            "element_assessments": {
+                element: {
+                    "severity": label(SEVERITIES, agg["max_severity"]),
+                    "frequency": label(FREQUENCIES, agg["max_frequency"]),
+                    "rating_floor": label(RATINGS, agg["max_rating_floor"]),
+                    "chunks_present": agg["chunks_present"],
+                    "share_of_chunks": agg["chunks_present"] / self.chunks_seen if self.chunks_seen else 0.0,
+                    "notes": [note for _, note in sorted(agg["notes"])],
+                }
+                for element, agg in self.elements.items()
+            },
+            "refusal": {
+                "is_refused": self.is_refused,
+                "grounds": [g for g, _ in self.refusal_grounds.most_common()],
+            },
+            "consumer_advice": [a for a, _ in self.consumer_advice.most_common()],
+            "confidence": {
+                "min": self.min_confidence,
+                "mean": self._confidence_sum / self._confidence_n if self._confidence_n else None,
+            },
+            "chunks_seen": self.chunks_seen,
+            "rating_by_chunk": dict(sorted(self.rating_by_chunk.items())),
+            "deciding_chunks": sorted(self.max_rank_chunks),
+        }
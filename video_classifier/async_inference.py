@@ -0,0 +1,333 @@
+import time
+import heapq
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from rich import print as rich_print
+
+from inference import MODEL, PromptCacheStats, cached_tokens, make_message, parse_response, prompt_cache_key, usage_to_dict
+from response_cache import request_key
+from schema import STRUCTURED_REQUEST_PARAMS, ChunkParseError, ParseStats, validate_chunk_output
+from tokens import calibration_factor, default_calibration, estimate_message_tokens
+
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def makespan(latencies: Sequence[float], slots: int) -> float:
+    """Wall time of running `latencies` in order on `slots` concurrent slots (as the classifier's semaphore does)."""
+    ends = [0.0] * max(1, min(slots, len(latencies)))
+    for latency in latencies:
+        heapq.heapreplace(ends, ends[0] + latency)
+    return max(ends) if latencies else 0.0
+
+
+class RateLimiter:
+    """Sliding 60s window over requests and tokens (requests-per-minute / tokens-per-minute).
+
+    `acquire(tokens)` waits until both budgets have room, then records the reservation.
+    `settle(event, actual_tokens)` swaps the estimate for the billed amount.
+    Either budget can be None to disable it.
+    """
+
+    WINDOW_SEC = 60.0
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events: Deque[List[float]] = deque()  # [timestamp, tokens]
+        self._lock = asyncio.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._events and now - self._events[0][0] >= self.WINDOW_SEC:
+            self._events.popleft()
+
+    def _wait_time(self, now: float, tokens: int) -> float:
+        waits = [0.0]
+        if self.rpm is not None and len(self._events) >= self.rpm:
+            waits.append(self._events[len(self._events) - self.rpm][0] + self.WINDOW_SEC - now)
+        if self.tpm is not None:
+            # a single request bigger than the whole budget is let through once the window is empty
+            used = sum(tok for _, tok in self._events)
+            excess = used + min(tokens, self.tpm) - self.tpm
+            for ts, tok in self._events:
+                if excess <= 0:
+                    break
+                excess -= tok
+                waits.append(ts + self.WINDOW_SEC - now)
+        return max(waits)
+
+    async def acquire(self, tokens: int = 0) -> List[float]:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    event = [now, float(tokens)]
+                    self._events.append(event)
+                    return event
+                await asyncio.sleep(wait)
+
+    def settle(self, event: List[float], actual_tokens: int) -> None:
+        event[1] = float(actual_tokens)
+
+
+class AsyncChunkClassifier:
+    """Classify frame chunks concurrently on AsyncOpenAI.
+
+    - at most `max_concurrency` requests in flight
+    - requests/tokens per minute kept under `rpm` / `tpm`
+    - 429s, timeouts and 5xx retried with exponential backoff + jitter (honours Retry-After)
+    - results returned in chunk order
+    - with `response_cache`, chunks classified before are served locally (`bypass_cache` forces a re-run)
+    - `structured=True` requests the prompts.py schema as a strict JSON schema and validates each
+      output with the compiled `schema.ChunkClassification`; an output that fails parsing/validation
+      is re-requested on its own up to `max_parse_retries` times (`ChunkParseError` after that)
+    - every request carries the same `prompt_cache_key` (default: derived from model + static prompt)
+      so the shared prefix hits the provider's prompt cache; `cache_stats` tracks cached vs input tokens
+    - token estimates for the TPM limiter are scaled by `calibration`; left None, it starts at
+      `tokens.default_calibration(model)` and is refitted from the first billed `usage.input_tokens`
+    """
+
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        model: str = MODEL,
+        max_concurrency: int = 8,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        max_retries: int = 6,
+        backoff_base_sec: float = 1.0,
+        backoff_max_sec: float = 60.0,
+        calibration: Optional[float] = None,
+        response_cache=None,
+        bypass_cache: bool = False,
+        request_params: Optional[Dict[str, Any]] = None,
+        cache_key: Optional[str] = None,
+        structured: bool = False,
+        max_parse_retries: int = 2,
+        verbose: bool = True,
+    ):
+        # retries are handled here so they are rate-limit aware; disable the SDK's own
+        self.client = client or AsyncOpenAI(max_retries=0)
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = RateLimiter(rpm=rpm, tpm=tpm)
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        # a fixed `calibration` is kept; otherwise the documented default until the first billed request
+        self.calibration = calibration if calibration is not None else default_calibration(model)
+        self.fit_calibration = calibration is None
+        self.response_cache = response_cache
+        self.bypass_cache = bypass_cache
+        # extra `responses.create` kwargs, e.g. {"reasoning": {"effort": "minimal"}}
+        self.request_params = request_params or {}
+        if structured:
+            self.request_params = {**STRUCTURED_REQUEST_PARAMS, **self.request_params}
+        self.structured = structured
+        self.max_parse_retries = max_parse_retries
+        self.parse_stats = ParseStats()
+        # routing hint only, so kept out of `request_params` (and out of the response-cache key)
+        self.cache_key = cache_key or prompt_cache_key(model)
+        self.cache_stats = PromptCacheStats()
+        self.verbose = verbose
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            retry_after = headers.get("retry-after")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """429 / timeout / connection / 5xx; backends on another SDK override this."""
+        return isinstance(error, RETRYABLE_ERRORS)
+
+    async def _request(self, chunk_idx: int, est_tokens: int, call: Callable[[], Awaitable[Any]]):
+        """Run `call()` under the concurrency cap and rate limiter, retrying 429/timeout/5xx.
+
+        Returns `(result, limiter_event, latency_sec, attempts)`; settle the event with actual tokens.
+        """
+        async with self.semaphore:
+            t0 = time.perf_counter()
+            for attempt in range(self.max_retries + 1):
+                event = await self.limiter.acquire(est_tokens)
+                try:
+                    result = await call()
+                    break
+                except Exception as e:
+                    if not self._is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if self.verbose:
+                        rich_print(f"[yellow]chunk {chunk_idx}: {type(e).__name__}, retry {attempt + 1} in {delay:.1f}s[/yellow]")
+                    await asyncio.sleep(delay)
+            latency = time.perf_counter() - t0
+        return result, event, latency, attempt + 1
+
+    def parse(self, response) -> Dict[str, Any]:
+        """Chunk result from a response (timed into `parse_stats`); raises ValueError if invalid."""
+        if self.structured:
+            return validate_chunk_output(response.output_text, self.parse_stats)
+        t0 = time.perf_counter()
+        try:
+            return parse_response(response)
+        except ValueError:
+            self.parse_stats.failures += 1
+            raise
+        finally:
+            self.parse_stats.outputs += 1
+            self.parse_stats.total_sec += time.perf_counter() - t0
+
+    def estimate_tokens(self, input_messages: List[Dict[str, Any]]) -> int:
+        """Uncalibrated input-token estimate of one request (`tokens.estimate_message_tokens`)."""
+        return estimate_message_tokens(input_messages, self.model)
+
+    def calibrate(self, usage: Dict[str, Any], estimated_tokens: int) -> None:
+        """Without a fixed `calibration`, replace the default by the first billed `usage.input_tokens`
+        against `estimated_tokens`, the uncalibrated `estimate_tokens` of that request."""
+        if self.fit_calibration and usage.get("input_tokens"):
+            self.calibration = calibration_factor(usage["input_tokens"], estimated_tokens)
+            self.fit_calibration = False
+
+    async def create(self, input_messages: List[Dict[str, Any]]):
+        return await self.client.responses.create(
+            model=self.model, input=input_messages, prompt_cache_key=self.cache_key, **self.request_params,
+        )
+
+    async def classify_chunk(self, chunk_idx: int, content_chunk: Sequence[Dict[str, str]]) -> Dict[str, Any]:
+        input_messages = make_message(content_chunk)
+        key = None
+        if self.response_cache is not None:
+            key = request_key(self.model, input_messages, self.request_params)
+            hit = self.response_cache.get(key, bypass=self.bypass_cache)
+            if hit is not None:
+                if self.verbose:
+                    rich_print(f"chunk {chunk_idx}: rating={hit['parsed'].get('rating')} (cached)")
+                return {
+                    "chunk_idx": chunk_idx,
+                    "parsed": hit["parsed"],
+                    "usage": hit["usage"],
+                    "latency_sec": 0.0,
+                    "attempts": 0,
+                    "cached_tokens": 0,
+                    "from_cache": True,
+                }
+
+        raw_tokens = self.estimate_tokens(input_messages)
+        est_tokens = int(raw_tokens * self.calibration)
+
+        for parse_attempt in range(self.max_parse_retries + 1):
+            response, event, latency, attempts = await self._request(
+                chunk_idx, est_tokens, lambda: self.create(input_messages),
+            )
+            usage = usage_to_dict(getattr(response, "usage", None))
+            self.limiter.settle(event, usage.get("total_tokens", est_tokens))
+            self.cache_stats.add(usage)
+            self.calibrate(usage, raw_tokens)
+            try:
+                parsed = self.parse(response)
+                break
+            except ValueError as e:  # json.JSONDecodeError / pydantic.ValidationError
+                if parse_attempt >= self.max_parse_retries:
+                    raise ChunkParseError(
+                        f"chunk {chunk_idx}: invalid output after {parse_attempt + 1} attempt(s): {e}"
+                    ) from e
+                if self.verbose:
+                    rich_print(f"[yellow]chunk {chunk_idx}: invalid output ({type(e).__name__}), re-requesting[/yellow]")
+        if self.response_cache is not None:
+            self.response_cache.put(key, self.model, parsed, usage)
+        if self.verbose:
+            rich_print(
+                f"chunk {chunk_idx}: rating={parsed.get('rating')} latency={latency:.1f}s attempts={attempts} "
+                f"cached={cached_tokens(usage)}/{usage.get('input_tokens', 0)}"
+            )
+        return {
+            "chunk_idx": chunk_idx,
+            "parsed": parsed,
+            "usage": usage,
+            "latency_sec": latency,
+            "attempts": attempts,
+            "parse_attempts": parse_attempt + 1,
+            "cached_tokens": cached_tokens(usage),
+            "from_cache": False,
+        }
+
+    async def classify_chunks(
+        self,
+        content_chunks: Sequence[Sequence[Dict[str, str]]],
+        stop_policy=None,
+        aggregator=None,
+    ) -> List[Dict[str, Any]]:
+        """Classify all chunks concurrently; the returned list is in chunk order.
+
+        With `aggregator` (an `aggregate.FilmAggregator`) each result is folded into the
+        film verdict as it arrives. With `stop_policy` (an `early_stop.EarlyStopPolicy`),
+        in-flight and queued chunks are cancelled as soon as the policy fires; their
+        entries come back as `{"chunk_idx", "skipped": True, "stop_reason"}` (plus `"error"`
+        for a chunk that had already failed). Chunks that had already finished are kept.
+        """
+        if stop_policy is None and aggregator is None:
+            tasks = [self.classify_chunk(idx, chunk) for idx, chunk in enumerate(content_chunks)]
+            return list(await asyncio.gather(*tasks))
+
+        if aggregator is None:
+            from aggregate import FilmAggregator
+            aggregator = FilmAggregator()
+        tasks = [asyncio.create_task(self.classify_chunk(idx, chunk)) for idx, chunk in enumerate(content_chunks)]
+        results: Dict[int, Dict[str, Any]] = {}
+        stop_reason = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                results[result["chunk_idx"]] = result
+                aggregator.update(result["chunk_idx"], result["parsed"])
+                if self.verbose:
+                    rich_print(f"[dim]{aggregator.progress_line()}[/dim]")
+                if stop_policy is not None:
+                    stop_reason = stop_policy.check_aggregate(aggregator)
+                if stop_reason is not None:
+                    break
+        finally:
+            pending = [t for t in tasks if not t.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            # chunks that finished before the stop was acted on; retrieving errors keeps asyncio from warning
+            errors = {idx: t.exception() for idx, t in enumerate(tasks) if not t.cancelled() and t.exception() is not None}
+
+        # ...were paid for, so they count towards the verdict instead of being reported as skipped
+        for idx, task in enumerate(tasks):
+            if idx not in results and not task.cancelled() and idx not in errors:
+                results[idx] = task.result()
+                aggregator.update(idx, results[idx]["parsed"])
+        if stop_reason is not None:
+            aggregator.mark_stopped(stop_reason, [idx for idx in range(len(tasks)) if idx not in results])
+            if self.verbose:
+                rich_print(f"[bold yellow]early stop[/]: {stop_reason}, skipped {len(tasks) - len(results)} chunk(s)")
+        return [
+            results.get(idx) or {
+                "chunk_idx": idx, "skipped": True, "stop_reason": stop_reason,
+                **({"error": str(errors[idx])} if idx in errors else {}),
+            }
+            for idx in range(len(tasks))
+        ]
+
+
+def classify_chunks_concurrently(content_chunks, **kwargs) -> List[Dict[str, Any]]:
+    """Blocking wrapper for scripts. In a notebook, `await AsyncChunkClassifier(...).classify_chunks(...)` instead."""
+    async def _run():
+        return await AsyncChunkClassifier(**kwargs).classify_chunks(content_chunks)
+    return asyncio.run(_run())
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rich import print as rich_print
+
+from inference import MODEL, make_message, prompt_cache_key
+
+
+BATCH_ENDPOINT = "/v1/responses"
+# Batch API input files are capped at 200 MB / 50k requests; stay under with some headroom.
+MAX_FILE_BYTES = 190 * 1024 * 1024
+MAX_FILE_REQUESTS = 50000
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+MANIFEST_NAME = "manifest.json"
+
+
+def make_custom_id(video_id: str, chunk_idx: int) -> str:
+    return f"{video_id}::{chunk_idx}"
+
+
+def parse_custom_id(custom_id: str) -> Tuple[str, int]:
+    video_id, chunk_idx = custom_id.rsplit("::", 1)
+    return video_id, int(chunk_idx)
+
+
+def write_batch_files(
+    video_chunks: Dict[str, Sequence[Sequence[Dict[str, str]]]],
+    output_dir: str,
+    model: str = MODEL,
+    max_file_bytes: int = MAX_FILE_BYTES,
+    max_file_requests: int = MAX_FILE_REQUESTS,
+) -> List[str]:
+    """Write one Batch-API request line per chunk, rolling over to a new JSONL file at the size limits.
+
+    `video_chunks` maps a video id (e.g. the file stem) to its `content_chunks`. The submitted chunk
+    count per video goes to `manifest.json` in `output_dir` (see `load_manifest`).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths: List[str] = []
+    f = None
+    n_bytes = n_requests = 0
+    cache_key = prompt_cache_key(model)
+    try:
+        for video_id, content_chunks in video_chunks.items():
+            for chunk_idx, content_chunk in enumerate(content_chunks):
+                line = json.dumps({
+                    "custom_id": make_custom_id(video_id, chunk_idx),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {"model": model, "input": make_message(content_chunk), "prompt_cache_key": cache_key},
+                }) + "\n"
+                line_bytes = len(line.encode("utf-8"))
+                if f is None or n_bytes + line_bytes > max_file_bytes or n_requests >= max_file_requests:
+                    if f is not None:
+                        f.close()
+                    paths.append(os.path.join(output_dir, f"batch_{len(paths):04d}.jsonl"))
+                    f = open(paths[-1], "w", encoding="utf-8")
+                    n_bytes = n_requests = 0
+                f.write(line)
+                n_bytes += line_bytes
+                n_requests += 1
+    finally:
+        if f is not None:
+            f.close()
+    manifest = {"model": model, "files": paths, "num_chunks": {v: len(chunks) for v, chunks in video_chunks.items()}}
+    Path(output_dir, MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+    rich_print(f"[bold]wrote[/] {len(paths)} batch file(s) to {output_dir}")
+    return paths
+
+
+def load_manifest(work_dir: str) -> Dict[str, Any]:
+    """The `write_batch_files` manifest: `{"model", "files", "num_chunks": {video_id: n}}`."""
+    return json.loads(Path(work_dir, MANIFEST_NAME).read_text())
+
+
+def submit_batches(client, paths: Sequence[str], completion_window: str = "24h", metadata: Optional[Dict[str, str]] = None) -> List[str]:
+    """Upload each JSONL file and create a batch for it; returns the batch ids."""
+    batch_ids = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            input_file = client.files.create(file=fh, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=completion_window,
+            metadata=metadata,
+        )
+        rich_print(f"[bold green]submitted[/] {path} → {batch.id}")
+        batch_ids.append(batch.id)
+    return batch_ids
+
+
+def poll_batches(client, batch_ids: Sequence[str], sleep_time: float = 60, timeout_sec: Optional[float] = None) -> List[Any]:
+    """Wait until every batch reaches a terminal status; returns the final batch objects."""
+    t0 = time.monotonic()
+    pending = list(batch_ids)
+    done: Dict[str, Any] = {}
+    while pending:
+        for batch_id in list(pending):
+            batch = client.batches.retrieve(batch_id)
+            counts = getattr(batch, "request_counts", None)
+            rich_print(f"{batch_id}: {batch.status} {counts if counts is not None else ''}")
+            if batch.status in TERMINAL_STATUSES:
+                done[batch_id] = batch
+                pending.remove(batch_id)
+        if pending:
+            if timeout_sec is not None and time.monotonic() - t0 > timeout_sec:
+                raise TimeoutError(f"batches still pending after {timeout_sec}s: {pending}")
+            time.sleep(sleep_time)
+    return [done[batch_id] for batch_id in batch_ids]
+
+
+def output_text_from_body(body: Dict[str, Any]) -> str:
+    """Raw Responses JSON has no `output_text` convenience field; join the message text parts."""
+    if body.get("output_text"):
+        return body["output_text"]
+    texts = []
+    for item in body.get("output", []):
+        if item.get("type") == "message":
+            for part in item.get("content", []):
+                if part.get("type") == "output_text":
+                    texts.append(part.get("text", ""))
+    return "".join(texts)
+
+
+def _read_file_lines(client, file_id: Optional[str]) -> List[Dict[str, Any]]:
+    if not file_id:
+        return []
+    content = client.files.content(file_id)
+    return [json.loads(line) for line in content.text.splitlines() if line.strip()]
+
+
+def ingest_batch_results(
+    client,
+    batches: Sequence[Any],
+    num_chunks: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict[str, List[Optional[Dict[str, Any]]]], Dict[str, List[Dict[str, Any]]], Dict[str, Any]]:
+    """Download result files and rebuild the notebook's per-video `output_json_lst`.
+
+    `num_chunks` (the manifest's submitted chunk count per video) sizes the lists, so chunks with
+    no result line at all (expired / cancelled batch) show up as missing; without it the lists
+    end at the last chunk that came back.
+
+    Returns `(outputs, usages, errors)`:
+    - outputs[video_id][chunk_idx] = parsed chunk JSON (None if that chunk failed or is missing)
+    - usages[video_id][chunk_idx] = usage dict
+    - errors[custom_id] = error payload for failed / unparseable / missing chunks
+    """
+    by_video: Dict[str, Dict[int, Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]] = {}
+    errors: Dict[str, Any] = {}
+
+    for batch in batches:
+        for line in _read_file_lines(client, getattr(batch, "output_file_id", None)) + \
+                _read_file_lines(client, getattr(batch, "error_file_id", None)):
+            custom_id = line["custom_id"]
+            video_id, chunk_idx = parse_custom_id(custom_id)
+            response = line.get("response") or {}
+            body = response.get("body") or {}
+            parsed = None
+            if line.get("error") or response.get("status_code", 200) != 200:
+                errors[custom_id] = line.get("error") or body.get("error") or body
+            else:
+                try:
+                    parsed = json.loads(output_text_from_body(body))
+                except json.JSONDecodeError as e:
+                    errors[custom_id] = {"message": f"invalid JSON output: {e}"}
+            by_video.setdefault(video_id, {})[chunk_idx] = (parsed, body.get("usage") or {})
+
+    outputs: Dict[str, List[Optional[Dict[str, Any]]]] = {}
+    usages: Dict[str, List[Dict[str, Any]]] = {}
+    expected = {video_id: max(chunks) + 1 for video_id, chunks in by_video.items()}
+    expected.update(num_chunks or {})
+    for video_id, n in expected.items():
+        chunks = by_video.get(video_id, {})
+        for i in range(n):
+            if i not in chunks:
+                errors[make_custom_id(video_id, i)] = {"message": "no result returned (batch expired, cancelled or failed)"}
+        outputs[video_id] = [chunks.get(i, (None, {}))[0] for i in range(n)]
+        usages[video_id] = [chunks.get(i, (None, {}))[1] for i in range(n)]
+    if errors:
+        rich_print(f"[red]{len(errors)} chunk(s) failed[/]: {sorted(errors)[:10]}")
+    return outputs, usages, errors
+
+
+def run_batch(
+    client,
+    video_chunks: Dict[str, Sequence[Sequence[Dict[str, str]]]],
+    work_dir: str = "data/batch",
+    model: str = MODEL,
+    sleep_time: float = 60,
+    timeout_sec: Optional[float] = None,
+    max_file_bytes: int = MAX_FILE_BYTES,
+    max_file_requests: int = MAX_FILE_REQUESTS,
+):
+    """Write → submit → poll → ingest. Point `client` at a local stand-in with `OpenAI(base_url=...)` to test."""
+    paths = write_batch_files(
+        video_chunks, work_dir, model=model, max_file_bytes=max_file_bytes, max_file_requests=max_file_requests,
+    )
+    batch_ids = submit_batches(client, paths)
+    Path(work_dir, "batch_ids.json").write_text(json.dumps(batch_ids))
+    batches = poll_batches(client, batch_ids, sleep_time=sleep_time, timeout_sec=timeout_sec)
+    return ingest_batch_results(client, batches, load_manifest(work_dir)["num_chunks"])
@@ -0,0 +1,242 @@
+"""
+End-to-end throughput benchmark on synthetic videos and the local stub API.
+
+Run:
+    uv run benchmark.py --label baseline
+    uv run benchmark.py --label after --compare data/bench/baseline.json
+    uv run benchmark.py --lengths 60 600 --resolutions 1280x720 --latency-sec 8 --max-concurrency 16
+
+Each case (video length x resolution) runs in a fresh process so its peak RSS is its own.
+Per-stage seconds: decode, resize, jpeg, base64, serialize (json of each chunk request) and
+model (wall time of all chunk requests against the stub with `--latency-sec`).
+"""
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from openai import AsyncOpenAI
+from rich import print as rich_print
+from rich.table import Table
+
+from async_inference import AsyncChunkClassifier
+from frames import SamplerStats, encode_jpeg, iter_sampled_frames, jpeg_to_data_url, resize_frame
+from inference import chunk_list, make_message
+from stub_server import StubOpenAIServer
+
+
+STAGES = ["decode", "resize", "jpeg", "base64", "serialize", "model"]
+DEFAULT_LENGTHS = [30, 120]
+DEFAULT_RESOLUTIONS = ["640x360", "1280x720", "1920x1080"]
+
+
+def make_synthetic_video(path: str, duration_sec: float, width: int, height: int, fps: float = 25.0, seed: int = 0) -> str:
+    """Write an mp4 of moving shapes over noise with a hard cut every ~7s (so frames compress like footage)."""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"cv2.VideoWriter could not open {path}")
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    n_frames = int(round(duration_sec * fps))
+    scene_len = int(7 * fps)
+    try:
+        for i in range(n_frames):
+            if i % scene_len == 0:
+                background = rng.integers(0, 200, size=3).tolist()
+                colour = rng.integers(50, 255, size=3).tolist()
+            frame = np.full((height, width, 3), background, dtype=np.uint8)
+            frame += noise
+            t = (i % scene_len) / scene_len
+            cx, cy = int(width * (0.1 + 0.8 * t)), int(height * (0.5 + 0.3 * np.sin(6.28 * t)))
+            cv2.circle(frame, (cx, cy), max(4, height // 8), colour, -1)
+            cv2.rectangle(frame, (width - cx, height // 4), (width - cx + width // 10, height // 2), colour[::-1], -1)
+            cv2.putText(frame, f"{i / fps:7.2f}s", (10, height - 10), cv2.FONT_HERSHEY_SIMPLEX, height / 720, (255, 255, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def synthetic_video(video_dir: str, duration_sec: float, resolution: str) -> str:
+    """Cached synthetic video for this (length, resolution)."""
+    width, height = (int(x) for x in resolution.split("x"))
+    path = Path(video_dir) / f"synthetic_{int(duration_sec)}s_{width}x{height}.mp4"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        make_synthetic_video(str(path), duration_sec, width, height)
+    return str(path)
+
+
+def run_case(video_path: str, base_url: str, args: Dict[str, Any]) -> Dict[str, Any]:
+    """One benchmark case; meant to run in its own process."""
+    timings = dict.fromkeys(STAGES, 0.0)
+    stats = SamplerStats()
+    contents: List[Dict[str, str]] = []
+    jpeg_bytes = 0
+
+    t_start = time.perf_counter()
+    for _, _, frame in iter_sampled_frames(video_path, args["interval_sec"], args["limit"], mode=args["mode"], stats=stats):
+        t0 = time.perf_counter()
+        frame = resize_frame(frame, args["target_width"])
+        t1 = time.perf_counter()
+        jpeg = encode_jpeg(frame, args["jpeg_quality"])
+        t2 = time.perf_counter()
+        contents.append({"type": "input_image", "image_url": jpeg_to_data_url(jpeg)})
+        t3 = time.perf_counter()
+        timings["resize"] += t1 - t0
+        timings["jpeg"] += t2 - t1
+        timings["base64"] += t3 - t2
+        jpeg_bytes += len(jpeg)
+    timings["decode"] = stats.elapsed_sec
+
+    chunks = chunk_list(contents, args["chunk_size"])
+    t0 = time.perf_counter()
+    request_bytes = sum(len(json.dumps(make_message(chunk))) for chunk in chunks)
+    timings["serialize"] = time.perf_counter() - t0
+
+    async def _model():
+        client = AsyncOpenAI(base_url=base_url, api_key="stub", max_retries=0)
+        classifier = AsyncChunkClassifier(client, max_concurrency=args["max_concurrency"], verbose=False)
+        await classifier.classify_chunks(chunks)
+
+    t0 = time.perf_counter()
+    asyncio.run(_model())
+    timings["model"] = time.perf_counter() - t0
+    total = time.perf_counter() - t_start
+
+    n = len(contents)
+    return {
+        "frames": n,
+        "chunks": len(chunks),
+        "stage_sec": timings,
+        "total_sec": total,
+        "client_sec": total - timings["model"],
+        "frames_per_sec": n / total if total else 0.0,
+        "client_frames_per_sec": n / (total - timings["model"]) if total > timings["model"] else 0.0,
+        "decode_fps": stats.decode_fps,
+        "jpeg_mb": jpeg_bytes / 1e6,
+        "request_mb": request_bytes / 1e6,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # ru_maxrss is KiB on Linux
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Revision of this checkout, wherever the benchmark is run from."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    lengths: List[float],
+    resolutions: List[str],
+    video_dir: str,
+    latency_sec: float,
+    latency_jitter_sec: float,
+    case_args: Dict[str, Any],
+) -> Dict[str, Any]:
+    cases = []
+    with StubOpenAIServer(latency_sec=latency_sec, latency_jitter_sec=latency_jitter_sec) as server:
+        for length in lengths:
+            for resolution in resolutions:
+                video_path = synthetic_video(video_dir, length, resolution)
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    result = pool.submit(run_case, video_path, server.base_url, case_args).result()
+                result.update({"case": f"{int(length)}s@{resolution}", "length_sec": length, "resolution": resolution})
+                cases.append(result)
+                rich_print(f"[bold]{result['case']}[/]: {result['total_sec']:.2f}s, {result['frames_per_sec']:.1f} frames/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+    return {
+        "revision": git_revision(),
+        "created_at": time.time(),
+        "latency_sec": latency_sec,
+        "latency_jitter_sec": latency_jitter_sec,
+        "params": case_args,
+        "cases": cases,
+    }
+
+
+def _delta(new: float, old: Optional[float], higher_is_better: bool = False) -> str:
+    if not old:
+        return ""
+    pct = 100 * (new - old) / old
+    worse = -pct if higher_is_better else pct
+    colour = "red" if worse > 5 else "green" if worse < -5 else "dim"
+    return f" [{colour}]{pct:+.0f}%[/{colour}]"
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Per-case table; with `baseline`, each time/RSS cell shows its % change (red = worse by >5%)."""
+    old_cases = {c["case"]: c for c in (baseline or {}).get("cases", [])}
+    title = f"rev {report['revision']}, model latency {report['latency_sec']}s"
+    if baseline:
+        title += f" vs rev {baseline.get('revision')}"
+    table = Table(title=title)
+    for col in ["case", "frames", *[f"{s} s" for s in STAGES], "client fps", "total s", "peak RSS MB", "req MB"]:
+        table.add_column(col, justify="right")
+    for c in report["cases"]:
+        old = old_cases.get(c["case"], {})
+        old_stage = old.get("stage_sec", {})
+        table.add_row(
+            c["case"],
+            str(c["frames"]),
+            *[f"{c['stage_sec'][s]:.3f}{_delta(c['stage_sec'][s], old_stage.get(s))}" for s in STAGES],
+            f"{c['client_frames_per_sec']:.1f}{_delta(c['client_frames_per_sec'], old.get('client_frames_per_sec'), higher_is_better=True)}",
+            f"{c['total_sec']:.2f}{_delta(c['total_sec'], old.get('total_sec'))}",
+            f"{c['peak_rss_mb']:.0f}{_delta(c['peak_rss_mb'], old.get('peak_rss_mb'))}",
+            f"{c['request_mb']:.1f}",
+        )
+    rich_print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Video classifier throughput benchmark")
+    parser.add_argument("--lengths", type=float, nargs="+", default=DEFAULT_LENGTHS, help="Synthetic video lengths (sec)")
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS, help="WIDTHxHEIGHT")
+    parser.add_argument("--video-dir", default="data/bench/videos")
+    parser.add_argument("--latency-sec", type=float, default=2.0, help="Stub model latency per request")
+    parser.add_argument("--latency-jitter-sec", type=float, default=0.5)
+    parser.add_argument("--interval-sec", type=float, default=1.0)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--mode", default="auto")
+    parser.add_argument("--target-width", type=int, default=480)
+    parser.add_argument("--jpeg-quality", type=int, default=92)
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--label", default=None, help="Save results to data/bench/<label>.json")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    case_args = {
+        "interval_sec": args.interval_sec,
+        "limit": args.limit,
+        "mode": args.mode,
+        "target_width": args.target_width,
+        "jpeg_quality": args.jpeg_quality,
+        "chunk_size": args.chunk_size,
+        "max_concurrency": args.max_concurrency,
+    }
+    report = run_benchmark(args.lengths, args.resolutions, args.video_dir, args.latency_sec, args.latency_jitter_sec, case_args)
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+
+    if args.label:
+        out = Path("data/bench") / f"{args.label}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, indent=2))
+        rich_print(f"[bold]Saved[/]: {out}")
+
+
+if __name__ == "__main__":
+    main()
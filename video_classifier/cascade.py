@@ -0,0 +1,162 @@
+import time
+from statistics import mean
+from typing import Any, Dict, List, Optional, Sequence
+
+from rich import print as rich_print
+
+from aggregate import chunk_rating
+from async_inference import AsyncChunkClassifier, makespan
+from inference import MODEL, make_message, rating_rank
+from tokens import DEFAULT_BASE_LATENCY_SEC, DEFAULT_OUTPUT_TOKENS, DEFAULT_SEC_PER_INPUT_TOKEN, estimate_message_tokens
+
+
+SCREEN_MODEL = "gpt-5-mini"
+ELEVATED_SEVERITIES = ("moderate", "strong", "very_strong")
+
+
+class CascadePolicy:
+    """When a screening result is not trusted and the chunk goes to the full model."""
+
+    def __init__(
+        self,
+        escalate_at: str = "PG13",
+        elevated_severities: Sequence[str] = ELEVATED_SEVERITIES,
+        min_confidence: float = 0.7,
+    ):
+        self.escalate_at = escalate_at
+        self.elevated_severities = set(elevated_severities)
+        self.min_confidence = min_confidence
+
+    def escalation_reasons(self, parsed: Dict[str, Any]) -> List[str]:
+        reasons = []
+        rating = chunk_rating(parsed)
+        if rating_rank(rating) >= rating_rank(self.escalate_at) or rating_rank(rating) < 0:
+            reasons.append(f"rating={rating}")
+        for element, assessment in (parsed.get("element_assessments") or {}).items():
+            if isinstance(assessment, dict) and assessment.get("severity") in self.elevated_severities:
+                reasons.append(f"{element}={assessment['severity']}")
+        confidence = parsed.get("confidence")
+        if not isinstance(confidence, (int, float)) or confidence < self.min_confidence:
+            reasons.append(f"confidence={confidence}")
+        return reasons
+
+
+class CascadeClassifier:
+    """Screen every chunk with a cheap model; re-classify only doubtful chunks with the full model.
+
+    Returns per-chunk results in chunk order (the full-model result when escalated) and a
+    report of escalation rate, wall time and token use against an all-`full_model` baseline.
+    The baseline prices chunks the full model did not see at the mean observed full-model latency,
+    else `full_latency_sec` (e.g. measured on an earlier run), else the tokens.py latency model.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        screen_model: str = SCREEN_MODEL,
+        full_model: str = MODEL,
+        screen_params: Optional[Dict[str, Any]] = None,
+        full_params: Optional[Dict[str, Any]] = None,
+        policy: Optional[CascadePolicy] = None,
+        full_latency_sec: Optional[float] = None,
+        verbose: bool = True,
+        **classifier_kwargs,
+    ):
+        if screen_params is None:
+            screen_params = {"reasoning": {"effort": "minimal"}}
+        self.screen = AsyncChunkClassifier(
+            client, model=screen_model, request_params=screen_params, verbose=verbose, **classifier_kwargs,
+        )
+        self.full = AsyncChunkClassifier(
+            self.screen.client, model=full_model, request_params=full_params, verbose=verbose, **classifier_kwargs,
+        )
+        self.policy = policy or CascadePolicy()
+        self.full_latency_sec = full_latency_sec
+        self.verbose = verbose
+
+    async def classify_chunks(self, content_chunks: Sequence[Sequence[Dict[str, str]]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        screened = await self.screen.classify_chunks(content_chunks)
+        t_screen = time.perf_counter() - t0
+
+        escalate: Dict[int, List[str]] = {}
+        for r in screened:
+            reasons = self.policy.escalation_reasons(r["parsed"])
+            if reasons:
+                escalate[r["chunk_idx"]] = reasons
+
+        t1 = time.perf_counter()
+        escalated_idx = sorted(escalate)
+        full_results = await self.full.classify_chunks([content_chunks[i] for i in escalated_idx])
+        full_by_idx = {idx: r for idx, r in zip(escalated_idx, full_results)}
+        t_full = time.perf_counter() - t1
+
+        results = []
+        for r in screened:
+            idx = r["chunk_idx"]
+            final = dict(full_by_idx[idx], chunk_idx=idx) if idx in full_by_idx else r
+            results.append({
+                **final,
+                "tier": "full" if idx in full_by_idx else "screen",
+                "escalation_reasons": escalate.get(idx, []),
+                "screen_rating": r["parsed"].get("rating"),
+            })
+
+        report = self.report(content_chunks, screened, full_by_idx, t_screen, t_full)
+        return {"results": results, "report": report}
+
+    def estimated_full_latency(self, observed: Sequence[float], content_chunk: Sequence[Dict[str, str]]) -> float:
+        """Full-model latency for a chunk it did not run: mean observed, else configured, else modelled."""
+        if observed:
+            return mean(observed)
+        if self.full_latency_sec is not None:
+            return self.full_latency_sec
+        input_tokens = estimate_message_tokens(make_message(content_chunk), self.full.model)
+        return DEFAULT_BASE_LATENCY_SEC + DEFAULT_SEC_PER_INPUT_TOKEN * input_tokens
+
+    def report(self, content_chunks, screened, full_by_idx, t_screen: float, t_full: float) -> Dict[str, Any]:
+        tokens = lambda rs: sum(r["usage"].get("total_tokens", 0) for r in rs)
+        n = len(screened)
+        full_results = list(full_by_idx.values())
+        full_total = [r["usage"].get("total_tokens", 0) for r in full_results if r["usage"]]
+        full_output = [r["usage"].get("output_tokens", 0) for r in full_results if r["usage"]]
+        full_latency = [r["latency_sec"] for r in full_results if not r.get("from_cache")]
+        screen_latency = [r["latency_sec"] for r in screened if not r.get("from_cache")]
+
+        # baseline: escalated chunks as billed, the rest priced as full-model input + the mean observed full output
+        est_output = mean(full_output) if full_output else DEFAULT_OUTPUT_TOKENS
+        baseline_tokens = sum(full_total) + sum(
+            estimate_message_tokens(make_message(content_chunks[idx]), self.full.model) + est_output
+            for idx in range(n)
+            if idx not in full_by_idx
+        )
+        cascade_tokens = tokens(screened) + tokens(full_results)
+
+        # baseline wall: every chunk on the full model (observed latency if escalated, else `estimated_full_latency`)
+        # scheduled on the full classifier's concurrency cap
+        by_idx = {idx: r["latency_sec"] for idx, r in full_by_idx.items() if not r.get("from_cache")}
+        baseline_wall = makespan(
+            [by_idx[idx] if idx in by_idx else self.estimated_full_latency(full_latency, content_chunks[idx]) for idx in range(n)],
+            self.full.max_concurrency,
+        )
+
+        report = {
+            "num_chunks": n,
+            "num_escalated": len(full_results),
+            "escalation_rate": len(full_results) / n if n else 0.0,
+            "screen_wall_sec": t_screen,
+            "full_wall_sec": t_full,
+            "cascade_wall_sec": t_screen + t_full,
+            "mean_screen_chunk_latency_sec": mean(screen_latency) if screen_latency else None,
+            "mean_full_chunk_latency_sec": mean(full_latency) if full_latency else None,
+            "screen_tokens": tokens(screened),
+            "full_tokens": tokens(full_results),
+            "cascade_tokens": cascade_tokens,
+            "est_baseline_tokens": baseline_tokens,
+            "est_tokens_saved": baseline_tokens - cascade_tokens,
+            "est_baseline_wall_sec": baseline_wall,
+            "est_wall_sec_saved": baseline_wall - (t_screen + t_full),
+        }
+        if self.verbose:
+            rich_print(report)
+        return report
@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rich import print as rich_print
+
+from aggregate import chunk_rating
+from async_inference import AsyncChunkClassifier
+from cascade import CascadePolicy
+from frames import extract_encoded_window, iter_encoded_frames, make_image_content
+from inference import RATINGS, chunk_list, rating_rank
+
+
+EncodedFrame = Tuple[int, float, bytes]
+
+
+def group_by_window(frames: Sequence[EncodedFrame], window_sec: float) -> List[Tuple[float, float, List[EncodedFrame]]]:
+    """Bucket frames into consecutive `[k * window_sec, (k + 1) * window_sec)` windows (empty ones dropped)."""
+    windows: Dict[int, List[EncodedFrame]] = {}
+    for frame in frames:
+        windows.setdefault(int(frame[1] // window_sec), []).append(frame)
+    return [(k * window_sec, (k + 1) * window_sec, windows[k]) for k in sorted(windows)]
+
+
+def max_rating(parsed_lst: Sequence[Dict[str, Any]]) -> Optional[str]:
+    ranks = [rating_rank(chunk_rating(p)) for p in parsed_lst]
+    ranks = [r for r in ranks if r >= 0]
+    return RATINGS[max(ranks)] if ranks else None
+
+
+class CoarseToFineClassifier:
+    """Two-pass temporal sampling.
+
+    Pass 1 samples the whole film every `coarse_interval_sec` at `coarse_width` and classifies
+    one chunk per `window_sec` window. Windows the coarse result flags (per `policy`, same rules
+    as the cascade's escalation) are re-sampled every `fine_interval_sec` at `fine_width` and
+    classified again in `fine_chunk_size`-frame chunks; their final rating is the fine result.
+    """
+
+    def __init__(
+        self,
+        classifier: Optional[AsyncChunkClassifier] = None,
+        policy: Optional[CascadePolicy] = None,
+        window_sec: float = 120.0,
+        coarse_interval_sec: float = 8.0,
+        coarse_width: int = 320,
+        fine_interval_sec: float = 1.0,
+        fine_width: int = 480,
+        fine_chunk_size: int = 32,
+        jpeg_quality: int = 92,
+        verbose: bool = True,
+    ):
+        self.classifier = classifier or AsyncChunkClassifier(verbose=verbose)
+        self.policy = policy or CascadePolicy()
+        self.window_sec = window_sec
+        self.coarse_interval_sec = coarse_interval_sec
+        self.coarse_width = coarse_width
+        self.fine_interval_sec = fine_interval_sec
+        self.fine_width = fine_width
+        self.fine_chunk_size = fine_chunk_size
+        self.jpeg_quality = jpeg_quality
+        self.verbose = verbose
+
+    async def classify_video(self, video_path: str) -> Dict[str, Any]:
+        coarse_frames = list(iter_encoded_frames(
+            video_path, self.coarse_interval_sec, jpeg_quality=self.jpeg_quality,
+            target_width=self.coarse_width, verbose=False,
+        ))
+        windows = group_by_window(coarse_frames, self.window_sec)
+        coarse_chunks = [[make_image_content(jpeg) for _, _, jpeg in frames] for _, _, frames in windows]
+        coarse_results = await self.classifier.classify_chunks(coarse_chunks)
+
+        out_windows = []
+        fine_jobs: List[Tuple[int, int]] = []  # (window index, fine chunk index within the flat list)
+        fine_chunks: List[List[Dict[str, str]]] = []
+        for w_idx, ((start_sec, end_sec, frames), result) in enumerate(zip(windows, coarse_results)):
+            reasons = self.policy.escalation_reasons(result["parsed"])
+            out_windows.append({
+                "start_sec": start_sec,
+                "end_sec": end_sec,
+                "coarse_frames": len(frames),
+                "coarse": result["parsed"],
+                "refined": bool(reasons),
+                "refine_reasons": reasons,
+                "fine": [],
+            })
+            if not reasons:
+                continue
+            fine_frames = extract_encoded_window(
+                video_path, start_sec, end_sec, self.fine_interval_sec, self.jpeg_quality, self.fine_width,
+            )
+            for chunk in chunk_list([make_image_content(jpeg) for _, _, jpeg in fine_frames], self.fine_chunk_size):
+                fine_jobs.append((w_idx, len(fine_chunks)))
+                fine_chunks.append(chunk)
+
+        if self.verbose:
+            n_refined = sum(w["refined"] for w in out_windows)
+            rich_print(f"[bold]coarse pass[/]: {len(out_windows)} windows, {n_refined} flagged for refinement ({len(fine_chunks)} fine chunks)")
+
+        fine_results = await self.classifier.classify_chunks(fine_chunks) if fine_chunks else []
+        for (w_idx, _), result in zip(fine_jobs, fine_results):
+            out_windows[w_idx]["fine"].append(result["parsed"])
+
+        for w in out_windows:
+            w["rating"] = max_rating(w["fine"]) if w["refined"] and w["fine"] else chunk_rating(w["coarse"])
+
+        return {
+            "video_path": str(video_path),
+            "rating": max_rating([{"rating": w["rating"]} for w in out_windows]),
+            "windows": out_windows,
+            "refined_windows": [(w["start_sec"], w["end_sec"]) for w in out_windows if w["refined"]],
+            "num_coarse_frames": len(coarse_frames),
+            "num_fine_chunks": len(fine_chunks),
+        }
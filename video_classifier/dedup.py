@@ -0,0 +1,125 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from rich import print as rich_print
+
+from frames import content_jpeg_bytes
+from inference import MODEL
+from tokens import image_tokens
+
+
+@dataclass
+class DedupStats:
+    frames_in: int = 0
+    frames_kept: int = 0
+    dropped_duplicate: int = 0
+    dropped_black: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def frames_dropped(self) -> int:
+        return self.dropped_duplicate + self.dropped_black
+
+    def report(self, name: str = "") -> None:
+        pct = 100.0 * self.frames_dropped / self.frames_in if self.frames_in else 0.0
+        rich_print(
+            f"[bold]dedup[/] {name} kept {self.frames_kept}/{self.frames_in} frames "
+            f"(dropped {self.dropped_duplicate} near-duplicate, {self.dropped_black} black, {pct:.1f}%), "
+            f"~{self.tokens_saved} image tokens saved"
+        )
+
+
+def phash(frame: np.ndarray, hash_size: int = 8) -> int:
+    """64-bit perceptual hash: DCT of a 32x32 greyscale thumbnail, low frequencies vs their median."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    size = hash_size * 4
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FrameDeduplicator:
+    """Drop frames that are near-identical to the last kept frame, and (optionally) black frames.
+
+    `hash_threshold` is the max Hamming distance (out of 64 bits) between perceptual
+    hashes for two frames to count as the same shot; 0 only merges exact matches.
+    `max_run` keeps one frame out of every `max_run` consecutive duplicates so long
+    static scenes are still sampled occasionally (None = never).
+    State and `stats` are per video: `reset` starts the next one (the frames.py extractors call it).
+    """
+
+    def __init__(
+        self,
+        hash_threshold: int = 6,
+        drop_black: bool = True,
+        black_threshold: float = 16.0,
+        max_run: Optional[int] = None,
+        model: str = MODEL,
+    ):
+        self.hash_threshold = hash_threshold
+        self.drop_black = drop_black
+        self.black_threshold = black_threshold
+        self.max_run = max_run
+        self.model = model
+        self.stats = DedupStats()
+        self._last_hash: Optional[int] = None
+        self._run = 0
+
+    def reset(self) -> None:
+        """Start a new video: forget the last kept frame and zero `stats`."""
+        self.stats = DedupStats()
+        self._last_hash = None
+        self._run = 0
+
+    def _count_saved(self, frame: np.ndarray) -> None:
+        h, w = frame.shape[:2]
+        self.stats.tokens_saved += image_tokens(w, h, model=self.model)
+
+    def keep(self, frame: np.ndarray) -> bool:
+        """Return True if `frame` should be sent to the model."""
+        self.stats.frames_in += 1
+
+        if self.drop_black and float(frame.mean()) < self.black_threshold:
+            self.stats.dropped_black += 1
+            self._count_saved(frame)
+            return False
+
+        h = phash(frame)
+        if self._last_hash is not None and hamming(h, self._last_hash) <= self.hash_threshold:
+            self._run += 1
+            if self.max_run is None or self._run < self.max_run:
+                self.stats.dropped_duplicate += 1
+                self._count_saved(frame)
+                return False
+
+        self._last_hash = h
+        self._run = 0
+        self.stats.frames_kept += 1
+        return True
+
+
+def decode_content(content: Dict[str, Any]) -> np.ndarray:
+    """Pixels of a raw or data-URL `input_image` part."""
+    return cv2.imdecode(np.frombuffer(content_jpeg_bytes(content), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def dedup_timed_contents(
+    timed: List[Tuple[Optional[float], Dict[str, str]]],
+    deduplicator: Optional[FrameDeduplicator] = None,
+    verbose: bool = True,
+) -> List[Tuple[Optional[float], Dict[str, str]]]:
+    """Dedup one video's already-encoded `(timestamp_sec, content)` pairs (e.g. from the parallel
+    extractor or the frame cache); kept frames keep their timestamps."""
+    deduplicator = deduplicator or FrameDeduplicator()
+    deduplicator.reset()
+    out = [(ts, c) for ts, c in timed if deduplicator.keep(decode_content(c))]
+    if verbose:
+        deduplicator.stats.report()
+    return out
@@ -0,0 +1,309 @@
+import os
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import yt_dlp
+from yt_dlp.extractor import gen_extractor_classes
+from yt_dlp.utils import download_range_func, make_archive_id
+from rich import print as rich_print
+from rich.table import Table
+
+
+# Progressive MP4 first; otherwise merge best streams and remux to mp4 (requires ffmpeg)
+DEFAULT_FORMAT = "best[ext=mp4]/bv*[ext=mp4]+ba[ext=m4a]/b/bv*+ba"
+AUDIO_EXT_FOR = {"mp4": "m4a", "webm": "webm"}
+
+
+def ensure_directory(path: str) -> None:
+    """Create directory if it does not exist."""
+    os.makedirs(path, exist_ok=True)
+
+
+def _has_video(f: Dict[str, Any]) -> bool:
+    return f.get("vcodec") not in (None, "none") and bool(f.get("width"))
+
+
+def _has_audio(f: Dict[str, Any]) -> bool:
+    return f.get("acodec") not in (None, "none")
+
+
+def pick_video_format(formats: Sequence[Dict[str, Any]], target_width: int, audio: bool = True) -> Optional[Dict[str, Any]]:
+    """Smallest video format at least `target_width` wide (largest available if none is).
+
+    Ties on width go to mp4, then progressive (has audio, when `audio`), then lower bitrate.
+    Formats that report no width (e.g. a direct file link) fall back to yt-dlp's best (last) one.
+    """
+    videos = [f for f in formats if _has_video(f)]
+    if not videos:
+        return formats[-1] if formats else None
+    wide_enough = [f for f in videos if f["width"] >= target_width]
+    width = min(f["width"] for f in wide_enough) if wide_enough else max(f["width"] for f in videos)
+    candidates = [f for f in videos if f["width"] == width]
+    return min(
+        candidates,
+        key=lambda f: (
+            f.get("ext") != "mp4",
+            audio and not _has_audio(f),
+            f.get("tbr") or f.get("vbr") or float("inf"),
+        ),
+    )
+
+
+def make_format_selector(target_width: int, audio: bool = True):
+    """yt-dlp `format` callable: `pick_video_format`, merged with the smallest matching audio stream if needed."""
+
+    def _selector(ctx: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        formats = ctx.get("formats") or []
+        video = pick_video_format(formats, target_width, audio)
+        if video is None:
+            return
+        if not audio or _has_audio(video):
+            yield video
+            return
+        audio_ext = AUDIO_EXT_FOR.get(video.get("ext"))
+        audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+        audios = [f for f in audios if f.get("ext") == audio_ext] or audios
+        if not audios:
+            yield video
+            return
+        best_audio = min(audios, key=lambda f: f.get("abr") or f.get("tbr") or float("inf"))
+        yield {
+            "format_id": f"{video['format_id']}+{best_audio['format_id']}",
+            "ext": video.get("ext"),
+            "requested_formats": [video, best_audio],
+            "protocol": f"{video.get('protocol')}+{best_audio.get('protocol')}",
+        }
+
+    return _selector
+
+
+def download_youtube_to_mp4(
+    url: str,
+    output_dir: str,
+    filename_stem: Optional[str] = None,
+    target_width: Optional[int] = None,
+    sections: Optional[List[Tuple[float, float]]] = None,
+    limit_sec: Optional[float] = None,
+    audio: bool = True,
+    quiet: bool = False,
+    archive_path: Optional[str] = None,
+) -> str:
+    """Download a YouTube video and save as mp4 in output_dir.
+
+    Tries to prefer mp4 formats; falls back to best available and remuxes to mp4 when possible.
+    - `target_width`: take the smallest format at least this wide instead of the best one
+      (match it to the classifier's `target_width`)
+    - `sections` / `limit_sec`: only fetch these `(start_sec, end_sec)` ranges / the first `limit_sec` seconds
+      (cut on keyframes with ffmpeg); several ranges are saved as `<stem>.<start>-<end>.mp4`, the last one is returned
+    - `audio=False`: video stream only; frame sampling never reads the audio
+    - `archive_path`: yt-dlp download archive; IDs listed there are skipped, finished ones appended
+      (downloads limited by the options above use their own archive, see `options_archive_path`)
+    Returns the path to the resulting file if it can be determined, otherwise the directory.
+    """
+
+    ensure_directory(output_dir)
+
+    # Build output template
+    if filename_stem:
+        # Ensure .mp4 extension in final name
+        outtmpl = os.path.join(output_dir, f"{filename_stem}.%(ext)s")
+    else:
+        # Use YouTube title; yt-dlp will set the extension
+        outtmpl = os.path.join(output_dir, "%(title)s.%(ext)s")
+
+    if target_width is not None:
+        format_selector = make_format_selector(target_width, audio)
+    else:
+        format_selector = DEFAULT_FORMAT if audio else "bv*[ext=mp4]/bv*/b"
+
+    if limit_sec is not None:
+        sections = [(s, min(e, limit_sec)) for s, e in sections or [(0, limit_sec)] if s < limit_sec]
+    if sections and len(sections) > 1:
+        # one file per range; the name keeps the range so frame timestamps can be offset back
+        root, ext = os.path.splitext(outtmpl)
+        outtmpl = f"{root}.%(section_start)d-%(section_end)d{ext}"
+
+    # Track final file path via hooks because postprocessors may change extension
+    final_path_container: dict[str, Path] = {}
+
+    def _hook(d: dict) -> None:
+        if d.get("status") == "finished":
+            filename = d.get("filename")
+            if filename:
+                final_path_container["path"] = Path(filename)
+
+    ydl_opts: dict = {
+        "format": format_selector,
+        "outtmpl": outtmpl,
+        "noplaylist": True,
+        "merge_output_format": "mp4",
+        "postprocessors": [
+            {"key": "FFmpegVideoRemuxer", "preferedformat": "mp4"},
+        ],
+        "progress_hooks": [_hook],
+        "quiet": quiet,
+        "noprogress": quiet,
+    }
+    if archive_path:
+        ydl_opts["download_archive"] = options_archive_path(archive_path, target_width, sections, limit_sec, audio)
+    if sections:
+        ydl_opts["download_ranges"] = download_range_func(None, [(float(s), float(e)) for s, e in sections])
+        ydl_opts["force_keyframes_at_cuts"] = True
+
+    rich_print(f"[bold green]Downloading[/] → {url}")
+    rich_print(f"[bold]Output dir[/]: {output_dir}")
+    if target_width is not None or sections:
+        rich_print(f"[bold]target_width[/]: {target_width}  [bold]sections[/]: {sections}  [bold]audio[/]: {audio}")
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+
+    # Try to resolve the final mp4 path
+    if "path" in final_path_container:
+        candidate = final_path_container["path"]
+    else:
+        # Fallback: construct from prepared filename
+        with yt_dlp.YoutubeDL({"outtmpl": outtmpl}) as ydl:
+            prepared = Path(ydl.prepare_filename(info))
+        candidate = prepared
+
+    # Normalize to .mp4 if remuxed
+    mp4_candidate = candidate.with_suffix(".mp4")
+    if mp4_candidate.exists():
+        rich_print(f"[bold green]Saved[/]: {mp4_candidate}")
+        return mp4_candidate
+
+    # If not mp4, return whatever was produced
+    if candidate.exists():
+        rich_print(f"[yellow]Saved (non-mp4)[/]: {candidate}")
+        return candidate
+
+    rich_print("[red]Could not determine final file path, but download likely completed.[/]")
+    return output_dir
+
+
+def archive_id(url: str) -> Optional[str]:
+    """yt-dlp archive ID (`"<extractor> <video id>"`) for a URL, resolved offline when the extractor can,
+    otherwise from a metadata-only extraction. None if the URL cannot be resolved."""
+    for ie in gen_extractor_classes():
+        if ie.suitable(url):
+            temp_id = ie.get_temp_id(url)
+            if temp_id:
+                return make_archive_id(ie.ie_key(), temp_id)
+            break
+    try:
+        with yt_dlp.YoutubeDL({"quiet": True, "noplaylist": True}) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+    except yt_dlp.utils.DownloadError:
+        return None
+    return make_archive_id(info["extractor_key"], info["id"])
+
+
+def options_archive_path(
+    archive_path: str,
+    target_width: Optional[int] = None,
+    sections: Optional[List[Tuple[float, float]]] = None,
+    limit_sec: Optional[float] = None,
+    audio: bool = True,
+) -> str:
+    """Archive file for downloads made with these options (`archive.txt` -> `archive.w480-l120.txt`).
+
+    A clipped, narrower or video-only file is not the full video, so a later request with other
+    options must not find its ID archived; full downloads keep using `archive_path` itself.
+    """
+    tags = []
+    if target_width is not None:
+        tags.append(f"w{target_width}")
+    if sections:
+        tags.append("s" + "_".join(f"{float(s):g}-{float(e):g}" for s, e in sections))
+    if limit_sec is not None:
+        tags.append(f"l{float(limit_sec):g}")
+    if not audio:
+        tags.append("noaudio")
+    if not tags:
+        return archive_path
+    root, ext = os.path.splitext(archive_path)
+    return f"{root}.{'-'.join(tags)}{ext}"
+
+
+def read_archive(archive_path: str) -> set:
+    if not os.path.exists(archive_path):
+        return set()
+    with open(archive_path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def download_batch(
+    urls: Sequence[str],
+    output_dir: str,
+    workers: int = 4,
+    archive_path: Optional[str] = "data/YT_download/archive.txt",
+    **download_kwargs,
+) -> List[Dict[str, Any]]:
+    """Download many URLs concurrently with `download_youtube_to_mp4`.
+
+    URLs are first resolved to archive IDs (in parallel); duplicates within the list and IDs
+    already in the archive for these options (`options_archive_path`) are skipped without downloading. Returns one record per URL with
+    `status` (downloaded / archived / duplicate / failed), path, bytes, seconds and MB/s.
+    `download_kwargs` go to `download_youtube_to_mp4` (target_width, limit_sec, audio, ...).
+    """
+    ensure_directory(output_dir)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ids = list(pool.map(archive_id, urls))
+
+    archive_opts = {k: download_kwargs[k] for k in ("target_width", "sections", "limit_sec", "audio") if k in download_kwargs}
+    archived = read_archive(options_archive_path(archive_path, **archive_opts)) if archive_path else set()
+    records: List[Dict[str, Any]] = []
+    todo: List[Dict[str, Any]] = []
+    seen = set()
+    for url, vid in zip(urls, ids):
+        record = {"url": url, "archive_id": vid, "path": None, "bytes": 0, "sec": 0.0, "mb_per_sec": None, "error": None}
+        if vid is not None and vid in archived:
+            record["status"] = "archived"
+        elif vid is not None and vid in seen:
+            record["status"] = "duplicate"
+        else:
+            record["status"] = "pending"
+            todo.append(record)
+        if vid is not None:
+            seen.add(vid)
+        records.append(record)
+
+    download_kwargs.setdefault("quiet", True)
+
+    def _download(record: Dict[str, Any]) -> None:
+        t0 = time.perf_counter()
+        try:
+            path = download_youtube_to_mp4(record["url"], output_dir, archive_path=archive_path, **download_kwargs)
+        except Exception as e:
+            record.update(status="failed", error=str(e), sec=time.perf_counter() - t0)
+            rich_print(f"[red]failed[/] {record['url']}: {e}")
+            return
+        sec = time.perf_counter() - t0
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        record.update(
+            status="downloaded", path=str(path), bytes=size, sec=sec,
+            mb_per_sec=size / 1e6 / sec if sec > 0 else None,
+        )
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_download, todo))
+    print_batch_report(records, time.perf_counter() - t0)
+    return records
+
+
+def print_batch_report(records: Sequence[Dict[str, Any]], wall_sec: float) -> None:
+    table = Table(title="downloads")
+    for col in ["url", "status", "MB", "sec", "MB/s"]:
+        table.add_column(col, justify="left" if col in ("url", "status") else "right")
+    for r in records:
+        table.add_row(
+            r["url"], r["status"], f"{r['bytes'] / 1e6:.1f}", f"{r['sec']:.1f}",
+            f"{r['mb_per_sec']:.1f}" if r["mb_per_sec"] else "",
+        )
+    rich_print(table)
+    total_mb = sum(r["bytes"] for r in records) / 1e6
+    rich_print(f"[bold]{total_mb:.1f} MB in {wall_sec:.1f}s[/] ({total_mb / wall_sec if wall_sec else 0:.1f} MB/s aggregate)")
@@ -0,0 +1,46 @@
+from typing import Any, Dict, Optional
+
+from aggregate import FilmAggregator
+from inference import RATINGS, rating_rank
+
+
+class EarlyStopPolicy:
+    """Decide when the remaining chunks can no longer change the film's verdict.
+
+    The film rating is the max over chunks, so once any chunk reaches `stop_at`
+    (default "Refused", the highest possible outcome) nothing else matters.
+    `floor_run` adds a "good enough" rule: stop after that many consecutive chunks
+    (by chunk index) all sit at the current maximum rating, optionally only once the
+    maximum is at least `min_floor`.
+    """
+
+    def __init__(self, stop_at: str = "Refused", floor_run: Optional[int] = None, min_floor: Optional[str] = None):
+        if rating_rank(stop_at) < 0:
+            raise ValueError(f"stop_at must be one of {RATINGS}, got {stop_at!r}")
+        if min_floor is not None and rating_rank(min_floor) < 0:
+            raise ValueError(f"min_floor must be one of {RATINGS}, got {min_floor!r}")
+        self.stop_at = stop_at
+        self.floor_run = floor_run
+        self.min_floor = min_floor
+
+    def check_aggregate(self, aggregator: FilmAggregator) -> Optional[str]:
+        """Return a stop reason from the running film aggregate, or None to continue."""
+        max_rank = aggregator.max_rank
+        if max_rank < 0:
+            return None
+        if max_rank >= rating_rank(self.stop_at):
+            return f"reached {RATINGS[max_rank]} (>= {self.stop_at})"
+        if self.floor_run is None:
+            return None
+        if self.min_floor is not None and max_rank < rating_rank(self.min_floor):
+            return None
+        if aggregator.run_at_max >= self.floor_run:
+            return f"{aggregator.run_at_max} consecutive chunks at {RATINGS[max_rank]}"
+        return None
+
+    def check(self, parsed_by_idx: Dict[int, Dict[str, Any]]) -> Optional[str]:
+        """Same as `check_aggregate` from a dict of finished chunks (rebuilds the aggregate)."""
+        aggregator = FilmAggregator()
+        for idx in sorted(parsed_by_idx):
+            aggregator.update(idx, parsed_by_idx[idx])
+        return self.check_aggregate(aggregator)
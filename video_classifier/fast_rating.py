@@ -0,0 +1,238 @@
+import json
+import time
+from typing import Any, Dict, List, Sequence
+
+from rich import print as rich_print
+
+from async_inference import AsyncChunkClassifier
+from inference import cached_tokens, make_message, usage_to_dict
+from response_cache import request_key
+from schema import CHUNK_JSON_SCHEMA, CHUNK_TEXT_FORMAT, STRUCTURED_REQUEST_PARAMS
+from tokens import CHARS_PER_TOKEN
+
+
+# Visible (non-reasoning) output of a full chunk result: 1896 output - 1280 reasoning tokens in the notebook.
+DEFAULT_VISIBLE_OUTPUT_TOKENS = 616
+VERDICT_PATHS = ("rating", "refusal.is_refused")
+_SCALAR_CHARS = set("+-0123456789.eEtrufalsn")
+
+
+def rating_first_schema(schema: Dict[str, Any], first: Sequence[str] = ("rating", "refusal")) -> Dict[str, Any]:
+    """`schema` with the `first` top-level properties moved to the front. Structured outputs emit
+    keys in schema order, so the verdict is streamed before the long element assessments."""
+    props = schema["properties"]
+    order = [k for k in first if k in props] + [k for k in props if k not in first]
+    return {**schema, "properties": {k: props[k] for k in order}, "required": order}
+
+
+# Same fields and validation as `schema.CHUNK_TEXT_FORMAT`, verdict first: `is_refused` lands
+# around char 50 of the output instead of ~1300 of ~1600 with the prompts.py field order.
+RATING_FIRST_TEXT_FORMAT = {**CHUNK_TEXT_FORMAT, "schema": rating_first_schema(CHUNK_JSON_SCHEMA)}
+
+
+class IncrementalJSONScanner:
+    """Feed a JSON document in arbitrary pieces; every scalar is recorded under its dotted path
+    (e.g. `"refusal.is_refused"`, `"consumer_advice.0"`) in `values` as soon as it is complete.
+
+    Text before the first `{` (e.g. a ```json fence) is ignored. `done` is set when the
+    top-level object closes.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Any] = {}
+        self.done = False
+        self.chars_seen = 0
+        self._stack: List[Dict[str, Any]] = []  # {"kind": "obj"|"arr", "key"/"idx", "expect_key"}
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._buf: List[str] = []
+        self._scalar: List[str] = []
+
+    def _path(self) -> str:
+        return ".".join(str(f["key"] if f["kind"] == "obj" else f["idx"]) for f in self._stack)
+
+    def _emit(self, value: Any) -> None:
+        if self._stack:
+            self.values[self._path()] = value
+
+    def _finish_scalar(self) -> None:
+        raw = "".join(self._scalar)
+        self._scalar = []
+        try:
+            self._emit(json.loads(raw))
+        except json.JSONDecodeError:
+            pass
+
+    def feed(self, text: str) -> None:
+        for c in text:
+            self.chars_seen += 1
+            if self.done:
+                return
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._buf.append(c)
+                elif c == "\\":
+                    self._escape = True
+                    self._buf.append(c)
+                elif c == '"':
+                    self._in_string = False
+                    value = json.loads('"' + "".join(self._buf) + '"')
+                    if self._string_is_key:
+                        self._stack[-1]["key"] = value
+                    else:
+                        self._emit(value)
+                else:
+                    self._buf.append(c)
+                continue
+            if self._scalar:
+                if c in _SCALAR_CHARS:
+                    self._scalar.append(c)
+                    continue
+                self._finish_scalar()
+            if not self._stack and c != "{":
+                continue  # preamble before the top-level object
+            if c == "{":
+                self._stack.append({"kind": "obj", "key": None, "expect_key": True})
+            elif c == "[":
+                self._stack.append({"kind": "arr", "idx": 0})
+            elif c in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+            elif c == '"':
+                top = self._stack[-1]
+                self._in_string = True
+                self._string_is_key = top["kind"] == "obj" and top["expect_key"]
+                self._buf = []
+            elif c == ":":
+                self._stack[-1]["expect_key"] = False
+            elif c == ",":
+                top = self._stack[-1]
+                if top["kind"] == "obj":
+                    top["expect_key"] = True
+                else:
+                    top["idx"] += 1
+            elif c in _SCALAR_CHARS:
+                self._scalar = [c]
+
+
+def verdict_from_values(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Minimal chunk result in the prompts.py shape (enough for `aggregate.chunk_rating` / `FilmAggregator`)."""
+    return {
+        "rating": values.get("rating"),
+        "refusal": {"is_refused": bool(values.get("refusal.is_refused"))},
+    }
+
+
+class RatingOnlyClassifier(AsyncChunkClassifier):
+    """Triage mode: stream each chunk's response and stop reading once `rating` and
+    `refusal.is_refused` have been parsed, closing the stream instead of waiting for the
+    element assessments, advice and edits that follow. Requests use `RATING_FIRST_TEXT_FORMAT`
+    (unless `request_params` sets its own `text`) so those two fields come first in the output.
+
+    Same prompt (and prompt-cache prefix), concurrency, rate limits and retries as
+    `AsyncChunkClassifier`. Full results already in `response_cache` are used; rating-only
+    results are never written to it. Per chunk it reports `time_to_verdict_sec` and an
+    estimate of the output tokens skipped, against `expected_output_tokens` of visible output.
+    """
+
+    def __init__(self, *args, expected_output_tokens: int = DEFAULT_VISIBLE_OUTPUT_TOKENS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expected_output_tokens = expected_output_tokens
+        # full results cached by a normal run with the same params are still hits
+        self.cache_params = self.request_params
+        if self.request_params.get("text", STRUCTURED_REQUEST_PARAMS["text"]) == STRUCTURED_REQUEST_PARAMS["text"]:
+            self.request_params = {**self.request_params, "text": {"format": RATING_FIRST_TEXT_FORMAT}}
+
+    async def _stream_verdict(self, input_messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        scanner = IncrementalJSONScanner()
+        usage: Dict[str, Any] = {}
+        closed_early = False
+        stream = await self.client.responses.create(
+            model=self.model, input=input_messages, prompt_cache_key=self.cache_key, stream=True, **self.request_params,
+        )
+        try:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    scanner.feed(event.delta)
+                    if all(path in scanner.values for path in VERDICT_PATHS):
+                        closed_early = True
+                        break
+                elif event.type == "response.completed":
+                    usage = usage_to_dict(event.response.usage)
+        finally:
+            await stream.close()
+        return {
+            "values": scanner.values,
+            "chars": scanner.chars_seen,
+            "usage": usage,
+            "closed_early": closed_early,
+            "time_to_verdict_sec": time.perf_counter() - t0,
+        }
+
+    async def classify_chunk(self, chunk_idx: int, content_chunk: Sequence[Dict[str, str]]) -> Dict[str, Any]:
+        input_messages = make_message(content_chunk)
+        if self.response_cache is not None:
+            hit = self.response_cache.get(request_key(self.model, input_messages, self.cache_params), bypass=self.bypass_cache)
+            if hit is not None:
+                return {
+                    "chunk_idx": chunk_idx,
+                    "parsed": hit["parsed"],
+                    "usage": hit["usage"],
+                    "latency_sec": 0.0,
+                    "time_to_verdict_sec": 0.0,
+                    "attempts": 0,
+                    "cached_tokens": 0,
+                    "closed_early": False,
+                    "streamed_output_tokens": 0,
+                    "est_skipped_output_tokens": 0,
+                    "from_cache": True,
+                }
+
+        raw_tokens = self.estimate_tokens(input_messages)
+        est_tokens = int(raw_tokens * self.calibration)
+        streamed, event, latency, attempts = await self._request(
+            chunk_idx, est_tokens, lambda: self._stream_verdict(input_messages),
+        )
+        streamed_tokens = streamed["chars"] // CHARS_PER_TOKEN
+        usage = streamed["usage"]
+        # a closed stream never reports usage; bill the limiter with what was estimated / seen
+        self.limiter.settle(event, usage.get("total_tokens", est_tokens + streamed_tokens))
+        self.cache_stats.add(usage)
+        self.calibrate(usage, raw_tokens)
+        parsed = verdict_from_values(streamed["values"])
+        skipped = max(0, self.expected_output_tokens - streamed_tokens) if streamed["closed_early"] else 0
+        if self.verbose:
+            rich_print(
+                f"chunk {chunk_idx}: rating={parsed['rating']} refused={parsed['refusal']['is_refused']} "
+                f"verdict in {streamed['time_to_verdict_sec']:.1f}s, ~{skipped} output tokens skipped"
+            )
+        return {
+            "chunk_idx": chunk_idx,
+            "parsed": parsed,
+            "usage": usage,
+            "latency_sec": latency,
+            "time_to_verdict_sec": streamed["time_to_verdict_sec"],
+            "attempts": attempts,
+            "cached_tokens": cached_tokens(usage),
+            "closed_early": streamed["closed_early"],
+            "streamed_output_tokens": streamed_tokens,
+            "est_skipped_output_tokens": skipped,
+            "from_cache": False,
+        }
+
+
+def skipped_tokens_report(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals over `RatingOnlyClassifier` results."""
+    live = [r for r in results if not r.get("from_cache") and not r.get("skipped")]
+    ttv = [r["time_to_verdict_sec"] for r in live]
+    return {
+        "num_chunks": len(results),
+        "closed_early": sum(r["closed_early"] for r in live),
+        "streamed_output_tokens": sum(r["streamed_output_tokens"] for r in live),
+        "est_skipped_output_tokens": sum(r["est_skipped_output_tokens"] for r in live),
+        "mean_time_to_verdict_sec": sum(ttv) / len(ttv) if ttv else None,
+    }
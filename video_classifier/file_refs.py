@@ -0,0 +1,183 @@
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from openai import APIStatusError, OpenAI
+from rich import print as rich_print
+
+from frames import content_jpeg_bytes
+from tokens import jpeg_size, register_file_image
+
+
+DEFAULT_DB_PATH = "data/file_refs.sqlite"
+
+
+def client_scope(client: OpenAI) -> str:
+    """Where a file ID is valid: files belong to one API host and organization / project."""
+    return f"{client.base_url}|{client.organization or ''}|{client.project or ''}"
+
+
+def is_missing_file_error(error: Exception) -> bool:
+    """A request rejected because a referenced file ID does not exist (deleted, expired, other project)."""
+    if not isinstance(error, APIStatusError) or error.status_code not in (400, 404):
+        return False
+    message = str(error).lower()
+    return "file" in message and "not found" in message
+
+
+def payload_bytes(content_chunks: Sequence[Sequence[Dict[str, str]]]) -> int:
+    """Bytes of image references a set of chunks puts on the wire (data URLs or file IDs)."""
+    return sum(len(part.get("image_url") or part.get("file_id") or "") for chunk in content_chunks for part in chunk)
+
+
+class FrameUploader:
+    """Upload each distinct JPEG frame once (Files API, purpose="vision") and reference it by file ID.
+
+    A SQLite map `(client scope, sha256(jpeg)) -> file_id` survives re-runs, so overlapping windows,
+    re-sampled films and retries send a ~30-byte ID instead of the base64 frame; IDs are only reused
+    through the same API host / organization / project (`client_scope`). `expires_after_sec` sets the
+    server-side file expiry; expired mappings are treated as missing and re-uploaded, and `forget`
+    drops mappings the server turned out not to know (`is_missing_file_error`).
+    """
+
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        db_path: str = DEFAULT_DB_PATH,
+        purpose: str = "vision",
+        expires_after_sec: Optional[int] = None,
+        workers: int = 8,
+        verbose: bool = True,
+    ):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.client = client or OpenAI()
+        self.scope = client_scope(self.client)
+        self.purpose = purpose
+        self.expires_after_sec = expires_after_sec
+        self.workers = workers
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        # one lock per frame digest, so copies of a frame mapped on several threads upload once
+        self._digest_locks: Dict[str, threading.Lock] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(file_refs)")]
+        if columns and "scope" not in columns:
+            self._conn.execute("DROP TABLE file_refs")  # unscoped IDs from an older version; re-upload
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_refs (
+                scope TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                bytes INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (scope, sha256)
+            )
+            """
+        )
+        self._conn.commit()
+        self.uploaded = 0
+        self.reused = 0
+        self.forgotten = 0
+        self.bytes_uploaded = 0
+
+    def _lookup(self, digest: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id, width, height, expires_at FROM file_refs WHERE scope = ? AND sha256 = ?",
+                (self.scope, digest),
+            ).fetchone()
+            if row is None or (row[3] is not None and row[3] <= time.time()):
+                return None
+            self.reused += 1
+        register_file_image(row[0], row[1], row[2])
+        return row[0]
+
+    def file_id(self, jpeg_bytes: bytes) -> str:
+        """File ID for this frame, uploading it only if no live mapping exists."""
+        digest = hashlib.sha256(jpeg_bytes).hexdigest()
+        with self._lock:
+            digest_lock = self._digest_locks.setdefault(digest, threading.Lock())
+        with digest_lock:
+            file_id = self._lookup(digest)
+            if file_id is not None:
+                return file_id
+            return self._upload(digest, jpeg_bytes)
+
+    def _upload(self, digest: str, jpeg_bytes: bytes) -> str:
+        kwargs: Dict[str, Any] = {}
+        if self.expires_after_sec is not None:
+            kwargs["expires_after"] = {"anchor": "created_at", "seconds": self.expires_after_sec}
+        obj = self.client.files.create(file=(f"{digest[:16]}.jpg", jpeg_bytes, "image/jpeg"), purpose=self.purpose, **kwargs)
+        width, height = jpeg_size(jpeg_bytes)
+        expires_at = time.time() + self.expires_after_sec if self.expires_after_sec is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_refs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope, digest, obj.id, len(jpeg_bytes), width, height, expires_at),
+            )
+            self._conn.commit()
+            self.uploaded += 1
+            self.bytes_uploaded += len(jpeg_bytes)
+        register_file_image(obj.id, width, height)
+        return obj.id
+
+    def make_content(self, jpeg_bytes: bytes, detail: str = "auto") -> Dict[str, str]:
+        return {"type": "input_image", "file_id": self.file_id(jpeg_bytes), "detail": detail}
+
+    def forget(self, contents: Sequence[Dict[str, Any]]) -> None:
+        """Drop the mappings of these (raw or data-URL) frames, so the next `file_id` uploads them again."""
+        digests = [
+            (self.scope, hashlib.sha256(content_jpeg_bytes(c)).hexdigest())
+            for c in contents
+            if "jpeg_bytes" in c or "image_url" in c
+        ]
+        with self._lock:
+            self._conn.executemany("DELETE FROM file_refs WHERE scope = ? AND sha256 = ?", digests)
+            self._conn.commit()
+            self.forgotten += len(digests)
+
+    def to_file_contents(self, contents: Sequence[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Swap raw (`frames.make_raw_image_content`) or data-URL `input_image` parts for file-ID parts
+        (uploads run on `workers` threads)."""
+        def convert(content):
+            if "jpeg_bytes" not in content and "image_url" not in content:
+                return content
+            return self.make_content(content_jpeg_bytes(content), content.get("detail", "auto"))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            out = list(pool.map(convert, contents))
+        if self.verbose:
+            self.report()
+        return out
+
+    def report(self) -> None:
+        rich_print(
+            f"[bold]file refs[/]: uploaded {self.uploaded} frames ({self.bytes_uploaded / 1e6:.1f} MB), "
+            f"reused {self.reused}" + (f", forgot {self.forgotten} stale IDs" if self.forgotten else "")
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+async def classify_uploaded(uploader: FrameUploader, classifier, chunk_idx: int, contents: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """`classifier.classify_chunk` on the file-ID version of `contents`. If the server no longer has
+    a stored ID (deleted, expired, a restarted stand-in), the chunk's mappings are dropped and its
+    frames uploaded and sent once more."""
+    file_contents = await asyncio.to_thread(uploader.to_file_contents, contents)
+    try:
+        return await classifier.classify_chunk(chunk_idx, file_contents)
+    except Exception as e:
+        if not is_missing_file_error(e):
+            raise
+    uploader.forget(contents)
+    file_contents = await asyncio.to_thread(uploader.to_file_contents, contents)
+    return await classifier.classify_chunk(chunk_idx, file_contents)
@@ -0,0 +1,223 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from rich import print as rich_print
+
+from frames import SamplerStats, extract_encoded_frames_parallel, iter_encoded_frames
+
+
+EncodedFrame = Tuple[int, float, bytes]  # (frame_no, timestamp_sec, jpeg_bytes)
+
+DEFAULT_CACHE_DIR = "data/frame_cache"
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FrameCache:
+    """On-disk cache of encoded JPEG frames.
+
+    One entry per (video content hash, interval_sec, jpeg_quality, target_width, sampling mode):
+    - `<key>.<version>.pack`: all JPEGs concatenated, read back through `mmap`
+    - `<key>.json`: the pack's file name and offset index `[frame_no, timestamp_sec, offset, length]` per frame
+
+    Every `put` writes a new pack version and only then swaps the index to it, so an index
+    never points at a pack with other offsets; a reader that lost the old pack gets a miss.
+
+    An entry sampled up to `limit` frames serves any request for that many frames or
+    fewer; `complete` entries (sampled to the end of the video) serve any `limit`.
+    Least-recently-used entries are evicted once the packs exceed `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, verbose: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.verbose = verbose
+        self._hash_memo_path = self.cache_dir / "content_hashes.json"
+
+    # ---------------- keys ----------------
+
+    def content_hash(self, video_path: str) -> str:
+        """sha256 of the video bytes, memoised by (path, size, mtime) so unchanged files are not re-read."""
+        st = os.stat(video_path)
+        memo_key = os.path.abspath(video_path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        memo = self._read_json(self._hash_memo_path) or {}
+        hit = memo.get(memo_key)
+        if hit and hit["stamp"] == stamp:
+            return hit["sha256"]
+        digest = file_sha256(video_path)
+        memo[memo_key] = {"stamp": stamp, "sha256": digest}
+        self._write_json(self._hash_memo_path, memo)
+        return digest
+
+    def key(self, video_path: str, interval_sec: float, jpeg_quality: int, target_width: int, mode: str = "auto") -> str:
+        # seek and grab may land on different frames for the same timestamps, so the mode is part of the key
+        params = json.dumps(
+            {
+                "interval_sec": float(interval_sec), "jpeg_quality": int(jpeg_quality),
+                "target_width": int(target_width), "mode": mode,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(f"{self.content_hash(video_path)}|{params}".encode()).hexdigest()[:32]
+
+    # ---------------- entries ----------------
+
+    def _pack_path(self, index: Dict[str, Any]) -> Path:
+        return self.cache_dir / index["pack"]
+
+    def _index_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    @staticmethod
+    def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _write_json(path: Path, obj: Any) -> None:
+        tmp = path.with_suffix(path.suffix + f".tmp{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+
+    def get(self, key: str, limit: Optional[int] = None) -> Optional[List[EncodedFrame]]:
+        """Return cached frames, or None if the entry is missing or too short for `limit`."""
+        index = self._read_json(self._index_path(key))
+        if index is None or "pack" not in index:  # missing, or written before packs were versioned
+            return None
+        frames = index["frames"]
+        if limit is None and not index["complete"]:
+            return None
+        if limit is not None and len(frames) < limit and not index["complete"]:
+            return None
+        if limit is not None:
+            frames = frames[:limit]
+
+        out: List[EncodedFrame] = []
+        try:
+            if frames:
+                with open(self._pack_path(index), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for frame_no, timestamp_sec, offset, length in frames:
+                        out.append((frame_no, timestamp_sec, mm[offset : offset + length]))
+            os.utime(self._index_path(key))  # mark as recently used for eviction
+        except FileNotFoundError:
+            return None  # replaced or evicted since the index was read
+        return out
+
+    def put(
+        self,
+        key: str,
+        frames: Iterable[EncodedFrame],
+        complete: bool,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> List[EncodedFrame]:
+        index_path = self._index_path(key)
+        previous = self._read_json(index_path)
+        pack_name = f"{key}.{os.getpid()}-{time.time_ns()}.pack"
+        index_frames = []
+        written: List[EncodedFrame] = []
+        offset = 0
+        with open(self.cache_dir / pack_name, "wb") as f:
+            for frame_no, timestamp_sec, jpeg_bytes in frames:
+                f.write(jpeg_bytes)
+                index_frames.append([frame_no, timestamp_sec, offset, len(jpeg_bytes)])
+                written.append((frame_no, timestamp_sec, jpeg_bytes))
+                offset += len(jpeg_bytes)
+        # new pack first, index last: an index on disk always points at a finished pack with its own offsets
+        self._write_json(index_path, {
+            **(meta or {}),
+            "pack": pack_name,
+            "complete": complete,
+            "bytes": offset,
+            "frames": index_frames,
+        })
+        if previous is not None:
+            (self.cache_dir / previous.get("pack", f"{key}.pack")).unlink(missing_ok=True)
+        self.evict()
+        return written
+
+    def get_or_extract(
+        self,
+        video_path: str,
+        interval_sec: float = 1.0,
+        limit: Optional[int] = None,
+        jpeg_quality: int = 92,
+        target_width: int = 480,
+        mode: str = "auto",
+        workers: int = 1,
+        verbose: bool = False,
+        stats: Optional[SamplerStats] = None,
+    ) -> List[EncodedFrame]:
+        """Cached frames, or decode (`verbose` / `stats` as in `frames.iter_encoded_frames`) and cache them."""
+        key = self.key(video_path, interval_sec, jpeg_quality, target_width, mode)
+        cached = self.get(key, limit)
+        if cached is not None:
+            if self.verbose:
+                rich_print(f"[green]frame cache hit[/] {video_path} ({len(cached)} frames)")
+            return cached
+
+        if self.verbose:
+            rich_print(f"[yellow]frame cache miss[/] {video_path}, decoding")
+        if workers > 1:
+            frames = extract_encoded_frames_parallel(
+                video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, workers=workers,
+                verbose=verbose, stats=stats,
+            )
+        else:
+            frames = list(iter_encoded_frames(
+                video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, verbose=verbose, stats=stats,
+            ))
+        complete = limit is None or len(frames) < limit
+        meta = {
+            "video_path": str(video_path),
+            "interval_sec": interval_sec,
+            "jpeg_quality": jpeg_quality,
+            "target_width": target_width,
+            "mode": mode,
+        }
+        return self.put(key, frames, complete, meta)
+
+    # ---------------- eviction ----------------
+
+    def total_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*.pack"))
+
+    def evict(self) -> None:
+        """Delete least-recently-used entries until the packs fit in `max_bytes`."""
+        entries = []
+        for index_path in self.cache_dir.glob("*.json"):
+            if index_path == self._hash_memo_path:
+                continue
+            index = self._read_json(index_path) or {}
+            pack_path = self._pack_path(index) if "pack" in index else index_path.with_suffix(".pack")
+            size = pack_path.stat().st_size if pack_path.exists() else 0
+            entries.append((index_path.stat().st_mtime, index_path, pack_path, size))
+
+        total = sum(e[3] for e in entries)
+        for _, index_path, pack_path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # index first: nothing can be pointed at the pack once it goes
+            index_path.unlink(missing_ok=True)
+            pack_path.unlink(missing_ok=True)
+            total -= size
+            if self.verbose:
+                rich_print(f"[yellow]frame cache evicted[/] {index_path.stem} ({size} bytes)")
@@ -0,0 +1,497 @@
+import os
+import math
+import time
+import base64
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from rich import print as rich_print
+
+from inference import MODEL
+from tokens import frame_token_estimates, plan_frame_size
+
+
+SAMPLING_MODES = ("auto", "read", "grab", "seek")
+
+# Above this many frames between samples, seeking is cheaper than grabbing through the gap.
+# OpenCV's FFmpeg backend seeks to the preceding keyframe and decodes forward, so this is
+# roughly one GOP of a typical web mp4 (2-5s at 24-30 fps).
+DEFAULT_SEEK_MIN_FRAMES = 120
+
+
+@dataclass
+class SamplerStats:
+    """Counters collected while sampling a video, used to compare sampling modes."""
+    mode: str = ""
+    frames_read: int = 0      # full decode + colour conversion (read / retrieve)
+    frames_grabbed: int = 0   # decoded but never converted (grab only)
+    seeks: int = 0
+    frames_kept: int = 0
+    elapsed_sec: float = 0.0
+
+    @property
+    def frames_decoded(self) -> int:
+        return self.frames_read + self.frames_grabbed
+
+    @property
+    def decode_fps(self) -> float:
+        """Frames pulled through the decoder per second of wall-clock time."""
+        return self.frames_decoded / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+    @property
+    def kept_fps(self) -> float:
+        """Sampled frames delivered per second of wall-clock time."""
+        return self.frames_kept / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+def open_capture(video_path: str) -> cv2.VideoCapture:
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    return cap
+
+
+def get_video_fps(cap: cv2.VideoCapture) -> float:
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 0:
+        fps = 24.0
+    return fps
+
+
+def resolve_sampling_mode(mode: str, frame_interval: int, seek_min_frames: int = DEFAULT_SEEK_MIN_FRAMES) -> str:
+    """Pick the concrete sampling mode; `auto` seeks for sparse intervals and grabs otherwise."""
+    if mode not in SAMPLING_MODES:
+        raise ValueError(f"mode must be one of {SAMPLING_MODES}, got {mode!r}")
+    if mode != "auto":
+        return mode
+    return "seek" if frame_interval >= seek_min_frames else "grab"
+
+
+def iter_sampled_frames(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    mode: str = "auto",
+    seek_min_frames: int = DEFAULT_SEEK_MIN_FRAMES,
+    stats: Optional[SamplerStats] = None,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Yield `(frame_no, timestamp_sec, frame)` for one frame every `interval_sec` seconds.
+
+    Modes:
+    - read: decode every frame with `cap.read()` (the original behaviour, kept for comparison)
+    - grab: `cap.grab()` skipped frames so they are never converted, `retrieve()` kept ones
+    - seek: jump straight to the next sampled frame with `CAP_PROP_POS_FRAMES`
+    - auto: seek when samples are at least `seek_min_frames` apart, grab otherwise
+
+    Stops as soon as `limit` frames have been yielded. `start_frame` / `end_frame`
+    restrict sampling to `[start_frame, end_frame)`; samples are taken every frame
+    interval counting from `start_frame`.
+    """
+    if stats is None:
+        stats = SamplerStats()
+
+    cap = open_capture(video_path)
+    fps = get_video_fps(cap)
+    frame_interval = max(1, int(round(fps * interval_sec)))
+    stats.mode = resolve_sampling_mode(mode, frame_interval, seek_min_frames)
+
+    t_resume = time.perf_counter()
+    frame_no = start_frame
+    try:
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            stats.seeks += 1
+        while (limit is None or stats.frames_kept < limit) and (end_frame is None or frame_no < end_frame):
+            if stats.mode == "seek":
+                if frame_no > start_frame:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
+                    stats.seeks += 1
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                stats.frames_read += 1
+            elif (frame_no - start_frame) % frame_interval == 0:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                stats.frames_read += 1
+            else:
+                if stats.mode == "grab":
+                    ok = cap.grab()
+                    stats.frames_grabbed += 1
+                else:
+                    ok, _ = cap.read()
+                    stats.frames_read += 1
+                if not ok:
+                    break
+                frame_no += 1
+                continue
+
+            stats.frames_kept += 1
+            # only time spent inside the sampler counts, not the consumer's encode/upload work
+            stats.elapsed_sec += time.perf_counter() - t_resume
+            t_resume = None
+            yield frame_no, frame_no / fps, frame
+            t_resume = time.perf_counter()
+
+            frame_no += frame_interval if stats.mode == "seek" else 1
+    finally:
+        if t_resume is not None:
+            stats.elapsed_sec += time.perf_counter() - t_resume
+        cap.release()
+
+
+def resize_frame(frame: np.ndarray, target_width: int) -> np.ndarray:
+    """Downscale to `target_width` keeping the aspect ratio; smaller frames are left as is."""
+    h, w = frame.shape[:2]
+    if w <= target_width:
+        return frame
+    new_height = int(target_width * h / w)
+    return cv2.resize(frame, (target_width, new_height))
+
+
+def encode_jpeg(frame: np.ndarray, jpeg_quality: int = 92) -> Optional[bytes]:
+    ok_jpg, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)])
+    if not ok_jpg:
+        return None
+    return buf.tobytes()
+
+
+def jpeg_to_data_url(jpeg_bytes: bytes) -> str:
+    b64 = base64.b64encode(jpeg_bytes).decode("utf-8")
+    return f"data:image/jpeg;base64,{b64}"
+
+
+def make_image_content(jpeg_bytes: bytes, detail: Optional[str] = None) -> Dict[str, str]:
+    content = {"type": "input_image", "image_url": jpeg_to_data_url(jpeg_bytes)}
+    if detail is not None:
+        content["detail"] = detail
+    return content
+
+
+def make_raw_image_content(jpeg_bytes: bytes, detail: Optional[str] = None) -> Dict[str, Any]:
+    """`input_image` part holding the JPEG itself, for frames that are uploaded
+    (`file_refs.FrameUploader.to_file_contents`) instead of inlined; skips base64. Not sendable as is."""
+    content: Dict[str, Any] = {"type": "input_image", "jpeg_bytes": jpeg_bytes}
+    if detail is not None:
+        content["detail"] = detail
+    return content
+
+
+def content_jpeg_bytes(content: Dict[str, Any]) -> bytes:
+    """JPEG bytes of a raw (`make_raw_image_content`) or data-URL `input_image` part."""
+    if "jpeg_bytes" in content:
+        return content["jpeg_bytes"]
+    return base64.b64decode(content["image_url"].split(",", 1)[1])
+
+
+def iter_encoded_frames(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    mode: str = "auto",
+    verbose: bool = True,
+    stats: Optional[SamplerStats] = None,
+    dedup=None,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+) -> Iterator[Tuple[int, float, bytes]]:
+    """Lazily yield `(frame_no, timestamp_sec, jpeg_bytes)`; nothing is decoded until the caller asks.
+
+    `dedup` (e.g. `dedup.FrameDeduplicator`) is consulted on the downscaled frame
+    before JPEG encoding; frames it rejects are never encoded. `limit` counts
+    sampled frames, before dedup (which is `reset` first: a new video). `start_frame` /
+    `end_frame` as in `iter_sampled_frames`.
+    """
+    if dedup is not None:
+        dedup.reset()
+    for frame_no, timestamp_sec, frame in iter_sampled_frames(
+        video_path, interval_sec, limit, mode=mode, stats=stats, start_frame=start_frame, end_frame=end_frame,
+    ):
+        frame_resized = resize_frame(frame, target_width)
+        if dedup is not None and not dedup.keep(frame_resized):
+            continue
+        jpeg_bytes = encode_jpeg(frame_resized, jpeg_quality)
+        if verbose:
+            print(f'attaching frame_no={frame_no}, original_shape={frame.shape}, resized_shape={frame_resized.shape}')
+        if jpeg_bytes is not None:
+            yield frame_no, timestamp_sec, jpeg_bytes
+
+
+def extract_encoded_window(
+    video_path: str,
+    start_sec: float,
+    end_sec: float,
+    interval_sec: float = 1.0,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    mode: str = "auto",
+) -> List[Tuple[int, float, bytes]]:
+    """Encoded frames sampled every `interval_sec` within `[start_sec, end_sec)` only."""
+    cap = open_capture(video_path)
+    fps = get_video_fps(cap)
+    cap.release()
+    return list(iter_encoded_frames(
+        video_path, interval_sec, jpeg_quality=jpeg_quality, target_width=target_width, mode=mode, verbose=False,
+        start_frame=int(round(start_sec * fps)), end_frame=int(round(end_sec * fps)),
+    ))
+
+
+def iter_frame_contents(*args, **kwargs) -> Iterator[Dict[str, str]]:
+    """`iter_encoded_frames` as `input_image` content parts (same arguments)."""
+    for _, _, jpeg_bytes in iter_encoded_frames(*args, **kwargs):
+        yield make_image_content(jpeg_bytes)
+
+
+def extract_frames_as_data_urls(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    mode: str = "auto",
+    verbose: bool = True,
+    stats: Optional[SamplerStats] = None,
+    workers: int = 1,
+    dedup=None,
+    cache=None,
+    tile_aware: bool = False,
+    model: str = MODEL,
+) -> List[Dict[str, str]]:
+    """Return data URLs for frames sampled every `interval_sec` seconds.
+
+    With `workers > 1` the video is split into time segments that are decoded
+    and encoded in a process pool (see `extract_frames_parallel`). With `cache`
+    (a `frame_cache.FrameCache`) previously encoded frames are reused and
+    decoding is skipped entirely on a hit.
+
+    With `tile_aware=True`, `target_width` is the minimum width needed and the
+    actual size and `detail` come from `tokens.plan_frame_size` for `model`;
+    with `verbose` the per-frame token estimates are printed.
+
+    Output element example:
+    {"type": "input_image", "image_url": "data:image/jpeg;base64,<...>"}
+
+    `extract_timed_frames` takes the same arguments and keeps each frame's timestamp.
+    """
+    return [content for _, content in extract_timed_frames(
+        video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, verbose=verbose, stats=stats,
+        workers=workers, dedup=dedup, cache=cache, tile_aware=tile_aware, model=model,
+    )]
+
+
+def extract_timed_frames(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    mode: str = "auto",
+    verbose: bool = True,
+    stats: Optional[SamplerStats] = None,
+    workers: int = 1,
+    dedup=None,
+    cache=None,
+    tile_aware: bool = False,
+    model: str = MODEL,
+    make_content: Callable[[bytes], Dict[str, Any]] = make_image_content,
+) -> List[Tuple[float, Dict[str, str]]]:
+    """`extract_frames_as_data_urls` as `(timestamp_sec, content)` pairs, so chunks can be traced
+    back to the time range of the source video they came from (dropped frames keep none).
+    `make_content=make_raw_image_content` keeps the JPEG bytes instead of data URLs."""
+    if tile_aware:
+        info = get_video_info(video_path)
+        plan = plan_frame_size(info["width"], info["height"], target_width, model)
+        if verbose:
+            rich_print(
+                f"[bold]tile-aware size[/]: {info['width']}x{info['height']} -> {plan.width}x{plan.height} "
+                f"detail={plan.detail} (~{plan.tokens} tokens/frame)"
+            )
+        timed = extract_timed_frames(
+            video_path, interval_sec, limit, jpeg_quality, plan.width, mode=mode, verbose=False, stats=stats,
+            workers=workers, dedup=dedup, cache=cache, make_content=make_content,
+        )
+        for _, content in timed:
+            content["detail"] = plan.detail
+        if verbose:
+            estimates = frame_token_estimates([content for _, content in timed], model)
+            for i, est in enumerate(estimates):
+                print(f"frame {i}: ~{est} tokens")
+            rich_print(f"[bold]{len(timed)} frames[/], ~{sum(estimates)} image tokens")
+        return timed
+
+    if workers > 1 or cache is not None:
+        if cache is not None:
+            frames = cache.get_or_extract(
+                video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, workers=workers,
+                verbose=verbose, stats=stats,
+            )
+        else:
+            frames = extract_encoded_frames_parallel(
+                video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, workers=workers,
+                verbose=verbose, stats=stats,
+            )
+        timed = [(timestamp_sec, make_content(jpeg_bytes)) for _, timestamp_sec, jpeg_bytes in frames]
+        if dedup is not None:
+            from dedup import dedup_timed_contents
+            timed = dedup_timed_contents(timed, dedup, verbose=verbose)
+        return timed
+    return [
+        (timestamp_sec, make_content(jpeg_bytes))
+        for _, timestamp_sec, jpeg_bytes in iter_encoded_frames(
+            video_path, interval_sec, limit, jpeg_quality, target_width, mode=mode, verbose=verbose, stats=stats,
+            dedup=dedup,
+        )
+    ]
+
+
+def compare_sampling_modes(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    modes: Tuple[str, ...] = ("read", "grab", "seek"),
+) -> List[SamplerStats]:
+    """Run the sampler once per mode (decode only, no encoding) and print decode throughput."""
+    results = []
+    for mode in modes:
+        stats = SamplerStats()
+        for _ in iter_sampled_frames(video_path, interval_sec, limit, mode=mode, stats=stats):
+            pass
+        results.append(stats)
+        rich_print(
+            f"[bold]{stats.mode:>5}[/] kept={stats.frames_kept} read={stats.frames_read} "
+            f"grabbed={stats.frames_grabbed} seeks={stats.seeks} "
+            f"elapsed={stats.elapsed_sec:.2f}s decode_fps={stats.decode_fps:.1f} kept_fps={stats.kept_fps:.1f}"
+        )
+    return results
+
+
+def get_video_info(video_path: str) -> Dict[str, float]:
+    cap = open_capture(video_path)
+    try:
+        return {
+            "fps": get_video_fps(cap),
+            "frame_count": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+def planned_sample_count(video_path: str, interval_sec: float = 1.0, limit: Optional[int] = None) -> int:
+    """Frames sampling would yield, from the container's frame count (an estimate; before dedup)."""
+    info = get_video_info(video_path)
+    frame_interval = max(1, int(round(info["fps"] * interval_sec)))
+    n_samples = math.ceil(info["frame_count"] / frame_interval) if info["frame_count"] > 0 else 0
+    return min(n_samples, limit) if limit is not None else n_samples
+
+
+def plan_segments(
+    frame_count: int,
+    frame_interval: int,
+    n_segments: int,
+    limit: Optional[int] = None,
+) -> List[Tuple[int, Optional[int]]]:
+    """Split the sampling grid into `n_segments` contiguous `(start_frame, end_frame)` ranges.
+
+    Boundaries fall on multiples of `frame_interval` so every sampled frame belongs to
+    exactly one segment. The last segment is open-ended (`end_frame=None`) unless `limit`
+    caps the number of samples, because CAP_PROP_FRAME_COUNT is only an estimate.
+    """
+    n_samples = max(1, math.ceil(frame_count / frame_interval)) if frame_count > 0 else 1
+    if limit is not None:
+        n_samples = min(n_samples, limit)
+    n_segments = max(1, min(n_segments, n_samples))
+
+    per_segment = math.ceil(n_samples / n_segments)
+    segments: List[Tuple[int, Optional[int]]] = []
+    for first in range(0, n_samples, per_segment):
+        last = min(first + per_segment, n_samples)
+        start_frame = first * frame_interval
+        end_frame: Optional[int] = last * frame_interval
+        if last == n_samples and limit is None:
+            end_frame = None
+        segments.append((start_frame, end_frame))
+    return segments
+
+
+def _init_segment_worker() -> None:
+    # one decoder thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def _extract_segment(
+    video_path: str,
+    interval_sec: float,
+    start_frame: int,
+    end_frame: Optional[int],
+    jpeg_quality: int,
+    target_width: int,
+    mode: str,
+    verbose: bool = False,
+) -> Tuple[List[Tuple[int, float, bytes]], SamplerStats]:
+    """`iter_encoded_frames` over one segment with its own capture handle (runs in a worker process)."""
+    stats = SamplerStats()
+    out = list(iter_encoded_frames(
+        video_path, interval_sec, jpeg_quality=jpeg_quality, target_width=target_width, mode=mode, verbose=verbose,
+        stats=stats, start_frame=start_frame, end_frame=end_frame,
+    ))
+    return out, stats
+
+
+def extract_encoded_frames_parallel(
+    video_path: str,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    mode: str = "auto",
+    workers: Optional[int] = None,
+    segments_per_worker: int = 1,
+    verbose: bool = False,
+    stats: Optional[SamplerStats] = None,
+) -> List[Tuple[int, float, bytes]]:
+    """Segment-parallel frame extraction, returning `(frame_no, timestamp_sec, jpeg_bytes)`.
+
+    The sampling grid is split into time segments; each is decoded and encoded in a
+    process pool worker with its own `cv2.VideoCapture`, then merged in timestamp order.
+    The workers' counters are summed into `stats`; its `elapsed_sec` is the pool's wall-clock time.
+    """
+    workers = workers or os.cpu_count() or 1
+    info = get_video_info(video_path)
+    frame_interval = max(1, int(round(info["fps"] * interval_sec)))
+    segments = plan_segments(info["frame_count"], frame_interval, workers * segments_per_worker, limit)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(segments)), initializer=_init_segment_worker) as pool:
+        futures = [
+            pool.submit(
+                _extract_segment, str(video_path), interval_sec, start, end, jpeg_quality, target_width, mode, verbose,
+            )
+            for start, end in segments
+        ]
+        results = [f.result() for f in futures]
+    if stats is not None:
+        for _, seg_stats in results:
+            stats.mode = seg_stats.mode
+            stats.frames_read += seg_stats.frames_read
+            stats.frames_grabbed += seg_stats.frames_grabbed
+            stats.seeks += seg_stats.seeks
+            stats.frames_kept += seg_stats.frames_kept
+        stats.elapsed_sec += time.perf_counter() - t0
+
+    merged = sorted((item for seg, _ in results for item in seg), key=lambda x: x[0])
+    return merged[:limit] if limit is not None else merged
+
+
+def extract_frames_parallel(*args, **kwargs) -> List[Dict[str, str]]:
+    """`extract_encoded_frames_parallel` as `input_image` content parts (same arguments)."""
+    return [make_image_content(jpeg_bytes) for _, _, jpeg_bytes in extract_encoded_frames_parallel(*args, **kwargs)]
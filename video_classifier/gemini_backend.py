@@ -0,0 +1,335 @@
+"""
+Native-video backend: upload the mp4 once to Gemini and classify whole time ranges of it,
+instead of sending sampled frames as base64 JPEGs.
+
+Run:
+    uv run gemini_backend.py data/YT_download/film.mp4
+    uv run gemini_backend.py data/YT_download/film.mp4 --compare --output data/bench/backends.json
+
+`--compare` also runs the frame-sampling backend (`AsyncChunkClassifier` on OpenAI) over the
+same time ranges and prints end-to-end seconds, MB uploaded and tokens for both.
+Needs GEMINI_API_KEY (and OPENAI_API_KEY for --compare) in the environment / .env.
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import find_dotenv, load_dotenv
+from google import genai
+from google.genai import errors, types
+from rich import print as rich_print
+from rich.table import Table
+
+from aggregate import FilmAggregator
+from async_inference import AsyncChunkClassifier
+from frames import extract_frames_as_data_urls, get_video_info
+from inference import MODEL, chunk_list, make_message
+from schema import CHUNK_JSON_SCHEMA
+from tokens import estimate_message_tokens
+
+
+GEMINI_MODEL = "gemini-2.5-flash"
+MEDIA_RESOLUTIONS = ("low", "medium", "high")
+# Gemini video tokenization: tokens per sampled frame by media resolution (default: medium), plus the audio track.
+VIDEO_FRAME_TOKENS = {"low": 66, "medium": 258, "high": 258}
+AUDIO_TOKENS_PER_SEC = 32
+
+
+def init_client() -> genai.Client:
+    load_dotenv(find_dotenv())
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+def upload_video(client: genai.Client, video_path: str, poll_sec: float = 2.0, verbose: bool = True) -> types.File:
+    """Upload once via the Files API and wait until Gemini has processed it (state ACTIVE)."""
+    t0 = time.perf_counter()
+    file = client.files.upload(file=video_path)
+    while file.state == types.FileState.PROCESSING:
+        time.sleep(poll_sec)
+        file = client.files.get(name=file.name)
+    if file.state == types.FileState.FAILED:
+        raise RuntimeError(f"Gemini could not process {video_path}: {file.error}")
+    if verbose:
+        rich_print(f"[bold]uploaded[/] {video_path} -> {file.name} in {time.perf_counter() - t0:.1f}s")
+    return file
+
+
+def video_duration_sec(video_path: str) -> float:
+    info = get_video_info(video_path)
+    return info["frame_count"] / info["fps"]
+
+
+def video_window_parts(
+    file_uri: str,
+    mime_type: str,
+    duration_sec: float,
+    window_sec: float,
+    fps: float = 1.0,
+) -> List[List[Dict[str, Any]]]:
+    """One chunk per `window_sec` of the video, each a single `input_video` part: a time range
+    of the uploaded file, sampled by Gemini at `fps`. Goes through `make_message` like frame chunks."""
+    chunks = []
+    start = 0.0
+    while start < duration_sec:
+        end = min(start + window_sec, duration_sec)
+        chunks.append([{
+            "type": "input_video",
+            "file_uri": file_uri,
+            "mime_type": mime_type,
+            "start_sec": start,
+            "end_sec": end,
+            "fps": fps,
+        }])
+        start = end
+    return chunks
+
+
+def video_part_tokens(part: Dict[str, Any], media_resolution: Optional[str] = None) -> int:
+    """Input tokens for one `input_video` part: its duration x (frames per second x frame tokens + audio)."""
+    frame_tokens = VIDEO_FRAME_TOKENS[media_resolution or "medium"]
+    duration = part["end_sec"] - part["start_sec"]
+    return int(duration * (part.get("fps", 1.0) * frame_tokens + AUDIO_TOKENS_PER_SEC))
+
+
+def to_gemini_part(part: Dict[str, Any]) -> types.Part:
+    kind = part["type"]
+    if kind == "input_text":
+        return types.Part(text=part["text"])
+    if kind == "input_video":
+        return types.Part(
+            file_data=types.FileData(file_uri=part["file_uri"], mime_type=part["mime_type"]),
+            video_metadata=types.VideoMetadata(
+                start_offset=f"{part['start_sec']:.3f}s", end_offset=f"{part['end_sec']:.3f}s", fps=part.get("fps"),
+            ),
+        )
+    if kind == "input_image" and part.get("image_url", "").startswith("data:"):
+        header, b64 = part["image_url"].split(",", 1)
+        return types.Part.from_bytes(data=base64.b64decode(b64), mime_type=header[len("data:"):].split(";")[0])
+    raise ValueError(f"content part not supported on Gemini: {kind}")
+
+
+def to_gemini_request(input_messages: Sequence[Dict[str, Any]]) -> Tuple[List[types.Part], List[types.Content]]:
+    """`make_message` output as `(system_instruction, contents)` for `generate_content`."""
+    system: List[types.Part] = []
+    contents: List[types.Content] = []
+    for message in input_messages:
+        parts = [to_gemini_part(part) for part in message["content"]]
+        if message["role"] == "system":
+            system += parts
+        else:
+            contents.append(types.Content(role="user", parts=parts))
+    return system, contents
+
+
+def gemini_usage(usage_metadata) -> Dict[str, Any]:
+    """Gemini `usage_metadata` in the Responses `usage` shape, plus input tokens per modality."""
+    if usage_metadata is None:
+        return {}
+    u = usage_metadata
+    thoughts = u.thoughts_token_count or 0
+    return {
+        "input_tokens": u.prompt_token_count or 0,
+        "input_tokens_details": {
+            "cached_tokens": u.cached_content_token_count or 0,
+            "by_modality": {str(d.modality.value).lower(): d.token_count for d in u.prompt_tokens_details or []},
+        },
+        "output_tokens": (u.candidates_token_count or 0) + thoughts,
+        "output_tokens_details": {"reasoning_tokens": thoughts},
+        "total_tokens": u.total_token_count or 0,
+    }
+
+
+@dataclass
+class GeminiResponse:
+    """The fields `AsyncChunkClassifier` reads from a response."""
+    output_text: str
+    usage: Dict[str, Any]
+
+
+class GeminiVideoClassifier(AsyncChunkClassifier):
+    """`AsyncChunkClassifier` on Gemini `generate_content`.
+
+    Same prompt (`make_message`), chunk results, concurrency cap, RPM/TPM budgets, retries
+    (429 / 5xx), response cache and `FilmAggregator`; a chunk is a time range of an uploaded
+    video (`video_window_parts`) instead of a list of frames. `request_params` are extra
+    `GenerateContentConfig` fields; `structured=True` sends `schema.CHUNK_JSON_SCHEMA` as the
+    response schema; `media_resolution` is low / medium / high tokens per video frame.
+    """
+
+    def __init__(
+        self,
+        client: Optional[genai.Client] = None,
+        model: str = GEMINI_MODEL,
+        media_resolution: Optional[str] = None,
+        request_params: Optional[Dict[str, Any]] = None,
+        structured: bool = False,
+        **kwargs,
+    ):
+        super().__init__(client or init_client(), model=model, structured=structured, **kwargs)
+        self.request_params = {"response_mime_type": "application/json", **(request_params or {})}
+        if structured:
+            self.request_params["response_json_schema"] = CHUNK_JSON_SCHEMA
+        if media_resolution:
+            self.request_params["media_resolution"] = f"MEDIA_RESOLUTION_{media_resolution.upper()}"
+        self.media_resolution = media_resolution
+
+    def estimate_tokens(self, input_messages: List[Dict[str, Any]]) -> int:
+        """Prompt text + frames (`tokens.estimate_message_tokens`, which skips video) + `video_part_tokens`."""
+        video = sum(
+            video_part_tokens(part, self.media_resolution)
+            for message in input_messages
+            for part in message.get("content", [])
+            if part.get("type") == "input_video"
+        )
+        return estimate_message_tokens(input_messages, self.model) + video
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, errors.ServerError):
+            return True
+        return isinstance(error, errors.ClientError) and error.code == 429
+
+    async def create(self, input_messages: List[Dict[str, Any]]) -> GeminiResponse:
+        system, contents = to_gemini_request(input_messages)
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=contents,
+            config=types.GenerateContentConfig(system_instruction=system, **self.request_params),
+        )
+        return GeminiResponse(output_text=response.text or "", usage=gemini_usage(response.usage_metadata))
+
+    async def classify_video(
+        self,
+        video_path: str,
+        window_sec: float = 32.0,
+        fps: float = 1.0,
+        file: Optional[types.File] = None,
+    ) -> Dict[str, Any]:
+        """Upload `video_path` (unless an uploaded `file` is given) and classify it `window_sec` at a time.
+
+        Returns `{"verdict", "results", "file"}`; `file` is the uploaded file, to reuse or delete.
+        """
+        duration = video_duration_sec(video_path)
+        if file is None:
+            file = await asyncio.to_thread(upload_video, self.client, video_path, verbose=self.verbose)
+        chunks = video_window_parts(file.uri, file.mime_type, duration, window_sec, fps)
+        aggregator = FilmAggregator()
+        results = await self.classify_chunks(chunks, aggregator=aggregator)
+        return {"verdict": aggregator.verdict(), "results": results, "file": file}
+
+
+def _backend_summary(
+    backend: str,
+    model: str,
+    wall_sec: float,
+    upload_bytes: int,
+    results: Sequence[Dict[str, Any]],
+    verdict: Dict[str, Any],
+    **extra,
+) -> Dict[str, Any]:
+    usages = [r.get("usage") or {} for r in results]
+    return {
+        "backend": backend,
+        "model": model,
+        "requests": len(results),
+        "wall_sec": wall_sec,
+        "upload_mb": upload_bytes / 1e6,
+        "input_tokens": sum(u.get("input_tokens", 0) for u in usages),
+        "output_tokens": sum(u.get("output_tokens", 0) for u in usages),
+        "rating": verdict.get("rating"),
+        **extra,
+    }
+
+
+async def run_frames_backend(video_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Frame sampling -> base64 JPEG chunks -> `AsyncChunkClassifier`, timed end to end."""
+    t0 = time.perf_counter()
+    contents = await asyncio.to_thread(
+        extract_frames_as_data_urls, video_path, interval_sec=args.interval_sec,
+        jpeg_quality=args.jpeg_quality, target_width=args.target_width, verbose=False,
+    )
+    chunks = chunk_list(contents, args.chunk_size)
+    upload_bytes = sum(len(json.dumps(make_message(chunk))) for chunk in chunks)
+    classifier = AsyncChunkClassifier(model=args.openai_model, max_concurrency=args.max_concurrency, verbose=args.verbose)
+    aggregator = FilmAggregator()
+    results = await classifier.classify_chunks(chunks, aggregator=aggregator)
+    return _backend_summary(
+        "frames", args.openai_model, time.perf_counter() - t0, upload_bytes, results, aggregator.verdict(),
+        frames=len(contents),
+    )
+
+
+async def run_gemini_backend(video_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """One mp4 upload -> `GeminiVideoClassifier` over time windows, timed end to end (upload included)."""
+    t0 = time.perf_counter()
+    classifier = GeminiVideoClassifier(
+        model=args.gemini_model, media_resolution=args.media_resolution,
+        max_concurrency=args.max_concurrency, verbose=args.verbose,
+    )
+    file = await asyncio.to_thread(upload_video, classifier.client, video_path, verbose=args.verbose)
+    upload_sec = time.perf_counter() - t0
+    try:
+        out = await classifier.classify_video(video_path, args.window_sec, args.fps, file=file)
+    finally:
+        if not args.keep_upload:
+            classifier.client.files.delete(name=file.name)
+    chunks = video_window_parts(file.uri, file.mime_type, video_duration_sec(video_path), args.window_sec, args.fps)
+    upload_bytes = os.path.getsize(video_path) + sum(len(json.dumps(make_message(chunk))) for chunk in chunks)
+    return _backend_summary(
+        "gemini-video", args.gemini_model, time.perf_counter() - t0, upload_bytes, out["results"], out["verdict"],
+        upload_sec=upload_sec,
+    )
+
+
+def print_comparison(rows: Sequence[Dict[str, Any]]) -> None:
+    table = Table(title="backends")
+    for col in ["backend", "model", "requests", "wall s", "upload MB", "input tokens", "output tokens", "rating"]:
+        table.add_column(col, justify="left" if col in ("backend", "model", "rating") else "right")
+    for r in rows:
+        table.add_row(
+            r["backend"], r["model"], str(r["requests"]), f"{r['wall_sec']:.1f}", f"{r['upload_mb']:.1f}",
+            str(r["input_tokens"]), str(r["output_tokens"]), str(r["rating"]),
+        )
+    rich_print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify a film natively with Gemini; --compare against frame sampling")
+    parser.add_argument("video", help="Local mp4")
+    parser.add_argument("--gemini-model", default=GEMINI_MODEL)
+    parser.add_argument("--openai-model", default=MODEL)
+    parser.add_argument("--interval-sec", type=float, default=1.0, help="Frame backend sampling interval")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Frames per frame-backend chunk")
+    parser.add_argument("--target-width", type=int, default=480)
+    parser.add_argument("--jpeg-quality", type=int, default=92)
+    parser.add_argument("--window-sec", type=float, default=None, help="Gemini window (default: chunk-size x interval-sec)")
+    parser.add_argument("--fps", type=float, default=None, help="Gemini sampling fps (default: 1 / interval-sec)")
+    parser.add_argument("--media-resolution", choices=MEDIA_RESOLUTIONS, default=None)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--keep-upload", action="store_true", help="Do not delete the uploaded file afterwards")
+    parser.add_argument("--compare", action="store_true", help="Also run the frame-sampling backend")
+    parser.add_argument("--output", default=None, help="Write the comparison JSON here")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    # same time ranges and sampling rate on both backends unless overridden
+    args.window_sec = args.window_sec or args.chunk_size * args.interval_sec
+    args.fps = args.fps or 1.0 / args.interval_sec
+
+    load_dotenv(find_dotenv())
+    rows = [asyncio.run(run_gemini_backend(args.video, args))]
+    if args.compare:
+        rows.append(asyncio.run(run_frames_backend(args.video, args)))
+    print_comparison(rows)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps({"video": args.video, "params": vars(args), "backends": rows}, indent=2))
+        rich_print(f"[bold]Saved[/]: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import hashlib
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from prompts import SYSTEM_PROMPT_FILM_CLASSIFICATION
+
+
+MODEL = "gpt-5"
+
+# Ascending severity; "Refused" outranks every rating.
+RATINGS = ["G", "PG", "PG13", "NC16", "M18", "R21", "Refused"]
+
+
+def rating_rank(rating: str) -> int:
+    """Position of `rating` in RATINGS; unknown values rank lowest (-1)."""
+    normalized = str(rating).replace("-", "").replace(" ", "").upper()
+    for i, r in enumerate(RATINGS):
+        if r.upper() == normalized:
+            return i
+    return -1
+
+
+# Static request prefix: the same bytes lead every chunk request so the provider's prompt cache
+# can serve them (cached from 1024 tokens). Anything that varies per chunk (frames, timestamps) goes after it.
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": [
+        {"type": "input_text", "text": SYSTEM_PROMPT_FILM_CLASSIFICATION},
+    ],
+}
+USER_INSTRUCTION = {
+    "type": "input_text",
+    "text": (
+        "You are given a sample of frames from the film. "
+        "Classify strictly per the schema and return only valid JSON."
+    ),
+}
+
+
+def make_message(video_content_lst):
+    input_messages = [
+        SYSTEM_MESSAGE,
+        {
+            "role": "user",
+            "content": [USER_INSTRUCTION] + list(video_content_lst),
+        }
+    ]
+    return input_messages
+
+
+def prompt_cache_key(model: str = MODEL) -> str:
+    """Stable `prompt_cache_key` for the static prefix: same model + prompt -> same key across runs."""
+    prefix = json.dumps(make_message([]), sort_keys=True, separators=(",", ":"))
+    return "film-cls-" + hashlib.sha256((model + prefix).encode()).hexdigest()[:16]
+
+
+def chunk_list(items: List[Any], chunk_size: int) -> List[List[Any]]:
+    """Split a list into consecutive chunks of size `chunk_size`.
+
+    Returns a list of lists; the last chunk may be smaller if the
+    total number of items is not divisible by `chunk_size`.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def iter_chunks(items: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """Lazy `chunk_list`: pull from `items` only as each chunk is filled."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def inference_text(client, input_messages, model: str = MODEL, cache_key: Optional[str] = None):
+    response = client.responses.create(
+        model=model,
+        input = input_messages,
+        prompt_cache_key=cache_key or prompt_cache_key(model),
+    )
+    # usage=ResponseUsage(input_tokens=22807, input_tokens_details=InputTokensDetails(cached_tokens=0), output_tokens=1896, output_tokens_details=OutputTokensDetails(reasoning_tokens=1280), total_tokens=24703),
+    return response
+
+
+def parse_response(response) -> Dict[str, Any]:
+    return json.loads(response.output_text)
+
+
+def usage_to_dict(usage) -> Dict[str, Any]:
+    if usage is None:
+        return {}
+    if hasattr(usage, "model_dump"):
+        return usage.model_dump()
+    return dict(usage)
+
+
+def cached_tokens(usage: Dict[str, Any]) -> int:
+    return ((usage or {}).get("input_tokens_details") or {}).get("cached_tokens") or 0
+
+
+@dataclass
+class PromptCacheStats:
+    """Prompt-cache hits across chunk requests, from each response's `usage`."""
+    requests: int = 0
+    requests_with_hits: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+    def add(self, usage: Dict[str, Any]) -> None:
+        if not usage:
+            return
+        cached = cached_tokens(usage)
+        self.requests += 1
+        self.requests_with_hits += cached > 0
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.cached_tokens += cached
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of input tokens served from the prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def report(self, name: str = "prompt cache") -> str:
+        return (
+            f"{name}: {self.cached_tokens}/{self.input_tokens} input tokens cached ({self.hit_rate:.1%}), "
+            f"{self.requests_with_hits}/{self.requests} requests hit"
+        )
+
+
+def classify_chunk(
+    client,
+    content_chunk: List[Dict[str, str]],
+    model: str = MODEL,
+    response_cache=None,
+    bypass_cache: bool = False,
+    cache_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Classify one chunk, going through `response_cache` (a `response_cache.ResponseCache`) if given.
+
+    `cache_key` is the provider `prompt_cache_key` (default: `prompt_cache_key(model)`).
+    Returns `{"parsed", "usage", "cached_tokens", "from_cache"}`.
+    """
+    input_messages = make_message(content_chunk)
+    key = None
+    if response_cache is not None:
+        from response_cache import request_key
+        key = request_key(model, input_messages)
+        hit = response_cache.get(key, bypass=bypass_cache)
+        if hit is not None:
+            return {"parsed": hit["parsed"], "usage": hit["usage"], "cached_tokens": 0, "from_cache": True}
+
+    response = inference_text(client, input_messages, model=model, cache_key=cache_key)
+    parsed = parse_response(response)
+    usage = usage_to_dict(getattr(response, "usage", None))
+    if response_cache is not None:
+        response_cache.put(key, model, parsed, usage)
+    return {"parsed": parsed, "usage": usage, "cached_tokens": cached_tokens(usage), "from_cache": False}
@@ -0,0 +1,382 @@
+"""
+Batch film classifier with an append-only checkpoint.
+
+Run:
+    uv run main.py classify data/YT_download/ --checkpoint data/runs/catalogue.jsonl
+    uv run main.py classify manifest.txt --max-videos 4 --max-concurrency 16 --tpm 2000000
+
+Re-running the same command skips every chunk (and video) already in the checkpoint.
+
+    uv run main.py classify data/YT_download/ --checkpoint data/runs/recut.jsonl --segments data/segments.parquet
+
+With `--segments`, chunk verdicts are also kept per time range in a Parquet store; a later run
+(new checkpoint) after a re-cut or prompt change only classifies segments whose frames or prompt changed.
+
+    uv run main.py download --url-file urls.txt --workers 4 --target-width 480
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rich import print as rich_print
+from dotenv import find_dotenv, load_dotenv
+
+from aggregate import FilmAggregator
+from async_inference import AsyncChunkClassifier
+from frames import extract_timed_frames, make_image_content, make_raw_image_content
+from inference import MODEL
+from segment_store import prompt_fingerprint, segment_row, stored_parsed, timed_chunks
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi")
+# checkpoint params that are run options rather than frame sampling (kept out of the segment prompt fingerprint)
+RUN_OPTIONS = ("segments", "upload_frames", "structured")
+
+
+def load_videos(source: str) -> List[Dict[str, str]]:
+    """Videos from a directory, or a manifest (one path per line, or JSONL with `path` and optional `id`)."""
+    src = Path(source)
+    if src.is_dir():
+        paths = sorted(p for p in src.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS)
+        return [{"id": p.stem, "path": str(p)} for p in paths]
+
+    videos = []
+    # a line listed twice would classify (and checkpoint) the same video twice
+    for line in dict.fromkeys(line.strip() for line in src.read_text().splitlines()):
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            entry = json.loads(line)
+            path = entry["path"]
+            videos.append({"id": entry.get("id", Path(path).stem), "path": path})
+        else:
+            videos.append({"id": Path(line).stem, "path": line})
+    return videos
+
+
+class Checkpoint:
+    """Append-only JSONL log of run params, chunk results and finished videos."""
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.params = params
+        self.chunks: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self.num_chunks: Dict[str, int] = {}
+        self.done_videos: Dict[str, Dict[str, Any]] = {}  # video_id -> verdict
+        self._load()
+        self._f = open(self.path, "a", encoding="utf-8")
+        if not self.path.stat().st_size:
+            self._append({"event": "run", "params": params})
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                event = rec.get("event")
+                if event == "run" and rec["params"] != self.params:
+                    raise ValueError(
+                        f"{self.path} was written with different params {rec['params']}; "
+                        "chunk indices would not line up. Use a new --checkpoint."
+                    )
+                if event == "chunk":
+                    self.chunks.setdefault(rec["video_id"], {})[rec["chunk_idx"]] = rec
+                    self.num_chunks[rec["video_id"]] = rec["num_chunks"]
+                elif event == "video_done":
+                    self.done_videos[rec["video_id"]] = rec["verdict"]
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(rec) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def write_chunk(
+        self, video_id: str, chunk_idx: int, num_chunks: int, result: Dict[str, Any], segment: Dict[str, Any],
+    ) -> None:
+        rec = {
+            "event": "chunk",
+            "video_id": video_id,
+            "chunk_idx": chunk_idx,
+            "num_chunks": num_chunks,
+            "start_sec": segment["start_sec"],
+            "end_sec": segment["end_sec"],
+            "parsed": result["parsed"],
+            "usage": result.get("usage", {}),
+            "latency_sec": result.get("latency_sec"),
+            "cached_tokens": result.get("cached_tokens", 0),
+            "ts": time.time(),
+        }
+        self.chunks.setdefault(video_id, {})[chunk_idx] = rec
+        self._append(rec)
+
+    def write_video_done(self, video_id: str, verdict: Dict[str, Any]) -> None:
+        self.done_videos[video_id] = verdict
+        self._append({"event": "video_done", "video_id": video_id, "verdict": verdict, "ts": time.time()})
+
+    def close(self) -> None:
+        self._f.close()
+
+
+async def classify_video(
+    video: Dict[str, str],
+    classifier: AsyncChunkClassifier,
+    checkpoint: Checkpoint,
+    args: argparse.Namespace,
+    frame_cache=None,
+    uploader=None,
+    segment_store=None,
+) -> Dict[str, Any]:
+    video_id = video["id"]
+    done = checkpoint.chunks.get(video_id, {})
+
+    # decode off the event loop so other videos keep their requests flowing
+    timed = await asyncio.to_thread(
+        extract_timed_frames,
+        video["path"],
+        interval_sec=args.interval_sec,
+        limit=args.limit,
+        jpeg_quality=args.jpeg_quality,
+        target_width=args.target_width,
+        verbose=False,
+        cache=frame_cache,
+        tile_aware=args.tile_aware,
+        model=args.model,
+        # frames that get uploaded are never base64-encoded
+        make_content=make_raw_image_content if uploader is not None else make_image_content,
+    )
+    if segment_store is not None:
+        # the store only changes for this video once it is done, so a resumed run plans the same segments
+        sampling = {k: v for k, v in checkpoint.params.items() if k not in RUN_OPTIONS}
+        prompt_fp = prompt_fingerprint(classifier.model, classifier.request_params, sampling=sampling)
+        segments = segment_store.plan(video_id, timed, args.chunk_size, args.interval_sec, prompt_fp)
+    else:
+        segments = timed_chunks(timed, args.chunk_size, args.interval_sec)
+    content_chunks = [seg["contents"] for seg in segments]
+    todo = [idx for idx in range(len(content_chunks)) if idx not in done]
+    for idx in todo:
+        if segments[idx]["reused"] is not None:
+            checkpoint.write_chunk(
+                video_id, idx, len(segments), {"parsed": stored_parsed(segments[idx]["reused"])}, segments[idx],
+            )
+    todo = [idx for idx in todo if segments[idx]["reused"] is None]
+    rich_print(f"[bold]{video_id}[/]: {len(content_chunks)} chunks, {len(done)} from checkpoint, {len(todo)} to run")
+
+    async def _classify(idx: int) -> Dict[str, Any]:
+        if uploader is None:
+            return await classifier.classify_chunk(idx, content_chunks[idx])
+        # only frames of chunks still to run are uploaded; the rest are already in the checkpoint
+        from file_refs import classify_uploaded
+        return await classify_uploaded(uploader, classifier, idx, content_chunks[idx])
+
+    tasks = [asyncio.create_task(_classify(idx)) for idx in todo]
+    failures = []
+    for next_done in asyncio.as_completed(tasks):
+        # one bad chunk must not cancel its siblings: they are checkpointed and only it re-runs on resume
+        try:
+            result = await next_done
+        except Exception as e:
+            failures.append(e)
+            rich_print(f"[red]{video_id}: {e}[/red]")
+            continue
+        checkpoint.write_chunk(video_id, result["chunk_idx"], len(segments), result, segments[result["chunk_idx"]])
+    if failures:
+        raise RuntimeError(f"{len(failures)}/{len(todo)} chunk(s) failed")
+
+    film = FilmAggregator()
+    for idx, rec in sorted(checkpoint.chunks.get(video_id, {}).items()):
+        film.update(idx, rec["parsed"])
+    verdict = film.verdict()
+    if segment_store is not None:
+        rows = []
+        for idx, rec in sorted(checkpoint.chunks.get(video_id, {}).items()):
+            seg = segments[idx]
+            if seg["reused"] is not None:
+                # same verdict, re-indexed to where these frames sit in this cut
+                rows.append({
+                    **seg["reused"], "video_id": video_id, "chunk_idx": idx, "start_sec": seg["start_sec"],
+                    "end_sec": seg["end_sec"], "frame_timestamps": seg["timestamps"], "frame_phashes": seg["phashes"],
+                })
+            else:
+                rows.append(segment_row(video_id, seg, prompt_fp, classifier.model, rec["parsed"], rec.get("usage")))
+        segment_store.replace_video(video_id, rows)
+        segment_store.save()
+    checkpoint.write_video_done(video_id, verdict)
+    rich_print(f"[bold green]{video_id}[/]: {verdict['rating']}")
+    return verdict
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    params = {
+        "model": args.model,
+        "interval_sec": args.interval_sec,
+        "limit": args.limit,
+        "chunk_size": args.chunk_size,
+        "jpeg_quality": args.jpeg_quality,
+        "target_width": args.target_width,
+        "tile_aware": args.tile_aware,
+        # not sampling, but --segments changes chunk boundaries and the others what each chunk sent
+        "segments": args.segments,
+        "upload_frames": bool(args.upload_frames),
+        "structured": args.structured,
+    }
+    checkpoint = Checkpoint(args.checkpoint, params)
+    videos = load_videos(args.source)
+    pending = [v for v in videos if v["id"] not in checkpoint.done_videos]
+    rich_print(f"{len(videos)} videos, {len(videos) - len(pending)} already done")
+
+    frame_cache = None
+    if args.frame_cache:
+        from frame_cache import FrameCache
+        frame_cache = FrameCache(args.frame_cache, verbose=False)
+    uploader = None
+    if args.upload_frames:
+        from file_refs import FrameUploader
+        uploader = FrameUploader(db_path=args.upload_frames, verbose=args.verbose)
+    segment_store = None
+    if args.segments:
+        from segment_store import SegmentStore
+        segment_store = SegmentStore(args.segments)
+    response_cache = None
+    if args.response_cache:
+        from response_cache import ResponseCache
+        response_cache = ResponseCache(args.response_cache)
+
+    classifier = AsyncChunkClassifier(
+        model=args.model,
+        max_concurrency=args.max_concurrency,
+        rpm=args.rpm,
+        tpm=args.tpm,
+        response_cache=response_cache,
+        cache_key=args.prompt_cache_key,
+        structured=args.structured,
+        verbose=args.verbose,
+    )
+    video_slots = asyncio.Semaphore(args.max_videos)
+
+    async def _one(video):
+        async with video_slots:
+            try:
+                return video["id"], await classify_video(
+                    video, classifier, checkpoint, args, frame_cache, uploader, segment_store,
+                )
+            except Exception as e:
+                rich_print(f"[red]{video['id']} failed: {e}[/red]; completed chunks stay in the checkpoint")
+                return video["id"], None
+
+    try:
+        fresh = dict(await asyncio.gather(*[_one(v) for v in pending]))
+        # videos finished in an earlier run keep their checkpointed verdict
+        results = {v["id"]: fresh[v["id"]] if v["id"] in fresh else checkpoint.done_videos[v["id"]] for v in videos}
+        if classifier.cache_stats.requests:
+            rich_print(classifier.cache_stats.report())
+        if classifier.parse_stats.outputs:
+            rich_print(classifier.parse_stats.report())
+    finally:
+        checkpoint.close()
+        if response_cache is not None:
+            response_cache.close()
+        if uploader is not None:
+            uploader.report()
+            uploader.close()
+    return results
+
+
+def cmd_classify(args: argparse.Namespace) -> None:
+    load_dotenv(find_dotenv())
+    results = asyncio.run(run(args))
+    failed = [video_id for video_id, verdict in results.items() if verdict is None]
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        rich_print(f"[bold]Saved[/]: {args.output}")
+    if failed:
+        rich_print(f"[red]{len(failed)} video(s) failed[/]: {failed}; re-run the same command to resume")
+        raise SystemExit(1)
+
+
+def cmd_download(args: argparse.Namespace) -> None:
+    from download import download_batch
+
+    urls = list(args.urls)
+    if args.url_file:
+        urls += [u.strip() for u in Path(args.url_file).read_text().splitlines() if u.strip() and not u.startswith("#")]
+    records = download_batch(
+        urls,
+        args.output_dir,
+        workers=args.workers,
+        archive_path=args.archive,
+        target_width=args.target_width,
+        limit_sec=args.limit_sec,
+        audio=not args.no_audio,
+    )
+    if any(r["status"] == "failed" for r in records):
+        raise SystemExit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="IMDA film rating classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("classify", help="Classify a directory or manifest of videos, resumably")
+    p.add_argument("source", help="Directory of videos, or a manifest (paths / JSONL with path,id)")
+    p.add_argument("--checkpoint", default="data/runs/checkpoint.jsonl", help="Append-only JSONL checkpoint")
+    p.add_argument("--output", default=None, help="Write film verdicts JSON here when done")
+    p.add_argument("--model", default=MODEL)
+    p.add_argument("--interval-sec", type=float, default=1.0)
+    p.add_argument("--limit", type=int, default=None, help="Max frames per video")
+    p.add_argument("--chunk-size", type=int, default=32)
+    p.add_argument("--target-width", type=int, default=480)
+    p.add_argument("--jpeg-quality", type=int, default=92)
+    p.add_argument("--tile-aware", action="store_true", help="Treat --target-width as a minimum; pick size/detail for fewest tiles")
+    p.add_argument("--max-videos", type=int, default=4, help="Videos in flight at once")
+    p.add_argument("--max-concurrency", type=int, default=16, help="Chunk requests in flight across all videos")
+    p.add_argument("--rpm", type=int, default=None, help="Requests-per-minute budget")
+    p.add_argument("--tpm", type=int, default=None, help="Tokens-per-minute budget")
+    p.add_argument("--prompt-cache-key", default=None, help="Provider prompt_cache_key (default: derived from model + prompt)")
+    p.add_argument("--frame-cache", default=None, help="FrameCache directory to reuse decoded frames")
+    p.add_argument("--response-cache", default=None, help="ResponseCache SQLite path to reuse chunk results")
+    p.add_argument(
+        "--upload-frames", default=None, metavar="DB",
+        help="Upload frames once via the Files API and send file IDs; DB is the frame-hash -> file_id map",
+    )
+    p.add_argument(
+        "--segments", default=None, metavar="PARQUET",
+        help="Time-indexed segment store; segments with unchanged frames and prompt are reused, not re-classified",
+    )
+    p.add_argument(
+        "--structured", action="store_true",
+        help="Request the strict JSON schema (schema.py) and validate each chunk; invalid chunks are re-requested alone",
+    )
+    p.add_argument("--verbose", action="store_true")
+    p.set_defaults(func=cmd_classify)
+
+    p = sub.add_parser("download", help="Download many videos concurrently, skipping IDs in the archive")
+    p.add_argument("urls", nargs="*", help="Video URLs")
+    p.add_argument("--url-file", default=None, help="File with one URL per line")
+    p.add_argument("--output-dir", default="data/YT_download/")
+    p.add_argument("--archive", default="data/YT_download/archive.txt", help="yt-dlp download archive")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--target-width", type=int, default=None, help="Smallest format at least this wide")
+    p.add_argument("--limit-sec", type=float, default=None, help="Only the first N seconds")
+    p.add_argument("--no-audio", action="store_true")
+    p.set_defaults(func=cmd_download)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import math
+import queue
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from rich import print as rich_print
+
+from frames import iter_frame_contents, planned_sample_count
+from inference import MODEL, classify_chunk, iter_chunks
+
+
+_DONE = object()
+
+
+def iter_content_chunks(
+    video_path: str,
+    chunk_size: int = 32,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    verbose: bool = False,
+    dedup=None,
+) -> Iterator[List[Dict[str, str]]]:
+    """Decode, encode and group frames into chunks lazily; only one chunk is held at a time."""
+    contents = iter_frame_contents(
+        video_path, interval_sec, limit, jpeg_quality, target_width, verbose=verbose, dedup=dedup,
+    )
+    yield from iter_chunks(contents, chunk_size)
+
+
+def prefetch(iterator: Iterator[Any], max_pending: int = 2) -> Iterator[Any]:
+    """Run `iterator` in a background thread, buffering at most `max_pending` items.
+
+    cv2 decode/encode release the GIL, so the producer keeps decoding while the
+    consumer waits on the network. The bounded queue caps memory at a few chunks.
+    """
+    buf: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce():
+        try:
+            for item in iterator:
+                if not _put(item):
+                    return
+            _put(_DONE)
+        except BaseException as e:  # surface producer errors in the consumer
+            _put(e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()  # release the capture handle even when the consumer stops early
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buf.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def stream_classify(
+    client,
+    video_path: str,
+    chunk_size: int = 32,
+    interval_sec: float = 1.0,
+    limit: Optional[int] = None,
+    jpeg_quality: int = 92,
+    target_width: int = 480,
+    max_pending_chunks: int = 2,
+    model: str = MODEL,
+    verbose: bool = True,
+    dedup=None,
+    response_cache=None,
+    bypass_cache: bool = False,
+    stop_policy=None,
+    aggregator=None,
+) -> Iterator[Tuple[int, Dict[str, Any], Dict[str, Any]]]:
+    """Yield `(chunk_idx, parsed, usage)` as each chunk is classified.
+
+    Each chunk is sent as soon as it fills while the next ones are decoded in the
+    background; peak memory is `max_pending_chunks + 1` chunks, not the whole film.
+    `aggregator` (an `aggregate.FilmAggregator`) is updated with every chunk. With
+    `stop_policy` (an `early_stop.EarlyStopPolicy`) the stream ends, and decoding
+    stops, as soon as the policy fires; the reason and the chunk indices left unclassified
+    (planned from the video's frame count) are recorded with `aggregator.mark_stopped`.
+    """
+    if aggregator is None and stop_policy is not None:
+        from aggregate import FilmAggregator
+        aggregator = FilmAggregator()
+    chunks = iter_content_chunks(
+        video_path, chunk_size, interval_sec, limit, jpeg_quality, target_width, dedup=dedup,
+    )
+    for idx, content_chunk in enumerate(prefetch(chunks, max_pending_chunks)):
+        if verbose:
+            print(f"processing chunk {idx + 1} with {len(content_chunk)} frames")
+        result = classify_chunk(
+            client, content_chunk, model=model, response_cache=response_cache, bypass_cache=bypass_cache,
+        )
+        parsed = result["parsed"]
+        if aggregator is not None:
+            aggregator.update(idx, parsed)
+        if verbose:
+            rich_print(f"\trating: {parsed.get('rating')}")
+            rich_print(f"\toverall_rationale: {parsed.get('overall_rationale')}")
+            if aggregator is not None:
+                rich_print(f"\tfilm so far: {aggregator.progress_line()}")
+        yield idx, parsed, result["usage"]
+
+        if stop_policy is not None:
+            stop_reason = stop_policy.check_aggregate(aggregator)
+            if stop_reason is not None:
+                num_chunks = math.ceil(planned_sample_count(video_path, interval_sec, limit) / chunk_size)
+                aggregator.mark_stopped(stop_reason, list(range(idx + 1, max(num_chunks, idx + 1))))
+                if verbose:
+                    rich_print(
+                        f"[bold yellow]early stop[/]: {stop_reason}, skipped chunks {aggregator.skipped_chunks}"
+                    )
+                break
+
+    if verbose and dedup is not None:
+        dedup.stats.report(str(video_path))
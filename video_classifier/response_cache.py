@@ -0,0 +1,88 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_DB_PATH = "data/response_cache.sqlite"
+
+
+def request_key(model: str, input_messages: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> str:
+    """Content address of a request: model + full input (system prompt, instructions, frame bytes) + extra params."""
+    h = hashlib.sha256()
+    h.update(model.encode())
+    h.update(json.dumps(input_messages, sort_keys=True, separators=(",", ":")).encode())
+    if extra:
+        h.update(json.dumps(extra, sort_keys=True, separators=(",", ":")).encode())
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """SQLite store of parsed chunk classifications keyed by `request_key`.
+
+    - `ttl_sec`: entries older than this are treated as misses (None = never expire)
+    - `bypass=True` on `get` forces a miss so the caller re-runs and overwrites the entry
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, ttl_sec: Optional[float] = None):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                parsed TEXT NOT NULL,
+                usage TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, bypass: bool = False) -> Optional[Dict[str, Any]]:
+        if bypass:
+            self.misses += 1
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT model, created_at, parsed, usage FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl_sec is not None and time.time() - row[1] > self.ttl_sec):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            "model": row[0],
+            "created_at": row[1],
+            "parsed": json.loads(row[2]),
+            "usage": json.loads(row[3]),
+        }
+
+    def put(self, key: str, model: str, parsed: Dict[str, Any], usage: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, created_at, parsed, usage) VALUES (?, ?, ?, ?, ?)",
+                (key, model, time.time(), json.dumps(parsed), json.dumps(usage)),
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        if self.ttl_sec is None:
+            return 0
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_sec,))
+            self._conn.commit()
+        return cur.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,128 @@
+import copy
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+
+# The prompts.py "Suggested output format", as a strict schema.
+Rating = Literal["G", "PG", "PG13", "NC16", "M18", "R21", "Refused"]
+FloorRating = Literal["G", "PG", "PG13", "NC16", "M18", "R21"]
+Severity = Literal["none", "mild", "moderate", "strong", "very_strong"]
+Frequency = Literal["none", "infrequent", "occasional", "frequent"]
+Detail = Literal["none", "non_detailed", "some", "moderate", "strong", "explicit"]
+
+
+class _Strict(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class ElementAssessment(_Strict):
+    severity: Severity
+    frequency: Frequency
+    detail: Detail
+    rating_floor: FloorRating
+    notes: str
+
+
+class ElementAssessments(_Strict):
+    theme_message: ElementAssessment
+    violence: ElementAssessment
+    sex: ElementAssessment
+    nudity: ElementAssessment
+    language: ElementAssessment
+    drugs: ElementAssessment
+    horror: ElementAssessment
+
+
+class PublicOrderHarmonyFlags(_Strict):
+    racial_religious_sensitivity: Literal["none", "mild", "moderate", "strong"]
+    national_interest_public_order: Literal["none", "present"]
+    notes: str
+
+
+class Refusal(_Strict):
+    is_refused: bool
+    grounds: List[str]
+    notes: str
+
+
+class ChunkClassification(_Strict):
+    rating: Rating
+    decision_type: Literal["advisory", "age-restricted", "refused"]
+    overall_rationale: str
+    element_assessments: ElementAssessments
+    public_order_harmony_flags: PublicOrderHarmonyFlags
+    refusal: Refusal
+    consumer_advice: List[str]
+    recommended_edits_for_lower_rating: List[str]
+    confidence: float = Field(ge=0.0, le=1.0)
+
+
+def strict_json_schema(model: type) -> Dict[str, Any]:
+    """`model`'s JSON schema in the form structured outputs' strict mode accepts:
+    every object closed (`additionalProperties: false`) with all of its properties required."""
+    schema = copy.deepcopy(model.model_json_schema())
+
+    def _walk(node: Any) -> None:
+        if isinstance(node, dict):
+            if node.get("type") == "object" and "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            for value in node.values():
+                _walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                _walk(value)
+
+    _walk(schema)
+    return schema
+
+
+# Built once at import; `AsyncChunkClassifier(structured=True)` sends these as its `request_params`.
+CHUNK_JSON_SCHEMA = strict_json_schema(ChunkClassification)
+CHUNK_TEXT_FORMAT = {
+    "type": "json_schema",
+    "name": "film_chunk_classification",
+    "schema": CHUNK_JSON_SCHEMA,
+    "strict": True,
+}
+STRUCTURED_REQUEST_PARAMS = {"text": {"format": CHUNK_TEXT_FORMAT}}
+
+
+class ChunkParseError(ValueError):
+    """A chunk's output failed JSON parsing / schema validation on every attempt."""
+
+
+@dataclass
+class ParseStats:
+    """Parse + validate cost and failures across chunk outputs."""
+    outputs: int = 0
+    failures: int = 0
+    total_sec: float = 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return 1000 * self.total_sec / self.outputs if self.outputs else 0.0
+
+    def report(self, name: str = "parse") -> str:
+        return f"{name}: {self.outputs} outputs, {self.failures} invalid, {self.mean_ms:.2f} ms/output"
+
+
+def validate_chunk_output(text: str, stats: Optional[ParseStats] = None) -> Dict[str, Any]:
+    """Parse and validate one output in a single pass with the compiled `ChunkClassification` validator.
+
+    Raises `pydantic.ValidationError` (a `ValueError`) on malformed JSON or schema violations.
+    """
+    t0 = time.perf_counter()
+    try:
+        return ChunkClassification.model_validate_json(text).model_dump()
+    except ValidationError:
+        if stats is not None:
+            stats.failures += 1
+        raise
+    finally:
+        if stats is not None:
+            stats.outputs += 1
+            stats.total_sec += time.perf_counter() - t0
@@ -0,0 +1,214 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from rich import print as rich_print
+
+from aggregate import chunk_rating
+from dedup import decode_content, hamming, phash
+from inference import chunk_list, make_message
+from response_cache import request_key
+
+
+TimedContent = Tuple[float, Dict[str, str]]
+
+# Max Hamming distance (of 64 bits) for two frame fingerprints to count as the same footage;
+# re-encoding moves a few bits, a different frame of a moving shot moves many.
+FRAME_MATCH_BITS = 6
+
+# One row per classified time segment (chunk) of a video.
+SEGMENT_COLUMNS = {
+    "video_id": "string",
+    "chunk_idx": "int64",
+    "start_sec": "float64",
+    "end_sec": "float64",
+    "frame_timestamps": "object",
+    "frame_phashes": "object",
+    "prompt_fp": "string",
+    "model": "string",
+    "rating": "string",
+    "is_refused": "bool",
+    "confidence": "float64",
+    "parsed_json": "string",
+    "input_tokens": "int64",
+    "output_tokens": "int64",
+    "classified_at": "float64",
+}
+
+
+def prompt_fingerprint(
+    model: str,
+    request_params: Optional[Dict[str, Any]] = None,
+    sampling: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Everything in a request except the frames: model, system prompt, instructions, request params
+    and (optionally) the frame sampling params the verdicts were produced with."""
+    extra = {**(request_params or {}), "sampling": sampling} if sampling else request_params
+    return request_key(model, make_message([]), extra)
+
+
+def frame_fingerprint(content: Dict[str, str]) -> str:
+    """`dedup.phash` of an `input_image` part (data URL or raw JPEG), as 16 hex digits; survives re-encoding."""
+    return f"{phash(decode_content(content)):016x}"
+
+
+def _same_frames(a: Sequence[str], b: Sequence[str]) -> bool:
+    return len(a) == len(b) and all(hamming(int(x, 16), int(y, 16)) <= FRAME_MATCH_BITS for x, y in zip(a, b))
+
+
+def _segment(idx: int, timed: Sequence[TimedContent], phashes: Sequence[str], interval_sec: float) -> Dict[str, Any]:
+    return {
+        "chunk_idx": idx,
+        "start_sec": float(timed[0][0]),
+        "end_sec": float(timed[-1][0]) + interval_sec,
+        "timestamps": [float(ts) for ts, _ in timed],
+        "contents": [content for _, content in timed],
+        "phashes": list(phashes),
+        "reused": None,
+    }
+
+
+def timed_chunks(timed: Sequence[TimedContent], chunk_size: int, interval_sec: float) -> List[Dict[str, Any]]:
+    """Chunk `(timestamp_sec, content)` pairs like `chunk_list`, keeping each chunk's time range
+    `[start_sec, end_sec)` (first frame to one `interval_sec` past its last) and frame fingerprints."""
+    phashes = [frame_fingerprint(content) for _, content in timed]
+    bounds = chunk_list(list(range(len(timed))), chunk_size)
+    return [
+        _segment(idx, timed[b[0]:b[-1] + 1], phashes[b[0]:b[-1] + 1], interval_sec)
+        for idx, b in enumerate(bounds)
+    ]
+
+
+def segment_row(
+    video_id: str,
+    segment: Dict[str, Any],
+    prompt_fp: str,
+    model: str,
+    parsed: Dict[str, Any],
+    usage: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    usage = usage or {}
+    return {
+        "video_id": video_id,
+        "chunk_idx": segment["chunk_idx"],
+        "start_sec": segment["start_sec"],
+        "end_sec": segment["end_sec"],
+        "frame_timestamps": segment["timestamps"],
+        "frame_phashes": segment["phashes"],
+        "prompt_fp": prompt_fp,
+        "model": model,
+        "rating": chunk_rating(parsed),
+        "is_refused": bool((parsed.get("refusal") or {}).get("is_refused")),
+        "confidence": parsed.get("confidence", float("nan")),
+        "parsed_json": json.dumps(parsed),
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "classified_at": time.time(),
+    }
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in SEGMENT_COLUMNS.items()})
+
+
+class SegmentStore:
+    """Chunk verdicts in one Parquet file, one row per `(video_id, start_sec, end_sec)` segment.
+
+    Each row keeps the perceptual hashes of its frames. `plan` lays a video's sampled frames
+    against its stored segments (same `prompt_fp`): wherever a stored segment's frames recur
+    as a contiguous run, at any time offset, that run is reused as a segment; only the leftover
+    frames (the segments a re-cut or edit overlapped, and new footage) are chunked to be
+    classified. `replace_video` + `save` record the video's current segments.
+    """
+
+    def __init__(self, path: str, verbose: bool = True):
+        self.path = Path(path)
+        self.verbose = verbose
+        self.df = pd.read_parquet(self.path) if self.path.exists() else _empty_frame()
+        for col in SEGMENT_COLUMNS:
+            if col not in self.df:
+                self.df[col] = None  # written by an older version; such rows are never reused
+
+    def video(self, video_id: str) -> pd.DataFrame:
+        """Segments of one video in time order."""
+        return self.df[self.df["video_id"] == video_id].sort_values("start_sec").reset_index(drop=True)
+
+    def at(self, video_id: str, t_sec: float) -> Optional[Dict[str, Any]]:
+        """The segment covering second `t_sec` of a video, if any."""
+        rows = self.df[(self.df["video_id"] == video_id) & (self.df["start_sec"] <= t_sec) & (self.df["end_sec"] > t_sec)]
+        return rows.iloc[0].to_dict() if len(rows) else None
+
+    def plan(
+        self,
+        video_id: str,
+        timed: Sequence[TimedContent],
+        chunk_size: int,
+        interval_sec: float,
+        prompt_fp: str,
+    ) -> List[Dict[str, Any]]:
+        """Segments covering `timed` in time order; reusable ones carry their stored row under `"reused"`."""
+        phashes = [frame_fingerprint(content) for _, content in timed]
+        stored = self.df[(self.df["video_id"] == video_id) & (self.df["prompt_fp"] == prompt_fp)]
+        candidates = [
+            (list(row["frame_phashes"]), row)
+            for row in stored.sort_values("start_sec").to_dict("records")
+            if row["frame_phashes"] is not None and len(row["frame_phashes"])
+        ]
+
+        spans: List[Tuple[int, int, Optional[Dict[str, Any]]]] = []  # (start, end, stored row) over frame indices
+        leftover_start = None
+        i = 0
+        while i < len(timed):
+            match = next(
+                (row for hashes, row in candidates if _same_frames(phashes[i:i + len(hashes)], hashes)), None,
+            )
+            if match is None:
+                leftover_start = i if leftover_start is None else leftover_start
+                i += 1
+                continue
+            if leftover_start is not None:
+                spans.append((leftover_start, i, None))
+                leftover_start = None
+            spans.append((i, i + len(match["frame_phashes"]), match))
+            i += len(match["frame_phashes"])
+        if leftover_start is not None:
+            spans.append((leftover_start, len(timed), None))
+
+        segments: List[Dict[str, Any]] = []
+        for start, end, row in spans:
+            pieces = [(start, end)] if row is not None else [
+                (b[0], b[-1] + 1) for b in chunk_list(list(range(start, end)), chunk_size)
+            ]
+            for a, b in pieces:
+                seg = _segment(len(segments), timed[a:b], phashes[a:b], interval_sec)
+                seg["reused"] = row
+                segments.append(seg)
+        if self.verbose:
+            reused = [s for s in segments if s["reused"] is not None]
+            moved = sum(s["start_sec"] != s["reused"]["start_sec"] for s in reused)
+            rich_print(
+                f"[bold]{video_id}[/]: {len(segments)} segments, {len(reused)} reused "
+                f"({moved} at a new time), {len(segments) - len(reused)} to classify"
+            )
+        return segments
+
+    def replace_video(self, video_id: str, rows: Sequence[Dict[str, Any]]) -> None:
+        """Make `rows` the video's segments; segments of an earlier cut or prompt are dropped."""
+        kept = self.df[self.df["video_id"] != video_id]
+        new = pd.DataFrame(list(rows), columns=list(SEGMENT_COLUMNS)).astype(SEGMENT_COLUMNS)
+        frames = [df for df in (kept, new) if len(df)]
+        self.df = pd.concat(frames, ignore_index=True) if frames else _empty_frame()
+        self.df = self.df.sort_values(["video_id", "start_sec"]).reset_index(drop=True)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self.df.to_parquet(tmp, index=False)
+        tmp.replace(self.path)
+
+
+def stored_parsed(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The chunk result of a stored segment row."""
+    return json.loads(row["parsed_json"])
@@ -0,0 +1,469 @@
+"""
+Local stand-in for the OpenAI endpoints the classifier uses, for offline testing.
+
+    from openai import OpenAI
+    with StubOpenAIServer() as server:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+        ...
+
+Run standalone:
+    uv run stub_server.py --port 8765
+"""
+import json
+import time
+import random
+import uuid
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from rich import print as rich_print
+
+
+STUB_CLASSIFICATION = {
+    "rating": "G",
+    "decision_type": "advisory",
+    "overall_rationale": "Stub response.",
+    "element_assessments": {
+        element: {"severity": "none", "frequency": "none", "detail": "none", "rating_floor": "G", "notes": ""}
+        for element in ("theme_message", "violence", "sex", "nudity", "language", "drugs", "horror")
+    },
+    "public_order_harmony_flags": {
+        "racial_religious_sensitivity": "none",
+        "national_interest_public_order": "none",
+        "notes": "",
+    },
+    "refusal": {"is_refused": False, "grounds": [], "notes": ""},
+    "consumer_advice": [],
+    "recommended_edits_for_lower_rating": [],
+    "confidence": 0.9,
+}
+
+
+# Stub input tokens are 2000 for the text prompt + 210 per image; a cache hit covers the
+# largest 128-token multiple of the prompt, as the real cache does.
+STUB_PREFIX_CACHED_TOKENS = 1920
+
+
+def default_responder(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the classification JSON the stub answers every Responses request with, keys in
+    the order of the request's `text.format` schema (if any), as structured outputs emit them."""
+    schema = ((body.get("text") or {}).get("format") or {}).get("schema") or {}
+    order = [k for k in schema.get("properties", {}) if k in STUB_CLASSIFICATION]
+    return {k: STUB_CLASSIFICATION[k] for k in order} if order else STUB_CLASSIFICATION
+
+
+def make_response_body(body: Dict[str, Any], output: Dict[str, Any], cached_tokens: int = 0) -> Dict[str, Any]:
+    n_images = sum(
+        1
+        for message in body.get("input", [])
+        if isinstance(message, dict)
+        for part in message.get("content", [])
+        if isinstance(part, dict) and part.get("type") == "input_image"
+    )
+    input_tokens = 2000 + 210 * n_images
+    output_tokens = 500
+    return {
+        "id": f"resp_{uuid.uuid4().hex[:24]}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": body.get("model", ""),
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": json.dumps(output), "annotations": []}],
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": cached_tokens},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+class _State:
+    def __init__(
+        self,
+        responder: Callable[[Dict[str, Any]], Dict[str, Any]],
+        batch_delay_sec: float,
+        latency_sec: float = 0.0,
+        latency_jitter_sec: float = 0.0,
+        stream_delta_chars: int = 16,
+        stream_delta_delay_sec: float = 0.0,
+        batch_request_limit: Optional[int] = None,
+    ):
+        self.responder = responder
+        self.batch_request_limit = batch_request_limit
+        self.batch_delay_sec = batch_delay_sec
+        self.latency_sec = latency_sec
+        self.latency_jitter_sec = latency_jitter_sec
+        self.stream_delta_chars = stream_delta_chars
+        self.stream_delta_delay_sec = stream_delta_delay_sec
+        self.streams_completed = 0
+        self.streams_closed_early = 0
+        self.lock = threading.RLock()
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.file_bytes: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.responses_requests = 0
+        self.responses_request_bytes = 0
+        self.seen_prefixes: set = set()
+
+    def prompt_cache_lookup(self, body: Dict[str, Any]) -> int:
+        """Simulated prompt cache: the text prefix (everything before the first image) is "cached"
+        once a request with the same `prompt_cache_key` has sent it. Returns cached tokens."""
+        prefix = []
+        for message in body.get("input", []):
+            for part in message.get("content", []) if isinstance(message, dict) else []:
+                if isinstance(part, dict) and part.get("type") == "input_image":
+                    break
+                prefix.append(part)
+            else:
+                continue
+            break
+        key = (body.get("prompt_cache_key"), body.get("model"), json.dumps(prefix, sort_keys=True))
+        with self.lock:
+            hit = key in self.seen_prefixes
+            self.seen_prefixes.add(key)
+        return STUB_PREFIX_CACHED_TOKENS if hit else 0
+
+    def missing_file_ids(self, body: Dict[str, Any]) -> List[str]:
+        """`input_image` file IDs in a Responses body that were never uploaded (or were deleted)."""
+        return [
+            part["file_id"]
+            for message in body.get("input", [])
+            if isinstance(message, dict)
+            for part in message.get("content", [])
+            if isinstance(part, dict) and part.get("type") == "input_image" and part.get("file_id")
+            and part["file_id"] not in self.files
+        ]
+
+    def add_file(self, data: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        obj = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[file_id] = obj
+            self.file_bytes[file_id] = data
+        return obj
+
+    def run_batch(self, batch: Dict[str, Any]) -> None:
+        out_lines, err_lines = [], []
+        raws = [raw for raw in self.file_bytes[batch["input_file_id"]].decode("utf-8").splitlines() if raw.strip()]
+        if self.batch_request_limit is not None and len(raws) > self.batch_request_limit:
+            raws = raws[:self.batch_request_limit]
+            batch["expired"] = True
+        for raw in raws:
+            req = json.loads(raw)
+            try:
+                body = make_response_body(req["body"], self.responder(req["body"]), self.prompt_cache_lookup(req["body"]))
+                out_lines.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                    "custom_id": req["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": body},
+                    "error": None,
+                })
+            except Exception as e:
+                err_lines.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                    "custom_id": req["custom_id"],
+                    "response": None,
+                    "error": {"code": "stub_error", "message": str(e)},
+                })
+        to_jsonl = lambda lines: "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        batch["output_file_id"] = self.add_file(to_jsonl(out_lines), "output.jsonl", "batch_output")["id"]
+        if err_lines:
+            batch["error_file_id"] = self.add_file(to_jsonl(err_lines), "errors.jsonl", "batch_output")["id"]
+        batch["request_counts"] = {
+            "total": len(out_lines) + len(err_lines),
+            "completed": len(out_lines),
+            "failed": len(err_lines),
+        }
+
+    def refresh_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        if batch["status"] == "in_progress" and time.time() - batch["in_progress_at"] >= self.batch_delay_sec:
+            self.run_batch(batch)
+            if batch.pop("expired", False):
+                batch["status"] = "expired"
+                batch["expired_at"] = int(time.time())
+            else:
+                batch["status"] = "completed"
+                batch["completed_at"] = int(time.time())
+        return batch
+
+
+def _make_handler(state: _State):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, obj: Any, status: int = 200) -> None:
+            data = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_bytes(self, data: bytes, content_type: str = "application/octet-stream") -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream_response(self, response: Dict[str, Any]) -> None:
+            """Send `response` as Responses SSE events, one output_text delta per `stream_delta_chars`."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            message = response["output"][0]
+            text = message["content"][0]["text"]
+            events = [{"type": "response.created", "response": dict(response, status="in_progress", output=[], usage=None)}]
+            events += [
+                {
+                    "type": "response.output_text.delta",
+                    "item_id": message["id"],
+                    "output_index": 0,
+                    "content_index": 0,
+                    "delta": text[i : i + state.stream_delta_chars],
+                    "logprobs": [],
+                }
+                for i in range(0, len(text), state.stream_delta_chars)
+            ]
+            events.append({"type": "response.completed", "response": response})
+            try:
+                for seq, event in enumerate(events):
+                    event["sequence_number"] = seq
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if event["type"] == "response.output_text.delta" and state.stream_delta_delay_sec:
+                        time.sleep(state.stream_delta_delay_sec)
+            except (BrokenPipeError, ConnectionResetError):
+                with state.lock:
+                    state.streams_closed_early += 1
+                return
+            with state.lock:
+                state.streams_completed += 1
+
+        def _not_found(self) -> None:
+            self._send_json({"error": {"message": f"no route for {self.command} {self.path}", "type": "not_found"}}, 404)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _parts(self, parts):
+            parts = [p for p in parts if p]
+            return parts[1:] if parts[:1] == ["v1"] else parts
+
+        def do_POST(self):
+            parts = self._parts(self.path.split("?")[0].split("/"))
+            if parts == ["files"]:
+                msg = BytesParser(policy=email_policy).parsebytes(
+                    b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._body()
+                )
+                fields: Dict[str, Any] = {}
+                filename = "upload"
+                for part in msg.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    if part.get_filename():
+                        filename = part.get_filename()
+                    fields[name] = part.get_payload(decode=True)
+                obj = state.add_file(fields.get("file", b""), filename, (fields.get("purpose") or b"").decode())
+                return self._send_json(obj)
+            if parts == ["batches"]:
+                req = json.loads(self._body())
+                if req["input_file_id"] not in state.files:
+                    return self._send_json({"error": {"message": "input file not found"}}, 400)
+                now = int(time.time())
+                batch = {
+                    "id": f"batch_{uuid.uuid4().hex[:24]}",
+                    "object": "batch",
+                    "endpoint": req["endpoint"],
+                    "input_file_id": req["input_file_id"],
+                    "completion_window": req.get("completion_window", "24h"),
+                    "status": "in_progress",
+                    "created_at": now,
+                    "in_progress_at": now,
+                    "metadata": req.get("metadata"),
+                    "output_file_id": None,
+                    "error_file_id": None,
+                }
+                with state.lock:
+                    state.batches[batch["id"]] = batch
+                return self._send_json(batch)
+            if parts == ["responses"]:
+                raw = self._body()
+                body = json.loads(raw)
+                with state.lock:
+                    state.responses_requests += 1
+                    state.responses_request_bytes += len(raw)
+                    missing = state.missing_file_ids(body)
+                if missing:
+                    return self._send_json(
+                        {"error": {"message": f"file(s) not found: {missing}", "type": "invalid_request_error"}}, 400
+                    )
+                if state.latency_sec or state.latency_jitter_sec:
+                    time.sleep(state.latency_sec + random.uniform(0, state.latency_jitter_sec))
+                response = make_response_body(body, state.responder(body), state.prompt_cache_lookup(body))
+                if body.get("stream"):
+                    return self._stream_response(response)
+                return self._send_json(response)
+            return self._not_found()
+
+        def do_GET(self):
+            parts = self._parts(self.path.split("?")[0].split("/"))
+            if len(parts) == 2 and parts[0] == "batches" and parts[1] in state.batches:
+                with state.lock:
+                    batch = state.refresh_batch(state.batches[parts[1]])
+                return self._send_json(batch)
+            if len(parts) == 2 and parts[0] == "files" and parts[1] in state.files:
+                return self._send_json(state.files[parts[1]])
+            if len(parts) == 3 and parts[0] == "files" and parts[2] == "content" and parts[1] in state.file_bytes:
+                return self._send_bytes(state.file_bytes[parts[1]])
+            return self._not_found()
+
+        def do_DELETE(self):
+            parts = self._parts(self.path.split("?")[0].split("/"))
+            if len(parts) == 2 and parts[0] == "files" and parts[1] in state.files:
+                with state.lock:
+                    state.files.pop(parts[1])
+                    state.file_bytes.pop(parts[1], None)
+                return self._send_json({"id": parts[1], "object": "file", "deleted": True})
+            return self._not_found()
+
+    return Handler
+
+
+class _BackgroundServer:
+    """Run `httpd` on a daemon thread; usable as a context manager."""
+
+    def __init__(self, httpd: ThreadingHTTPServer):
+        self.httpd = httpd
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        try:
+            super().copyfile(source, outputfile)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # clients probing metadata hang up mid-body
+
+
+class StubOpenAIServer(_BackgroundServer):
+    """Threaded HTTP server implementing /v1/files, /v1/batches and /v1/responses in memory.
+
+    `responder(request_body) -> classification dict` decides what each Responses call returns.
+    Batches stay `in_progress` for `batch_delay_sec` before completing (past `batch_request_limit`
+    requests a batch expires instead, leaving the rest without any output line); each Responses call
+    takes `latency_sec` (+ uniform `latency_jitter_sec`) to answer, to stand in for model latency.
+    `stream=True` requests get SSE events, one text delta per `stream_delta_chars` every `stream_delta_delay_sec`.
+    Responses requests referencing an unknown `input_image.file_id` get a 400, like the real API,
+    and report `cached_tokens` once the same text prefix was sent under the same `prompt_cache_key`.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        responder: Callable[[Dict[str, Any]], Dict[str, Any]] = default_responder,
+        batch_delay_sec: float = 0.0,
+        latency_sec: float = 0.0,
+        latency_jitter_sec: float = 0.0,
+        stream_delta_chars: int = 16,
+        stream_delta_delay_sec: float = 0.0,
+        batch_request_limit: Optional[int] = None,
+    ):
+        self.state = _State(
+            responder, batch_delay_sec, latency_sec, latency_jitter_sec, stream_delta_chars, stream_delta_delay_sec,
+            batch_request_limit,
+        )
+        super().__init__(ThreadingHTTPServer((host, port), _make_handler(self.state)))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class MediaFileServer(_BackgroundServer):
+    """Serve a directory of fixture media over HTTP (for downloader tests).
+
+    `url(name)` is the download URL of `directory/name`.
+    """
+
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(ThreadingHTTPServer((host, port), partial(_QuietFileHandler, directory=directory)))
+
+    def url(self, name: str) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI files/batches/responses endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay-sec", type=float, default=5.0)
+    parser.add_argument("--latency-sec", type=float, default=0.0, help="Delay before each /responses reply")
+    parser.add_argument("--latency-jitter-sec", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubOpenAIServer(
+        args.host, args.port,
+        batch_delay_sec=args.batch_delay_sec,
+        latency_sec=args.latency_sec,
+        latency_jitter_sec=args.latency_jitter_sec,
+    )
+    rich_print(f"[bold green]Stub OpenAI API[/] listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
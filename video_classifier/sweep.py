@@ -0,0 +1,276 @@
+"""
+Parameter sweep over a small labelled set: rating agreement vs tokens vs wall-clock per config.
+
+Run:
+    uv run sweep.py labels.jsonl --interval-sec 1 2 --chunk-size 16 32 --target-width 320 480 --jpeg-quality 70 92
+    uv run sweep.py labels.jsonl --limit none 120 --sweep-dir data/sweeps/limits
+    uv run sweep.py labels.jsonl --stub-latency-sec 2   # dry run against stub_server, in <sweep-dir>-stub
+
+`labels.jsonl`: one `{"path": ..., "rating": "PG13"}` (optional `id`) per line.
+
+Shared stages are cached in `--sweep-dir`, so re-runs and overlapping configs do no repeated work:
+- frames: `FrameCache` per (video, interval_sec, jpeg_quality, target_width); configs that only
+  differ in `chunk_size` / `limit` reuse the same decode
+- chunk results: `ResponseCache`; identical chunk requests are sent once
+- finished (config, video) cells: `results.jsonl`; a re-run only runs missing cells
+
+Wall-clock per cell is the decode/encode time (per-frame cost measured on the first decode)
+plus the chunk latencies, as first measured, scheduled on `--max-concurrency` slots, so it
+does not shrink when a stage comes from cache.
+
+A `--stub-latency-sec` dry run keeps its caches and results in `<sweep-dir>-stub`, so stub
+verdicts and latencies never end up in (or are read back from) a real sweep.
+"""
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import find_dotenv, load_dotenv
+from openai import AsyncOpenAI
+from rich import print as rich_print
+from rich.table import Table
+
+from aggregate import FilmAggregator
+from async_inference import AsyncChunkClassifier, makespan
+from frame_cache import FrameCache
+from frames import iter_encoded_frames, make_image_content
+from inference import MODEL, chunk_list, make_message, rating_rank
+from response_cache import ResponseCache, request_key
+from segment_store import prompt_fingerprint
+
+
+PARAMS = ["interval_sec", "limit", "chunk_size", "target_width", "jpeg_quality"]
+
+
+def load_labelled(path: str) -> List[Dict[str, str]]:
+    videos = []
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        entry = json.loads(line)
+        videos.append({"id": entry.get("id", Path(entry["path"]).stem), "path": entry["path"], "rating": entry["rating"]})
+    return videos
+
+
+def make_grid(**values: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Every combination of the given parameter values, e.g. `make_grid(chunk_size=[16, 32], target_width=[480])`."""
+    names = list(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values[n] for n in names))]
+
+
+def config_id(config: Dict[str, Any]) -> str:
+    return ",".join(f"{p}={config[p]}" for p in PARAMS)
+
+
+def pareto_frontier(
+    rows: Sequence[Dict[str, Any]],
+    maximize: Sequence[str] = ("agreement",),
+    minimize: Sequence[str] = ("tokens", "wall_sec"),
+) -> List[Dict[str, Any]]:
+    """Rows no other row beats on every objective (and strictly on one)."""
+    def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        no_worse = all(a[m] >= b[m] for m in maximize) and all(a[m] <= b[m] for m in minimize)
+        better = any(a[m] > b[m] for m in maximize) or any(a[m] < b[m] for m in minimize)
+        return no_worse and better
+
+    return [r for r in rows if not any(dominates(other, r) for other in rows)]
+
+
+class Sweep:
+    """Runs (config, video) cells with the stage caches and result log under `sweep_dir`."""
+
+    def __init__(self, sweep_dir: str, classifier: AsyncChunkClassifier, max_concurrency: int):
+        self.dir = Path(sweep_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.classifier = classifier
+        self.max_concurrency = max_concurrency
+        self.frame_cache = FrameCache(str(self.dir / "frames"), verbose=False)
+        self.prompt_fp = prompt_fingerprint(classifier.model, classifier.request_params)
+        self._results_path = self.dir / "results.jsonl"
+        self._times_path = self.dir / "stage_times.json"
+        self.frame_sec: Dict[str, float] = {}  # frame-cache key -> decode+encode sec per frame
+        self.chunk_latency: Dict[str, float] = {}  # request_key -> first measured latency
+        if self._times_path.exists():
+            times = json.loads(self._times_path.read_text())
+            self.frame_sec, self.chunk_latency = times["frame_sec"], times["chunk_latency"]
+        self.results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if self._results_path.exists():
+            for line in self._results_path.read_text().splitlines():
+                if line.strip():
+                    rec = json.loads(line)
+                    if rec["prompt_fp"] == self.prompt_fp and rec["model"] == classifier.model:
+                        self.results[(rec["config_id"], rec["video_id"])] = rec
+
+    def _save_times(self) -> None:
+        self._times_path.write_text(json.dumps({"frame_sec": self.frame_sec, "chunk_latency": self.chunk_latency}))
+
+    def sample(self, video: Dict[str, str], config: Dict[str, Any]) -> Tuple[List[Dict[str, str]], float]:
+        """Frames for this config (frame cache first) and their decode+encode seconds."""
+        key = self.frame_cache.key(video["path"], config["interval_sec"], config["jpeg_quality"], config["target_width"])
+        frames = self.frame_cache.get(key, config["limit"])
+        if frames is None or key not in self.frame_sec:
+            t0 = time.perf_counter()
+            decoded = list(iter_encoded_frames(
+                video["path"], config["interval_sec"], config["limit"], config["jpeg_quality"], config["target_width"],
+                verbose=False,
+            ))
+            self.frame_sec[key] = (time.perf_counter() - t0) / max(1, len(decoded))
+            if frames is None:
+                complete = config["limit"] is None or len(decoded) < config["limit"]
+                frames = self.frame_cache.put(key, decoded, complete, {"video_path": video["path"], **config})
+        return [make_image_content(jpeg) for _, _, jpeg in frames], self.frame_sec[key] * len(frames)
+
+    async def run_cell(self, video: Dict[str, str], config: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        contents, extract_sec = await asyncio.to_thread(self.sample, video, config)
+        chunks = chunk_list(contents, config["chunk_size"])
+        aggregator = FilmAggregator()
+        results = await self.classifier.classify_chunks(chunks, aggregator=aggregator)
+
+        latencies = []
+        for chunk, result in zip(chunks, results):
+            key = request_key(self.classifier.model, make_message(chunk), self.classifier.request_params)
+            if not result["from_cache"]:
+                self.chunk_latency[key] = result["latency_sec"]
+            latencies.append(self.chunk_latency.get(key, 0.0))
+        self._save_times()
+
+        rating = aggregator.verdict()["rating"]
+        usages = [r["usage"] or {} for r in results]
+        model_sec = makespan(latencies, self.max_concurrency)
+        return {
+            "config_id": config_id(config),
+            **config,
+            "video_id": video["id"],
+            "model": self.classifier.model,
+            "prompt_fp": self.prompt_fp,
+            "label": video["rating"],
+            "rating": rating,
+            "agree": rating_rank(rating) == rating_rank(video["rating"]),
+            "rank_error": abs(rating_rank(rating) - rating_rank(video["rating"])),
+            "frames": len(contents),
+            "chunks": len(chunks),
+            "input_tokens": sum(u.get("input_tokens", 0) for u in usages),
+            "output_tokens": sum(u.get("output_tokens", 0) for u in usages),
+            "extract_sec": extract_sec,
+            "model_sec": model_sec,
+            "wall_sec": extract_sec + model_sec,
+            "measured_sec": time.perf_counter() - t0,
+        }
+
+    async def run(self, configs: Sequence[Dict[str, Any]], videos: Sequence[Dict[str, str]]) -> List[Dict[str, Any]]:
+        todo = [(c, v) for c in configs for v in videos if (config_id(c), v["id"]) not in self.results]
+        rich_print(f"{len(configs)} configs x {len(videos)} videos, {len(configs) * len(videos) - len(todo)} cells cached, {len(todo)} to run")
+        with open(self._results_path, "a", encoding="utf-8") as f:
+            for i, (config, video) in enumerate(todo, 1):
+                rec = await self.run_cell(video, config)
+                self.results[(rec["config_id"], rec["video_id"])] = rec
+                f.write(json.dumps(rec) + "\n")
+                f.flush()
+                rich_print(
+                    f"[dim]{i}/{len(todo)}[/dim] {rec['config_id']} {video['id']}: {rec['rating']} (label {rec['label']}), "
+                    f"{rec['input_tokens'] + rec['output_tokens']} tokens, {rec['wall_sec']:.1f}s"
+                )
+        return [self.results[(config_id(c), v["id"])] for c in configs for v in videos]
+
+
+def summarize(cells: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per config: rating agreement over videos, mean tokens and wall seconds per video."""
+    by_config: Dict[str, List[Dict[str, Any]]] = {}
+    for cell in cells:
+        by_config.setdefault(cell["config_id"], []).append(cell)
+    rows = []
+    for cid, group in by_config.items():
+        n = len(group)
+        rows.append({
+            "config_id": cid,
+            **{p: group[0][p] for p in PARAMS},
+            "videos": n,
+            "agreement": sum(c["agree"] for c in group) / n,
+            "mean_rank_error": sum(c["rank_error"] for c in group) / n,
+            "tokens": sum(c["input_tokens"] + c["output_tokens"] for c in group) / n,
+            "wall_sec": sum(c["wall_sec"] for c in group) / n,
+        })
+    frontier = {r["config_id"] for r in pareto_frontier(rows)}
+    for r in rows:
+        r["pareto"] = r["config_id"] in frontier
+    return sorted(rows, key=lambda r: (-r["agreement"], r["tokens"], r["wall_sec"]))
+
+
+def print_summary(rows: Sequence[Dict[str, Any]], title: str = "sweep") -> None:
+    table = Table(title=f"{title} (* = Pareto frontier: agreement vs tokens vs wall s)")
+    for col in ["", "interval", "limit", "chunk", "width", "quality", "agree", "rank err", "tokens/video", "wall s/video"]:
+        table.add_column(col, justify="right")
+    for r in rows:
+        table.add_row(
+            "*" if r["pareto"] else "",
+            *[str(r[p]) for p in PARAMS],
+            f"{r['agreement']:.0%}", f"{r['mean_rank_error']:.2f}", f"{r['tokens']:,.0f}", f"{r['wall_sec']:.1f}",
+        )
+    rich_print(table)
+
+
+def _limit(value: str) -> Optional[int]:
+    return None if value.lower() == "none" else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifier parameter sweep with a Pareto frontier")
+    parser.add_argument("labels", help="JSONL of {path, rating[, id]}")
+    parser.add_argument("--interval-sec", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--limit", type=_limit, nargs="+", default=[None], help="Max frames per video; 'none' for all")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[32])
+    parser.add_argument("--target-width", type=int, nargs="+", default=[480])
+    parser.add_argument("--jpeg-quality", type=int, nargs="+", default=[92])
+    parser.add_argument("--sweep-dir", default="data/sweeps/default", help="Caches, results.jsonl and summary.json")
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--tpm", type=int, default=None)
+    parser.add_argument("--stub-latency-sec", type=float, default=None, help="Dry run against stub_server, in <sweep-dir>-stub")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.stub_latency_sec is not None and not args.sweep_dir.rstrip("/").endswith("-stub"):
+        args.sweep_dir = args.sweep_dir.rstrip("/") + "-stub"
+        rich_print(f"[bold]dry run[/]: using {args.sweep_dir}")
+
+    load_dotenv(find_dotenv())
+    configs = make_grid(
+        interval_sec=args.interval_sec, limit=args.limit, chunk_size=args.chunk_size,
+        target_width=args.target_width, jpeg_quality=args.jpeg_quality,
+    )
+    videos = load_labelled(args.labels)
+
+    async def _run(client: Optional[AsyncOpenAI]) -> List[Dict[str, Any]]:
+        response_cache = ResponseCache(str(Path(args.sweep_dir) / "responses.sqlite"))
+        classifier = AsyncChunkClassifier(
+            client, model=args.model, max_concurrency=args.max_concurrency, rpm=args.rpm, tpm=args.tpm,
+            response_cache=response_cache, verbose=args.verbose,
+        )
+        try:
+            return await Sweep(args.sweep_dir, classifier, args.max_concurrency).run(configs, videos)
+        finally:
+            response_cache.close()
+
+    if args.stub_latency_sec is not None:
+        from stub_server import StubOpenAIServer
+        with StubOpenAIServer(latency_sec=args.stub_latency_sec) as server:
+            cells = asyncio.run(_run(AsyncOpenAI(base_url=server.base_url, api_key="stub", max_retries=0)))
+    else:
+        cells = asyncio.run(_run(None))
+
+    rows = summarize(cells)
+    print_summary(rows, title=f"{len(videos)} videos, {args.model}")
+    out = Path(args.sweep_dir) / "summary.json"
+    out.write_text(json.dumps(rows, indent=2))
+    rich_print(f"[bold]Saved[/]: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Write a synthetic mp4 (`seconds` at `fps`, each second a different grey level) and return its path."""
+    def _make(name="film.mp4", seconds=10, fps=10, size=(96, 64)):
+        path = str(tmp_path / name)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        for i in range(seconds * fps):
+            writer.write(np.full((size[1], size[0], 3), (i // fps) * 20 % 256, dtype=np.uint8))
+        writer.release()
+        return path
+    return _make
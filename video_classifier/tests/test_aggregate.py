@@ -0,0 +1,95 @@
+import random
+
+import pandas as pd
+import pytest
+
+from aggregate import FilmAggregator
+from inference import RATINGS, rating_rank
+from stub_server import STUB_CLASSIFICATION
+
+
+def _chunk(rating, **elements):
+    return {
+        **STUB_CLASSIFICATION,
+        "rating": rating,
+        "element_assessments": {
+            name: {"severity": "moderate", "frequency": "occasional", "rating_floor": floor}
+            for name, floor in elements.items()
+        },
+    }
+
+
+def _aggregate(parsed_by_idx):
+    film = FilmAggregator()
+    for idx, parsed in parsed_by_idx:
+        film.update(idx, parsed)
+    return film
+
+
+def test_rating_is_max_across_chunks():
+    film = _aggregate(enumerate([_chunk("PG"), _chunk("M18"), _chunk("PG13")]))
+    verdict = film.verdict()
+    assert verdict["rating"] == "M18"
+    assert verdict["decision_type"] == "age-restricted"
+    assert verdict["deciding_chunks"] == [1]
+    assert verdict["rating_by_chunk"] == {0: "PG", 1: "M18", 2: "PG13"}
+
+
+def test_element_floor_lifts_rating():
+    film = _aggregate(enumerate([_chunk("PG", violence="NC16"), _chunk("PG13")]))
+    assert film.rating == "NC16"
+    assert film.verdict()["element_assessments"]["violence"]["rating_floor"] == "NC16"
+
+
+def test_refused_chunk_refuses_film():
+    refused = {**_chunk("R21"), "refusal": {"is_refused": True, "grounds": ["explicit sexual activity"]}}
+    verdict = _aggregate(enumerate([_chunk("PG"), refused, _chunk("M18")])).verdict()
+    assert verdict["rating"] == "Refused"
+    assert verdict["decision_type"] == "refused"
+    assert verdict["refusal"] == {"is_refused": True, "grounds": ["explicit sexual activity"]}
+    assert verdict["rating_by_chunk"][1] == "Refused"
+
+
+def test_none_chunks_rate_nothing():
+    film = _aggregate(enumerate([None, _chunk(None), _chunk("PG13")]))
+    assert film.chunks_seen == 3
+    assert film.rating == "PG13"
+    assert film.verdict()["deciding_chunks"] == [2]
+
+    empty = _aggregate(enumerate([None, _chunk(None)]))
+    assert empty.verdict()["rating"] is None
+    assert empty.verdict()["decision_type"] is None
+
+
+def test_out_of_order_updates_match_in_order():
+    chunks = [_chunk(r) for r in ["PG", "M18", "M18", "G", "M18", "M18", "M18", "PG13"]]
+    in_order = _aggregate(enumerate(chunks))
+    shuffled = list(enumerate(chunks))
+    random.Random(0).shuffle(shuffled)
+    out_of_order = _aggregate(shuffled)
+    assert out_of_order.verdict() == in_order.verdict()
+    assert out_of_order.run_at_max == in_order.run_at_max == 3  # chunks 4-6
+
+
+def test_run_joins_across_gap_filled_last():
+    film = _aggregate([(0, _chunk("R21")), (2, _chunk("R21")), (1, _chunk("R21"))])
+    assert film.run_at_max == 3
+
+
+def test_repeated_chunk_rejected():
+    film = _aggregate([(0, _chunk("PG"))])
+    with pytest.raises(ValueError):
+        film.update(0, _chunk("PG"))
+
+
+def test_matches_notebook_dataframe():
+    # vc_3_inference: one row per chunk output, film rating = the highest chunk rating
+    outputs = [_chunk(r) for r in ["G", "PG", "PG13", "PG", "NC16", "PG13", "G"]]
+    df = pd.DataFrame({
+        "rating": [i["rating"] for i in outputs],
+        "overall_rationale": [i["overall_rationale"] for i in outputs],
+    })
+    notebook_rating = RATINGS[df["rating"].map(rating_rank).max()]
+    film = _aggregate(enumerate(outputs))
+    assert film.rating == notebook_rating == "NC16"
+    assert film.verdict()["rating_by_chunk"] == dict(enumerate(df["rating"]))
@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+from openai import OpenAI
+
+from batch import load_manifest, run_batch
+from frames import make_image_content
+from stub_server import STUB_CLASSIFICATION, StubOpenAIServer
+
+
+def _chunks(*sizes):
+    jpeg = cv2.imencode(".jpg", np.zeros((27, 48, 3), dtype=np.uint8))[1].tobytes()
+    return [[make_image_content(jpeg)] * n for n in sizes]
+
+
+def _n_images(body):
+    return sum(part.get("type") == "input_image" for m in body["input"] for part in m.get("content", []))
+
+
+def _run(server, work_dir, video_chunks, **kwargs):
+    client = OpenAI(base_url=server.base_url, api_key="stub", max_retries=0)
+    return run_batch(client, video_chunks, work_dir=str(work_dir), sleep_time=0.01, timeout_sec=10, **kwargs)
+
+
+def test_custom_id_with_separator(tmp_path):
+    with StubOpenAIServer() as server:
+        outputs, usages, errors = _run(server, tmp_path, {"show::s01e02": _chunks(1, 2), "film": _chunks(1)})
+    assert errors == {}
+    assert outputs == {"show::s01e02": [STUB_CLASSIFICATION] * 2, "film": [STUB_CLASSIFICATION]}
+    assert all(u["input_tokens"] > 0 for u in usages["show::s01e02"])
+
+
+def test_error_line(tmp_path):
+    def responder(body):
+        if _n_images(body) == 2:
+            raise RuntimeError("model overloaded")
+        return STUB_CLASSIFICATION
+
+    with StubOpenAIServer(responder=responder) as server:
+        outputs, _, errors = _run(server, tmp_path, {"film": _chunks(1, 2, 3)})
+    assert outputs["film"] == [STUB_CLASSIFICATION, None, STUB_CLASSIFICATION]
+    assert list(errors) == ["film::1"]
+    assert errors["film::1"]["message"] == "model overloaded"
+
+
+def test_missing_trailing_chunks_reported_from_manifest(tmp_path):
+    with StubOpenAIServer(batch_request_limit=2) as server:
+        outputs, usages, errors = _run(server, tmp_path, {"film": _chunks(1, 1, 1, 1)})
+    assert load_manifest(str(tmp_path))["num_chunks"] == {"film": 4}
+    assert outputs["film"] == [STUB_CLASSIFICATION, STUB_CLASSIFICATION, None, None]
+    assert usages["film"][2:] == [{}, {}]
+    assert sorted(errors) == ["film::2", "film::3"]
+
+
+def test_rollover_at_max_file_requests(tmp_path):
+    with StubOpenAIServer() as server:
+        outputs, _, errors = _run(server, tmp_path, {"a": _chunks(1, 1, 1), "b": _chunks(1, 1)}, max_file_requests=2)
+    files = load_manifest(str(tmp_path))["files"]
+    assert [Path(f).name for f in files] == ["batch_0000.jsonl", "batch_0001.jsonl", "batch_0002.jsonl"]
+    assert [len(Path(f).read_text().splitlines()) for f in files] == [2, 2, 1]
+    assert len(json.loads(Path(tmp_path, "batch_ids.json").read_text())) == 3
+    assert errors == {}
+    assert outputs == {"a": [STUB_CLASSIFICATION] * 3, "b": [STUB_CLASSIFICATION] * 2}
@@ -0,0 +1,72 @@
+import os
+
+import download
+from download import download_batch, options_archive_path
+
+
+IDS = {
+    "https://youtu.be/aaa": "youtube aaa",
+    "https://www.youtube.com/watch?v=aaa": "youtube aaa",
+    "https://youtu.be/bbb": "youtube bbb",
+    "https://youtu.be/ccc": "youtube ccc",
+    "https://example.com/broken": None,
+}
+
+
+def _patch(monkeypatch, calls):
+    def fake_download(url, output_dir, archive_path=None, **kwargs):
+        # what yt-dlp does on success: write the file, append the ID to the archive for these options
+        calls.append((url, kwargs))
+        path = os.path.join(output_dir, IDS[url].split()[1] if IDS[url] else "broken") + ".mp4"
+        with open(path, "wb") as f:
+            f.write(b"\0" * 1000)
+        if archive_path and IDS[url]:
+            opts = {k: kwargs[k] for k in ("target_width", "sections", "limit_sec", "audio") if k in kwargs}
+            with open(options_archive_path(archive_path, **opts), "a") as f:
+                f.write(IDS[url] + "\n")
+        return path
+
+    monkeypatch.setattr(download, "archive_id", IDS.get)
+    monkeypatch.setattr(download, "download_youtube_to_mp4", fake_download)
+
+
+def test_duplicates_and_archived_skipped(tmp_path, monkeypatch):
+    calls = []
+    _patch(monkeypatch, calls)
+    archive = tmp_path / "archive.txt"
+    archive.write_text("youtube ccc\n")
+    records = download_batch(list(IDS), str(tmp_path), workers=2, archive_path=str(archive))
+    assert [r["status"] for r in records] == ["downloaded", "duplicate", "downloaded", "archived", "downloaded"]
+    assert sorted(url for url, _ in calls) == ["https://example.com/broken", "https://youtu.be/aaa", "https://youtu.be/bbb"]
+    assert records[0]["bytes"] == 1000
+
+    # a second run finds everything in the archive; an unresolvable URL is tried again
+    calls.clear()
+    records = download_batch(list(IDS), str(tmp_path), workers=2, archive_path=str(archive))
+    assert [r["status"] for r in records] == ["archived", "archived", "archived", "archived", "downloaded"]
+    assert [url for url, _ in calls] == ["https://example.com/broken"]
+
+
+def test_limited_download_does_not_archive_full_video(tmp_path, monkeypatch):
+    calls = []
+    _patch(monkeypatch, calls)
+    archive = str(tmp_path / "archive.txt")
+    urls = ["https://youtu.be/aaa"]
+
+    assert download_batch(urls, str(tmp_path), archive_path=archive, limit_sec=60, target_width=480)[0]["status"] == "downloaded"
+    assert os.path.exists(tmp_path / "archive.w480-l60.txt")
+    assert not os.path.exists(archive)
+    assert download_batch(urls, str(tmp_path), archive_path=archive, limit_sec=60, target_width=480)[0]["status"] == "archived"
+    # the full video, or another clip, is still fetched
+    assert download_batch(urls, str(tmp_path), archive_path=archive)[0]["status"] == "downloaded"
+    assert download_batch(urls, str(tmp_path), archive_path=archive, limit_sec=120)[0]["status"] == "downloaded"
+    assert download_batch(urls, str(tmp_path), archive_path=archive)[0]["status"] == "archived"
+    assert len(calls) == 3
+
+
+def test_options_archive_path():
+    assert options_archive_path("a/archive.txt") == "a/archive.txt"
+    assert options_archive_path("a/archive.txt", audio=True) == "a/archive.txt"
+    assert options_archive_path("a/archive.txt", 480, [(0, 30), (60, 90.5)], None, False) == (
+        "a/archive.w480-s0-30_60-90.5-noaudio.txt"
+    )
@@ -0,0 +1,64 @@
+import json
+
+from fast_rating import IncrementalJSONScanner, verdict_from_values
+from stub_server import STUB_CLASSIFICATION
+
+
+def _scan(*deltas):
+    scanner = IncrementalJSONScanner()
+    for delta in deltas:
+        scanner.feed(delta)
+    return scanner
+
+
+def test_rating_split_across_deltas():
+    scanner = _scan('{"rat', 'ing": "P', "G1", '3"', ', "refusal": {"is_ref', 'used": fa', "lse}}")
+    assert scanner.values == {"rating": "PG13", "refusal.is_refused": False}
+    assert scanner.done
+
+
+def test_rating_available_before_document_ends():
+    scanner = _scan('{"rating": "M18", "consumer_advice": ["Vio')
+    assert scanner.values["rating"] == "M18"
+    assert not scanner.done
+
+
+def test_fenced_reply():
+    text = "```json\n" + json.dumps(STUB_CLASSIFICATION) + "\n```"
+    scanner = _scan(*[text[i : i + 7] for i in range(0, len(text), 7)])
+    assert scanner.done
+    assert scanner.values["rating"] == STUB_CLASSIFICATION["rating"]
+    assert scanner.values["refusal.is_refused"] is False
+    assert scanner.chars_seen < len(text)  # the closing fence is never read
+
+
+def test_escaped_quotes_before_rating():
+    doc = '{"overall_rationale": "the line \\"rating\\": \\"R21\\" is dialogue", "rating": "PG"}'
+    scanner = _scan(doc[:30], doc[30:33], doc[33:])
+    assert scanner.values["overall_rationale"] == 'the line "rating": "R21" is dialogue'
+    assert scanner.values["rating"] == "PG"
+
+
+def test_escape_split_across_deltas():
+    scanner = _scan('{"notes": "a \\', '"quote\\', '" here", "rating": "G"}')
+    assert scanner.values == {"notes": 'a "quote" here', "rating": "G"}
+
+
+def test_null_rating():
+    scanner = _scan('{"rating": nu', 'll, "refusal": {"is_refused": true}}')
+    assert "rating" in scanner.values and scanner.values["rating"] is None
+    assert verdict_from_values(scanner.values) == {"rating": None, "refusal": {"is_refused": True}}
+
+
+def test_stream_ends_before_rating():
+    scanner = _scan('{"refusal": {"is_refused": false}, "rat')
+    assert scanner.values == {"refusal.is_refused": False}
+    assert not scanner.done
+    assert verdict_from_values(scanner.values) == {"rating": None, "refusal": {"is_refused": False}}
+
+
+def test_nested_paths():
+    scanner = _scan(json.dumps({"element_assessments": {"violence": {"severity": "mild"}}, "consumer_advice": ["a", "b"]}))
+    assert scanner.values == {
+        "element_assessments.violence.severity": "mild", "consumer_advice.0": "a", "consumer_advice.1": "b",
+    }
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import cv2
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+
+from async_inference import AsyncChunkClassifier
+from file_refs import FrameUploader, classify_uploaded
+from frames import make_raw_image_content
+from stub_server import StubOpenAIServer
+
+
+def _frames(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        make_raw_image_content(cv2.imencode(".jpg", rng.integers(0, 255, (64, 96, 3), dtype=np.uint8))[1].tobytes())
+        for _ in range(n)
+    ]
+
+
+def _uploader(server, tmp_path, **kwargs):
+    client = OpenAI(base_url=server.base_url, api_key="stub", max_retries=0)
+    return FrameUploader(client, db_path=str(tmp_path / "refs.sqlite"), verbose=False, **kwargs)
+
+
+def test_reuploads_skipped(tmp_path):
+    frames = _frames(3)
+    with StubOpenAIServer() as server:
+        first = _uploader(server, tmp_path)
+        ids = [c["file_id"] for c in first.to_file_contents(frames)]
+        first.close()
+        second = _uploader(server, tmp_path)
+        assert [c["file_id"] for c in second.to_file_contents(frames)] == ids
+        second.close()
+        assert len(server.state.files) == 3
+    assert (first.uploaded, first.reused) == (3, 0)
+    assert (second.uploaded, second.reused) == (0, 3)
+
+
+def test_duplicate_frames_upload_once(tmp_path):
+    frames = _frames(1) * 16
+    with StubOpenAIServer() as server:
+        uploader = _uploader(server, tmp_path, workers=8)
+        contents = uploader.to_file_contents(frames)
+        uploader.close()
+        assert len(server.state.files) == 1
+    assert len({c["file_id"] for c in contents}) == 1
+    assert (uploader.uploaded, uploader.reused) == (1, 15)
+
+
+def test_forget_forces_reupload(tmp_path):
+    frames = _frames(2)
+    with StubOpenAIServer() as server:
+        uploader = _uploader(server, tmp_path)
+        before = uploader.to_file_contents(frames)
+        uploader.forget(frames[:1])
+        after = uploader.to_file_contents(frames)
+        uploader.close()
+    assert after[0]["file_id"] != before[0]["file_id"]
+    assert after[1]["file_id"] == before[1]["file_id"]
+    assert (uploader.uploaded, uploader.reused, uploader.forgotten) == (3, 1, 1)
+
+
+def test_expired_mapping_reuploads(tmp_path):
+    frames = _frames(2)
+    with StubOpenAIServer() as server:
+        uploader = _uploader(server, tmp_path, expires_after_sec=0.05)
+        uploader.to_file_contents(frames)
+        time.sleep(0.1)
+        uploader.to_file_contents(frames)
+        uploader.close()
+    assert (uploader.uploaded, uploader.reused) == (4, 0)
+
+
+def _classify(server, tmp_path, frames):
+    uploader = _uploader(server, tmp_path)
+    classifier = AsyncChunkClassifier(
+        AsyncOpenAI(base_url=server.base_url, api_key="stub", max_retries=0), max_retries=0, verbose=False,
+    )
+    try:
+        result = asyncio.run(classify_uploaded(uploader, classifier, 0, frames))
+    finally:
+        uploader.close()
+    return result, uploader
+
+
+def test_ids_not_shared_across_servers(tmp_path):
+    frames = _frames(3)
+    with StubOpenAIServer() as a, StubOpenAIServer() as b:
+        _classify(a, tmp_path, frames)
+        result, uploader = _classify(b, tmp_path, frames)
+        assert len(b.state.files) == 3
+    assert result["parsed"]["rating"] == "G"
+    assert (uploader.uploaded, uploader.reused) == (3, 0)
+
+
+def test_stale_ids_reuploaded_after_server_restart(tmp_path):
+    frames = _frames(3)
+    with StubOpenAIServer() as server:
+        port = server.httpd.server_address[1]
+        _classify(server, tmp_path, frames)
+    # same base_url, empty file store: the stored IDs are stale
+    with StubOpenAIServer(port=port) as server:
+        result, uploader = _classify(server, tmp_path, frames)
+        assert server.state.responses_requests == 2
+    assert result["parsed"]["rating"] == "G"
+    assert (uploader.reused, uploader.forgotten, uploader.uploaded) == (3, 3, 3)
@@ -0,0 +1,55 @@
+import os
+
+from frame_cache import FrameCache
+
+
+def _frames(n, size=100, start=0):
+    return [(i, float(i), bytes([i % 256]) * size) for i in range(start, start + n)]
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = FrameCache(str(tmp_path), verbose=False)
+    frames = _frames(5)
+    assert cache.put("k", frames, complete=True) == frames
+    assert cache.get("k") == frames
+    assert cache.get("k", limit=3) == frames[:3]
+    assert cache.get("k", limit=50) == frames  # complete: serves any limit
+    assert cache.get("missing") is None
+
+
+def test_incomplete_entry_serves_only_shorter_limits(tmp_path):
+    cache = FrameCache(str(tmp_path), verbose=False)
+    cache.put("k", _frames(4), complete=False)
+    assert cache.get("k") is None
+    assert cache.get("k", limit=5) is None
+    assert cache.get("k", limit=4) == _frames(4)
+
+
+def test_rewrite_replaces_pack(tmp_path):
+    cache = FrameCache(str(tmp_path), verbose=False)
+    cache.put("k", _frames(4, size=10), complete=False)
+    cache.put("k", _frames(6, size=30, start=1), complete=True)
+    assert cache.get("k") == _frames(6, size=30, start=1)
+    assert len(list(tmp_path.glob("k.*.pack"))) == 1
+    assert cache.total_bytes() == 6 * 30
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FrameCache(str(tmp_path), max_bytes=250, verbose=False)
+    cache.put("a", _frames(1), complete=True)
+    cache.put("b", _frames(1), complete=True)
+    for i, name in enumerate(["a", "b"]):
+        os.utime(tmp_path / f"{name}.json", (1000 + i, 1000 + i))
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", _frames(1), complete=True)
+    assert cache.get("b") is None
+    assert cache.get("a") == _frames(1)
+    assert cache.get("c") == _frames(1)
+    assert cache.total_bytes() == 200
+
+
+def test_key_depends_on_sampling_mode(tmp_path, make_video):
+    cache = FrameCache(str(tmp_path / "cache"), verbose=False)
+    video = make_video()
+    assert cache.key(video, 1.0, 92, 480, "seek") != cache.key(video, 1.0, 92, 480, "grab")
+    assert cache.key(video, 1.0, 92, 480) == cache.key(video, 1.0, 92, 480, "auto")
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import sys
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    from google import genai  # noqa: F401
+except ImportError:  # google-genai not installed: the client is mocked below, the module only needs the names
+    google = mock.MagicMock()
+    sys.modules.update({"google": google, "google.genai": google.genai})
+
+from gemini_backend import AUDIO_TOKENS_PER_SEC, GeminiVideoClassifier, video_part_tokens, video_window_parts
+from inference import make_message
+from stub_server import STUB_CLASSIFICATION
+from tokens import estimate_message_tokens
+
+
+def test_windows_cover_video_with_short_last_window():
+    chunks = video_window_parts("files/abc", "video/mp4", duration_sec=70.0, window_sec=32.0, fps=0.5)
+    assert [(c[0]["start_sec"], c[0]["end_sec"]) for c in chunks] == [(0.0, 32.0), (32.0, 64.0), (64.0, 70.0)]
+    assert all(len(c) == 1 and c[0]["type"] == "input_video" and c[0]["fps"] == 0.5 for c in chunks)
+    assert all(c[0]["file_uri"] == "files/abc" for c in chunks)
+
+
+def test_windows_on_exact_multiple():
+    chunks = video_window_parts("files/abc", "video/mp4", duration_sec=64.0, window_sec=32.0)
+    assert [(c[0]["start_sec"], c[0]["end_sec"]) for c in chunks] == [(0.0, 32.0), (32.0, 64.0)]
+
+
+def test_estimate_counts_video_duration():
+    classifier = GeminiVideoClassifier(client=object(), verbose=False)
+    low = GeminiVideoClassifier(client=object(), media_resolution="low", verbose=False)
+    [chunk] = video_window_parts("files/abc", "video/mp4", duration_sec=10.0, window_sec=32.0)
+    messages = make_message(chunk)
+    text = estimate_message_tokens(messages, classifier.model)
+    assert video_part_tokens(chunk[0]) == 10 * (258 + AUDIO_TOKENS_PER_SEC)
+    assert classifier.estimate_tokens(messages) == text + 10 * (258 + AUDIO_TOKENS_PER_SEC)
+    assert low.estimate_tokens(messages) == text + 10 * (66 + AUDIO_TOKENS_PER_SEC)
+
+
+def test_classify_video_sends_one_request_per_window(make_video):
+    video = make_video(seconds=10, fps=10)
+    client = mock.MagicMock()
+    client.aio.models.generate_content = mock.AsyncMock(return_value=SimpleNamespace(
+        text=json.dumps({**STUB_CLASSIFICATION, "rating": "PG13"}), usage_metadata=None,
+    ))
+    file = SimpleNamespace(name="files/abc", uri="https://example.test/files/abc", mime_type="video/mp4")
+    classifier = GeminiVideoClassifier(client=client, verbose=False)
+    out = asyncio.run(classifier.classify_video(video, window_sec=4.0, file=file))
+    assert client.aio.models.generate_content.await_count == 3  # 0-4, 4-8, 8-10 s
+    assert out["verdict"]["rating"] == "PG13"
+    assert out["file"] is file
+    client.files.upload.assert_not_called()
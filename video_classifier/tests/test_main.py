@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+from main import build_parser, load_videos, run
+from stub_server import STUB_CLASSIFICATION, StubOpenAIServer
+
+
+def _run(tmp_path, manifest_lines):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("\n".join(manifest_lines) + "\n")
+    args = build_parser().parse_args([
+        "classify", str(manifest), "--checkpoint", str(tmp_path / "checkpoint.jsonl"),
+        "--chunk-size", "4", "--target-width", "48",
+    ])
+    return asyncio.run(run(args))
+
+
+def test_manifest_repeats_are_dropped(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.mp4\nb.mp4\na.mp4\n")
+    assert [v["id"] for v in load_videos(str(manifest))] == ["a", "b"]
+
+
+def test_resume_skips_done_videos(tmp_path, make_video, monkeypatch):
+    a, b = make_video("a.mp4", seconds=8), make_video("b.mp4", seconds=8)  # 8 frames -> 2 chunks each
+    ratings = iter(["PG"] * 2 + ["M18"] * 2)
+
+    def responder(body):
+        return {**STUB_CLASSIFICATION, "rating": next(ratings)}
+
+    with StubOpenAIServer(responder=responder) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        first = _run(tmp_path, [a])
+        assert server.state.responses_requests == 2
+        second = _run(tmp_path, [a, b, a])
+        assert server.state.responses_requests == 4  # only b's two chunks
+    assert json.loads(json.dumps(first)) == {"a": second["a"]}  # the stored verdict, as checkpointed
+    assert second["a"]["rating"] == "PG"
+    assert second["b"]["rating"] == "M18"
@@ -0,0 +1,46 @@
+import json
+from types import SimpleNamespace
+
+from aggregate import FilmAggregator
+from early_stop import EarlyStopPolicy
+from pipeline import stream_classify
+from stub_server import STUB_CLASSIFICATION
+
+
+class FakeClient:
+    """`client.responses.create` answering each call with the next rating from `ratings`."""
+
+    def __init__(self, ratings):
+        self.ratings = list(ratings)
+        self.calls = 0
+        self.responses = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        rating = self.ratings[self.calls]
+        self.calls += 1
+        return SimpleNamespace(output_text=json.dumps({**STUB_CLASSIFICATION, "rating": rating}), usage=None)
+
+
+def test_decisive_chunk_stops_stream(make_video):
+    video = make_video(seconds=20)  # 20 frames at 1 per second -> 5 chunks of 4
+    client = FakeClient(["PG", "R21", "G", "G", "G"])
+    film = FilmAggregator()
+    seen = [
+        idx for idx, _, _ in stream_classify(
+            client, video, chunk_size=4, verbose=False, stop_policy=EarlyStopPolicy(stop_at="R21"), aggregator=film,
+        )
+    ]
+    assert seen == [0, 1]
+    assert client.calls == 2
+    assert film.rating == "R21"
+    assert film.stop_reason is not None
+    assert film.skipped_chunks == [2, 3, 4]
+
+
+def test_no_stop_classifies_everything(make_video):
+    video = make_video(seconds=20)
+    client = FakeClient(["G"] * 5)
+    film = FilmAggregator()
+    list(stream_classify(client, video, chunk_size=4, verbose=False, stop_policy=EarlyStopPolicy(), aggregator=film))
+    assert client.calls == 5
+    assert film.stop_reason is None and film.skipped_chunks == []
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+import pandas as pd
+
+from frames import make_image_content, plan_segments
+from segment_store import SegmentStore, segment_row, timed_chunks
+from stub_server import STUB_CLASSIFICATION
+
+
+def _timed(n, start_sec=0.0, seed=0, interval_sec=1.0):
+    """`n` distinct frames (random noise, so perceptual hashes differ), one every `interval_sec`."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        image = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (64, 64), interpolation=cv2.INTER_NEAREST)
+        out.append((start_sec + i * interval_sec, make_image_content(cv2.imencode(".jpg", image)[1].tobytes())))
+    return out
+
+
+def _rows(video_id, segments, rating="PG"):
+    return [segment_row(video_id, seg, "fp", "gpt-5", {**STUB_CLASSIFICATION, "rating": rating}) for seg in segments]
+
+
+def test_plan_segments_boundaries_on_sampling_grid():
+    assert plan_segments(frame_count=100, frame_interval=10, n_segments=3) == [(0, 40), (40, 80), (80, None)]
+    # limit caps the samples and closes the last segment; it is shorter than the others
+    assert plan_segments(frame_count=100, frame_interval=10, n_segments=3, limit=7) == [(0, 30), (30, 60), (60, 70)]
+
+
+def test_plan_segments_clamps_count():
+    assert plan_segments(frame_count=25, frame_interval=10, n_segments=8) == [(0, 10), (10, 20), (20, None)]
+    assert plan_segments(frame_count=0, frame_interval=10, n_segments=4) == [(0, None)]
+
+
+def test_plan_segments_covers_every_sample_once():
+    frame_count, interval = 997, 7
+    segments = plan_segments(frame_count, interval, n_segments=6)
+    covered = [f for start, end in segments for f in range(start, end if end is not None else frame_count, interval)]
+    assert covered == list(range(0, frame_count, interval))
+
+
+def test_timed_chunks_time_ranges():
+    segments = timed_chunks(_timed(10, start_sec=5.0), chunk_size=4, interval_sec=1.0)
+    assert [(s["start_sec"], s["end_sec"]) for s in segments] == [(5.0, 9.0), (9.0, 13.0), (13.0, 15.0)]
+    assert [len(s["contents"]) for s in segments] == [4, 4, 2]
+    assert segments[2]["timestamps"] == [13.0, 14.0]
+    assert [s["chunk_idx"] for s in segments] == [0, 1, 2]
+
+
+def test_plan_reuses_unchanged_and_shifted_segments(tmp_path):
+    store = SegmentStore(str(tmp_path / "segments.parquet"), verbose=False)
+    timed = _timed(8)
+    store.replace_video("a", _rows("a", timed_chunks(timed, 4, 1.0)))
+
+    same = store.plan("a", timed, 4, 1.0, "fp")
+    assert [s["reused"] is not None for s in same] == [True, True]
+
+    # two new frames spliced in front: the stored segments are found 2 s later, only the new frames run
+    recut = _timed(2, seed=1) + [(ts + 2.0, content) for ts, content in timed]
+    segments = store.plan("a", recut, 4, 1.0, "fp")
+    assert [(s["start_sec"], s["end_sec"], s["reused"] is not None) for s in segments] == [
+        (0.0, 2.0, False), (2.0, 6.0, True), (6.0, 10.0, True),
+    ]
+
+    assert all(s["reused"] is None for s in store.plan("a", timed, 4, 1.0, "other-prompt"))
+    assert all(s["reused"] is None for s in store.plan("b", timed, 4, 1.0, "fp"))
+
+
+def test_replace_video_leaves_other_videos(tmp_path):
+    path = str(tmp_path / "segments.parquet")
+    store = SegmentStore(path, verbose=False)
+    store.replace_video("a", _rows("a", timed_chunks(_timed(8), 4, 1.0)))
+    store.replace_video("b", _rows("b", timed_chunks(_timed(6, seed=2), 4, 1.0), rating="M18"))
+    before_b = store.video("b")
+
+    store.replace_video("a", _rows("a", timed_chunks(_timed(3, seed=3), 4, 1.0), rating="R21"))
+    store.save()
+
+    reloaded = SegmentStore(path, verbose=False)
+    assert list(reloaded.video("a")["rating"]) == ["R21"]
+    assert reloaded.video("a")["end_sec"].tolist() == [3.0]
+    pd.testing.assert_frame_equal(reloaded.video("b"), before_b, check_dtype=False)
+    assert reloaded.at("b", 4.5)["chunk_idx"] == 1
+    assert reloaded.at("a", 5.0) is None
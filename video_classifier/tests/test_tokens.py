@@ -0,0 +1,87 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from async_inference import AsyncChunkClassifier
+from frames import make_image_content
+from inference import make_message
+from tokens import (
+    DEFAULT_CALIBRATION,
+    estimate_message_tokens,
+    image_tokens,
+    pack_chunks_by_tokens,
+)
+
+
+def _frames(n, width=480, height=270):
+    jpeg = cv2.imencode(".jpg", np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+    return [make_image_content(jpeg) for _ in range(n)]
+
+
+@pytest.mark.parametrize(
+    "width, height, detail, model, expected",
+    [
+        (480, 270, "auto", "gpt-5", 70 + 140 * 1),
+        (1920, 1080, "high", "gpt-5", 70 + 140 * 6),  # scaled to 1365x768: 3x2 tiles
+        (1024, 1024, "high", "gpt-5", 70 + 140 * 4),  # scaled to 768x768: 2x2 tiles
+        (1920, 1080, "low", "gpt-5", 70),
+        (480, 270, "auto", "gpt-4o-mini", 2833 + 5667 * 1),
+        (1920, 1080, "low", "gpt-4o-mini", 2833),
+        (480, 270, "auto", "gpt-5-mini-2025-08-07", 219),  # 15x9 patches x 1.62
+    ],
+)
+def test_image_tokens_formula(width, height, detail, model, expected):
+    assert image_tokens(width, height, detail, model) == expected
+
+
+def test_estimate_message_tokens():
+    message = [{"role": "user", "content": [{"type": "input_text", "text": "x" * 400}, *_frames(2)]}]
+    assert estimate_message_tokens(message, "gpt-5") == 100 + 2 * 210
+
+
+def test_pack_respects_budget():
+    chunks, chunk_tokens = pack_chunks_by_tokens(
+        _frames(10), target_tokens=1000, prompt_tokens=100, model="gpt-5", calibration=1.0,
+    )
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert chunk_tokens == [940, 940, 520]
+    assert all(t <= 1000 for t in chunk_tokens)
+
+
+def test_pack_frame_over_budget_gets_its_own_chunk():
+    chunks, chunk_tokens = pack_chunks_by_tokens(
+        _frames(3, 1920, 1080), target_tokens=500, prompt_tokens=100, model="gpt-5", calibration=1.0,
+    )
+    assert [len(c) for c in chunks] == [1, 1, 1]
+    assert chunk_tokens == [100 + 910] * 3
+
+
+def test_pack_default_calibration_matches_observed_chunk():
+    # vc_3 notebook: a 32-frame 480x270 gpt-5 chunk billed usage.input_tokens=22807
+    _, chunk_tokens = pack_chunks_by_tokens(_frames(32), target_tokens=10 ** 6, model="gpt-5")
+    assert abs(chunk_tokens[0] - 22807) < 32
+    _, plain = pack_chunks_by_tokens(_frames(32), target_tokens=10 ** 6, model="gpt-5", calibration=1.0)
+    assert plain[0] == estimate_message_tokens(make_message(_frames(32)), "gpt-5")
+
+
+class _FakeResponses:
+    async def create(self, **kwargs):
+        return SimpleNamespace(
+            output_text=json.dumps({"rating": "G"}),
+            usage={"input_tokens": 2000, "output_tokens": 10, "total_tokens": 2010},
+        )
+
+
+def test_classifier_refits_calibration_from_raw_estimate():
+    chunk = _frames(4)
+    classifier = AsyncChunkClassifier(SimpleNamespace(responses=_FakeResponses()), model="gpt-5", verbose=False)
+    assert classifier.calibration == DEFAULT_CALIBRATION["gpt-5"]
+    asyncio.run(classifier.classify_chunk(0, chunk))
+    raw = estimate_message_tokens(make_message(chunk), "gpt-5")
+    assert classifier.calibration == pytest.approx(2000 / raw)
+    classifier.calibrate({"input_tokens": 9999}, raw)  # fitted once only
+    assert classifier.calibration == pytest.approx(2000 / raw)
@@ -0,0 +1,303 @@
+import math
+import base64
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from rich import print as rich_print
+
+from inference import MODEL
+
+
+# Tile-billed models: (base tokens, tokens per 512px tile) for `detail: high`; `detail: low` costs the base only.
+IMAGE_TOKEN_COSTS: Dict[str, Tuple[int, int]] = {
+    "gpt-5": (70, 140),
+    "gpt-4o": (85, 170),
+    "gpt-4o-mini": (2833, 5667),
+    "gpt-4.1": (85, 170),
+    "gpt-4.5": (85, 170),
+    "o1": (75, 150),
+    "o3": (75, 150),
+}
+# Patch-billed models: one token per 32px patch (at most 1536 patches an image) times this multiplier.
+IMAGE_PATCH_MULTIPLIERS: Dict[str, float] = {
+    "gpt-5-mini": 1.62,
+    "gpt-5-nano": 2.46,
+    "gpt-4.1-mini": 1.62,
+    "gpt-4.1-nano": 2.46,
+    "o4-mini": 1.72,
+}
+DEFAULT_IMAGE_TOKEN_COST = (85, 170)
+PATCH_SIZE = 32
+MAX_IMAGE_PATCHES = 1536
+CHARS_PER_TOKEN = 4
+
+# Billed / estimated input tokens for a whole request, as a starting point until a real `usage.input_tokens`
+# is seen. The notebook's 32-frame 480x270 gpt-5 chunk billed 22807 input tokens; the estimate below is 8502
+# (1782 prompt + 32 frames x 210 tile-formula tokens). Families not measured yet start at 1.0.
+DEFAULT_CALIBRATION: Dict[str, float] = {"gpt-5": 22807 / 8502}
+
+# Observed on the notebook's chunks: ~1.9k output tokens (1.3k of them reasoning) per 32-frame chunk.
+DEFAULT_OUTPUT_TOKENS = 2000
+# Responses latency model used for the latency goal: fixed overhead + per-input-token prefill time.
+DEFAULT_BASE_LATENCY_SEC = 8.0
+DEFAULT_SEC_PER_INPUT_TOKEN = 0.0005
+# Frames referenced by `file_id` carry no pixels in the request; `file_refs.FrameUploader` records their size here.
+FILE_IMAGE_SIZES: Dict[str, Tuple[int, int]] = {}
+UNKNOWN_IMAGE_SIZE = (1024, 1024)
+# `detail: low` hands the model a 512x512-bounded version of the image and bills the base cost only.
+LOW_DETAIL_MAX_SIDE = 512
+
+
+def image_model_family(model: str) -> Optional[str]:
+    """The `IMAGE_TOKEN_COSTS` / `IMAGE_PATCH_MULTIPLIERS` entry billing `model`: an exact name, else
+    the longest family that `model` is a snapshot or variant of (`gpt-5-mini-2025-08-07` -> `gpt-5-mini`,
+    never `gpt-5`)."""
+    families = [*IMAGE_TOKEN_COSTS, *IMAGE_PATCH_MULTIPLIERS]
+    if model in families:
+        return model
+    matches = [family for family in families if model.startswith(family + "-")]
+    return max(matches, key=len) if matches else None
+
+
+def image_patch_multiplier(model: str) -> Optional[float]:
+    """Token multiplier if `model` bills images by 32px patches, else None (tile-billed)."""
+    return IMAGE_PATCH_MULTIPLIERS.get(image_model_family(model))
+
+
+def image_token_cost(model: str) -> Tuple[int, int]:
+    """(base, per-tile) tokens for a tile-billed model."""
+    return IMAGE_TOKEN_COSTS.get(image_model_family(model), DEFAULT_IMAGE_TOKEN_COST)
+
+
+def default_calibration(model: str) -> float:
+    """`DEFAULT_CALIBRATION` for `model`'s family, 1.0 if not measured."""
+    return DEFAULT_CALIBRATION.get(image_model_family(model), 1.0)
+
+
+def image_tiles(width: int, height: int) -> int:
+    """Number of 512px tiles billed for a `detail: high` image.
+
+    The image is fit inside 2048x2048, then its shortest side is scaled down to 768px.
+    """
+    scale = min(1.0, 2048 / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    return math.ceil(w / 512) * math.ceil(h / 512)
+
+
+def image_patches(width: int, height: int) -> int:
+    """Number of 32px patches billed for an image on a patch-billed model.
+
+    Past `MAX_IMAGE_PATCHES` the image is scaled down to fit, keeping whole patches along its tighter side.
+    """
+    patches = math.ceil(width / PATCH_SIZE) * math.ceil(height / PATCH_SIZE)
+    if patches <= MAX_IMAGE_PATCHES:
+        return patches
+    scale = math.sqrt(PATCH_SIZE ** 2 * MAX_IMAGE_PATCHES / (width * height))
+    w, h = width * scale / PATCH_SIZE, height * scale / PATCH_SIZE
+    scale *= min(math.floor(w) / w, math.floor(h) / h)
+    return min(MAX_IMAGE_PATCHES, math.ceil(width * scale / PATCH_SIZE) * math.ceil(height * scale / PATCH_SIZE))
+
+
+def image_tokens(width: int, height: int, detail: str = "auto", model: str = MODEL) -> int:
+    """Image tokens for one image by the published tile / patch formula (uncalibrated)."""
+    multiplier = image_patch_multiplier(model)
+    if multiplier is not None:
+        if detail == "low":
+            scale = min(1.0, LOW_DETAIL_MAX_SIDE / max(width, height))
+            width, height = int(width * scale), int(height * scale)
+        return math.ceil(image_patches(width, height) * multiplier)
+    base, per_tile = image_token_cost(model)
+    if detail == "low":
+        return base
+    return base + per_tile * image_tiles(width, height)  # `auto` is billed as `high` for frames this size
+
+
+@dataclass(frozen=True)
+class ResizePlan:
+    """Frame size and `detail` chosen by `plan_frame_size`, with its per-frame token estimate
+    (`tiles` is 0 for `detail: low` and for patch-billed models)."""
+    width: int
+    height: int
+    detail: str
+    tiles: int
+    tokens: int
+
+
+def _scaled_height(src_width: int, src_height: int, width: int) -> int:
+    return int(width * src_height / src_width)  # same rounding as frames.resize_frame
+
+
+@lru_cache(maxsize=256)
+def plan_frame_size(
+    src_width: int,
+    src_height: int,
+    min_width: int,
+    model: str = MODEL,
+    allow_low: bool = True,
+) -> ResizePlan:
+    """Cheapest frame size at least `min_width` wide (never upscaled) and the `detail` to send it with.
+
+    - if a size that wide fits in the 512x512 low-detail view, use `detail: low` (base tokens only)
+      at the largest such size
+    - otherwise `detail: high` with the fewest tiles over widths `min_width..src_width`; among
+      equally cheap widths the widest wins, since the extra resolution is free
+    - on patch-billed models every extra pixel costs, so `min_width` itself
+    """
+    min_width = min(min_width, src_width)
+    if image_patch_multiplier(model) is not None:
+        height = _scaled_height(src_width, src_height, min_width)
+        return ResizePlan(min_width, height, "high", 0, image_tokens(min_width, height, "high", model))
+    base, _ = image_token_cost(model)
+    low_width = min(src_width, LOW_DETAIL_MAX_SIDE, LOW_DETAIL_MAX_SIDE * src_width // src_height)
+    if allow_low and low_width >= min_width:
+        return ResizePlan(low_width, _scaled_height(src_width, src_height, low_width), "low", 0, base)
+
+    best_width, best_tiles = min_width, image_tiles(min_width, _scaled_height(src_width, src_height, min_width))
+    for width in range(min_width + 1, src_width + 1):
+        tiles = image_tiles(width, _scaled_height(src_width, src_height, width))
+        if tiles <= best_tiles:
+            best_width, best_tiles = width, tiles
+    height = _scaled_height(src_width, src_height, best_width)
+    return ResizePlan(best_width, height, "high", best_tiles, image_tokens(best_width, height, "high", model))
+
+
+def jpeg_size(jpeg_bytes: bytes) -> Tuple[int, int]:
+    """(width, height) from the JPEG's SOF header, without decoding the image."""
+    i = 2
+    while i + 9 < len(jpeg_bytes):
+        if jpeg_bytes[i] != 0xFF:
+            i += 1
+            continue
+        marker = jpeg_bytes[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = int.from_bytes(jpeg_bytes[i + 2 : i + 4], "big")
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(jpeg_bytes[i + 5 : i + 7], "big")
+            width = int.from_bytes(jpeg_bytes[i + 7 : i + 9], "big")
+            return width, height
+        i += 2 + length
+    raise ValueError("no SOF marker found in JPEG")
+
+
+def register_file_image(file_id: str, width: int, height: int) -> None:
+    FILE_IMAGE_SIZES[file_id] = (width, height)
+
+
+def content_image_tokens(content: Dict[str, str], model: str = MODEL) -> int:
+    """Token estimate for one `input_image` part (JPEG data URL, raw JPEG or uploaded `file_id`)."""
+    if "file_id" in content:
+        width, height = FILE_IMAGE_SIZES.get(content["file_id"], UNKNOWN_IMAGE_SIZE)
+    elif "jpeg_bytes" in content:
+        width, height = jpeg_size(content["jpeg_bytes"])
+    else:
+        header = base64.b64decode(content["image_url"].split(",", 1)[1][:65536])
+        width, height = jpeg_size(header)
+    return image_tokens(width, height, content.get("detail", "auto"), model)
+
+
+def frame_token_estimates(contents: Sequence[Dict[str, str]], model: str = MODEL) -> List[int]:
+    """Per-frame token estimate for a list of `input_image` parts, in order."""
+    return [content_image_tokens(content, model) for content in contents]
+
+
+def text_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(input_messages: List[Dict[str, Any]], model: str = MODEL) -> int:
+    """Pre-flight input-token estimate for a full request (text + images)."""
+    total = 0
+    for message in input_messages:
+        for part in message.get("content", []):
+            if part.get("type") == "input_text":
+                total += text_tokens(part.get("text", ""))
+            elif part.get("type") == "input_image":
+                total += content_image_tokens(part, model)
+    return total
+
+
+def calibration_factor(actual_input_tokens: int, estimated_input_tokens: int) -> float:
+    """Ratio to multiply whole-request estimates by, from one request's billed `usage.input_tokens`
+    and its uncalibrated `estimate_message_tokens`."""
+    return actual_input_tokens / estimated_input_tokens if estimated_input_tokens else 1.0
+
+
+def pack_chunks_by_tokens(
+    contents: Sequence[Dict[str, str]],
+    target_tokens: int = 20000,
+    latency_goal_sec: Optional[float] = None,
+    max_frames: Optional[int] = None,
+    prompt_tokens: Optional[int] = None,
+    model: str = MODEL,
+    calibration: Optional[float] = None,
+    base_latency_sec: float = DEFAULT_BASE_LATENCY_SEC,
+    sec_per_input_token: float = DEFAULT_SEC_PER_INPUT_TOKEN,
+) -> Tuple[List[List[Dict[str, str]]], List[int]]:
+    """Greedily pack consecutive frames into chunks whose estimated input tokens stay under budget.
+
+    The budget per chunk is `target_tokens`, tightened further if `latency_goal_sec` implies
+    fewer tokens under the linear latency model. Every chunk holds at least one frame.
+    Chunk estimates (prompt + frames) are scaled by `calibration`, by default `default_calibration(model)`;
+    pass `calibration_factor` from a billed request, or 1.0 for the plain formula.
+    Returns `(chunks, chunk_input_tokens)`, the latter calibrated.
+    """
+    if prompt_tokens is None:
+        from inference import make_message
+        prompt_tokens = estimate_message_tokens(make_message([]), model)
+    budget = target_tokens
+    if latency_goal_sec is not None:
+        budget = min(budget, int((latency_goal_sec - base_latency_sec) / sec_per_input_token))
+    if calibration is None:
+        calibration = default_calibration(model)
+
+    chunks: List[List[Dict[str, str]]] = []
+    chunk_tokens: List[int] = []
+    current: List[Dict[str, str]] = []
+    current_tokens = prompt_tokens  # uncalibrated
+    for content in contents:
+        cost = content_image_tokens(content, model)
+        full = max_frames is not None and len(current) >= max_frames
+        if current and (full or int((current_tokens + cost) * calibration) > budget):
+            chunks.append(current)
+            chunk_tokens.append(int(current_tokens * calibration))
+            current, current_tokens = [], prompt_tokens
+        current.append(content)
+        current_tokens += cost
+    if current:
+        chunks.append(current)
+        chunk_tokens.append(int(current_tokens * calibration))
+    return chunks, chunk_tokens
+
+
+def project_spend(
+    chunk_tokens: Sequence[int],
+    output_tokens_per_chunk: int = DEFAULT_OUTPUT_TOKENS,
+    usd_per_1m_input: Optional[float] = None,
+    usd_per_1m_output: Optional[float] = None,
+    base_latency_sec: float = DEFAULT_BASE_LATENCY_SEC,
+    sec_per_input_token: float = DEFAULT_SEC_PER_INPUT_TOKEN,
+    verbose: bool = True,
+) -> Dict[str, Any]:
+    """Projected chunk count, token spend and per-chunk latency before any request is sent."""
+    input_tokens = sum(chunk_tokens)
+    output_tokens = output_tokens_per_chunk * len(chunk_tokens)
+    plan: Dict[str, Any] = {
+        "num_chunks": len(chunk_tokens),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "max_chunk_input_tokens": max(chunk_tokens, default=0),
+        "max_chunk_latency_sec": base_latency_sec + sec_per_input_token * max(chunk_tokens, default=0),
+    }
+    if usd_per_1m_input is not None and usd_per_1m_output is not None:
+        plan["usd"] = input_tokens / 1e6 * usd_per_1m_input + output_tokens / 1e6 * usd_per_1m_output
+    if verbose:
+        rich_print(plan)
+    return plan